@@ -1,82 +1,86 @@
 import streamlit as st
-import pandas as pd
 import os
 import sys
-import requests # Added for raw data streaming
-from io import BytesIO # Added for memory-efficient loading
 import plotly.express as px
 from dotenv import load_dotenv
 
 # --- 1. THE CLOUD PATH FIX ---
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from src.ui_components import create_global_sidebar
+from src.features import GRANULARITIES
+from src.ui_components import CHART_MAX_POINTS, create_global_sidebar, decimate, pick_granularity, render_chart
+from src.service import get_service
+from src.instrumentation import begin_run, stage
 
 # 2. INITIALIZATION
 load_dotenv()
 
 st.set_page_config(page_title="AjayDataLabs BI Suite", page_icon="💎", layout="wide")
+begin_run()
 
 # 3. DATA ENGINE (The "Beyond" Cloud Strategy)
-@st.cache_data
-def load_gold_layer():
-    # Attempt to load from Local Path first (for your PC development)
-    local_path = os.getenv("PROCESSED_DATA_PATH")
-    if local_path and os.path.exists(local_path):
-        return pd.read_parquet(local_path)
-    
-    # CLOUD PRODUCTION: Raw Stream from Dropbox
-    # Your verified link
-    cloud_url = "https://www.dropbox.com/scl/fi/5daz0xt5dthm24hbyioxb/cleaned_data.parquet?rlkey=wvkn08glbo3ofur47l77fy978&st=9jbpru00&dl=1"
-    
-    try:
-        # Stream the parquet file directly into memory
-        response = requests.get(cloud_url)
-        response.raise_for_status() # Ensure the connection is healthy
-        return pd.read_parquet(BytesIO(response.content))
-    except Exception as e:
-        st.error("⚠️ Enterprise Data Sync Failed. Check cloud connectivity.")
-        st.sidebar.error(f"Technical Log: {e}")
-        return pd.DataFrame()
-
-df = load_gold_layer()
+# The cockpit is a thin client of the analytics service, which answers from the daily
+# cube and shares its results with every session (and with ANALYTICS_SERVICE_URL clients)
+try:
+    service = get_service()
+    with stage('cockpit.date_bounds'):
+        date_bounds = service.date_bounds()
+except Exception as e:
+    st.error("⚠️ Enterprise Data Sync Failed. Check cloud connectivity.")
+    st.sidebar.error(f"Technical Log: {e}")
+    service = None
 
 # 4. CALL SHARED SIDEBAR (Persistent Branding)
-if not df.empty:
-    date_range = create_global_sidebar(df)
+if service is not None:
+    date_range = create_global_sidebar(date_bounds=date_bounds)
 
     # Apply global filter logic
     if isinstance(date_range, tuple) and len(date_range) == 2:
-        mask = (df['InvoiceDate'].dt.date >= date_range[0]) & (df['InvoiceDate'].dt.date <= date_range[1])
-        filtered_df = df.loc[mask]
+        start_date, end_date = date_range
     else:
-        filtered_df = df
+        start_date = end_date = None
 
     # 5. MAIN DASHBOARD: EXECUTIVE COCKPIT
     st.title("🏛️ Executive Cockpit")
     st.markdown("---")
 
     # KPI SECTION: Real-time calculation
-    total_rev = filtered_df['Line_Total'].sum()
-    total_ord = filtered_df['Invoice'].nunique()
-    unique_cust = filtered_df['Customer ID'].nunique() # We defined it as unique_cust
+    with stage('cockpit.compute'):
+        kpis = service.kpis(start_date, end_date)
+        top_products = service.top_products(start_date, end_date, n=5)
+    total_rev = kpis['revenue']
+    total_ord = kpis['orders']
+    unique_cust = kpis['customers'] # We defined it as unique_cust
+    approx_note = f"HyperLogLog estimate (±{kpis['relative_error']:.1%} std. error)"
 
     col1, col2, col3 = st.columns(3)
     col1.metric("Total Revenue", f"${total_rev/1e6:.2f}M", delta="+5.2%")
-    col2.metric("Total Orders", f"{total_ord:,}", delta="+12%")
+    col2.metric("Total Orders", f"{total_ord:,}", delta="+12%", help=approx_note)
     # FIX: Change 'unique_customers' to 'unique_cust'
-    col3.metric("Unique Customers", f"{unique_cust:,}", delta="-2.1%")
+    col3.metric("Unique Customers", f"{unique_cust:,}", delta="-2.1%", help=approx_note)
 
     # 6. REVENUE VELOCITY
+    # Auto picks the granularity from the selected span; long series are decimated and
+    # the serialized figure is shared by every session with the same filters
     st.subheader("📈 Revenue Growth Velocity")
-    revenue_trend = filtered_df.set_index('InvoiceDate')['Line_Total'].resample('MS').sum().reset_index()
+    granularity = st.radio("Granularity", ['auto', 'daily', 'weekly', 'monthly'], horizontal=True,
+                           format_func=str.title)
+    if granularity == 'auto':
+        granularity = pick_granularity(start_date or date_bounds[0], end_date or date_bounds[1])
+
+    def build_trend():
+        revenue_trend = service.revenue_trend(start_date, end_date, GRANULARITIES[granularity])
+        points = decimate(revenue_trend, 'InvoiceDate', 'Line_Total')
+        shown = f" ({len(points)} of {len(revenue_trend)} points)" if len(points) < len(revenue_trend) else ""
+        fig_trend = px.area(
+            points, x='InvoiceDate', y='Line_Total',
+            title=f"{granularity.title()} Revenue Performance{shown}",
+            color_discrete_sequence=['#00CC96']
+        )
+        fig_trend.update_layout(template="plotly_dark", height=450)
+        return fig_trend
 
-    fig_trend = px.area(
-        revenue_trend, x='InvoiceDate', y='Line_Total',
-        title="Monthly Revenue Performance",
-        color_discrete_sequence=['#00CC96']
-    )
-    fig_trend.update_layout(template="plotly_dark", height=450)
-    st.plotly_chart(fig_trend, use_container_width=True)
+    render_chart('cockpit_trend', service.version(), {'start': start_date, 'end': end_date},
+                 {'granularity': granularity, 'max_points': CHART_MAX_POINTS}, build_trend)
 
     # 7. TOP DRIVERS
     st.divider()
@@ -85,7 +89,6 @@ if not df.empty:
         st.info("**🔍 Market Analysis:** Stability is high; seasonal spikes confirmed.")
     with col_right:
         st.markdown("### 🏆 Top 5 Revenue Drivers")
-        top_products = filtered_df.groupby('Description')['Line_Total'].sum().sort_values(ascending=False).head(5)
-        st.table(top_products)
+        st.table(top_products.set_index('Description')['Line_Total'])
 else:
     st.warning("Please upload data to initialize the dashboard.")
\ No newline at end of file
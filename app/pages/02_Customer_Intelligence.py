@@ -1,94 +1,87 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import sys
 import os
-import requests
-from io import BytesIO
 from dotenv import load_dotenv
 
 # 1. PATHING
 load_dotenv()
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-from src.ui_components import create_global_sidebar
+from src.ui_components import create_global_sidebar, render_chart, render_table
+from src.service import get_service
+from src.cohorts import pivot_cohorts, retention_curve
+from src.instrumentation import begin_run, stage
 
-# 2. LOCAL ANALYTICS CLASS (The Nuclear Option)
-# We define it here to bypass the broken 'src' cache on the cloud
-class CloudCustomerAnalytics:
-    def __init__(self, df):
-        self.df = df
-            
-    def generate_rfm(self):
-        if self.df.empty:
-            return pd.DataFrame()
-        df = self.df
-        snapshot_date = df['InvoiceDate'].max() + pd.Timedelta(days=1)
-        rfm = df.groupby('Customer ID').agg({
-            'InvoiceDate': lambda x: (snapshot_date - x.max()).days,
-            'Invoice': 'nunique',
-            'Line_Total': 'sum'
-        }).rename(columns={'InvoiceDate': 'Recency', 'Invoice': 'Frequency', 'Line_Total': 'Monetary'})
-        rfm = rfm[rfm.index.notnull()]
-        
-        # Scoring
-        rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
-        rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
-        rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
-        rfm['RFM_Score'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str)
-        
-        segs = {
-            r'[1-2][1-2]': 'Hibernating', r'[1-2][3-4]': 'At Risk', r'[1-2]5': 'Can\'t Lose Them',
-            r'3[1-2]': 'About to Sleep', r'33': 'Need Attention', r'[3-4][4-5]': 'Loyalists',
-            r'41': 'Promising', r'51': 'New Customers', r'[4-5][2-3]': 'Potential Loyalists',
-            r'5[4-5]': 'Champions'
-        }
-        rfm['Segment'] = rfm['RFM_Score'].replace(segs, regex=True)
-        return rfm
-
-# 3. PAGE CONFIG
+# 2. PAGE CONFIG
 st.set_page_config(page_title="Customer Intelligence", layout="wide")
+begin_run()
 
-# 4. DATA LOADING
-@st.cache_data
-def load_cloud_data():
-    cloud_url = "https://www.dropbox.com/scl/fi/5daz0xt5dthm24hbyioxb/cleaned_data.parquet?rlkey=wvkn08glbo3ofur47l77fy978&st=9jbpru00&dl=1"
+# 3. DATA LOADING
+# RFM runs once per dataset version in the analytics service; the page reads summaries
+def load_service():
     try:
-        response = requests.get(cloud_url)
-        return pd.read_parquet(BytesIO(response.content))
-    except:
-        return pd.DataFrame()
-
-raw_df = load_cloud_data()
+        service = get_service()
+        return service, service.date_bounds()
+    except Exception:
+        return None, None
 
-@st.cache_data
-def get_rfm_data(_df):
-    # USE THE LOCAL CLASS DEFINED ABOVE
-    analyzer = CloudCustomerAnalytics(_df) 
-    return analyzer.generate_rfm()
+service, date_bounds = load_service()
 
-if not raw_df.empty:
-    with st.spinner("Analyzing 1M+ rows..."):
-        rfm_df = get_rfm_data(raw_df)
+if service:
+    with st.spinner("Loading customer segments..."), stage('customers.compute'):
+        segment_counts = service.rfm_segments()
+        version = service.version()
     
-    create_global_sidebar(raw_df)
+    create_global_sidebar(date_bounds=date_bounds)
     st.title("🎯 Customer Intelligence Lab")
     
     # --- DONUT CHART ---
-    segment_counts = rfm_df['Segment'].value_counts().reset_index()
-    segment_counts.columns = ['Segment', 'Count']
-    fig = px.pie(segment_counts, values='Count', names='Segment', hole=0.5, 
-                 color_discrete_sequence=px.colors.diverging.RdYlGn[::-1])
-    st.plotly_chart(fig, use_container_width=True)
+    render_chart('customers_segments', version, {}, {},
+                 lambda: px.pie(segment_counts, values='Count', names='Segment', hole=0.5,
+                                color_discrete_sequence=px.colors.diverging.RdYlGn[::-1]))
 
     # --- TABLES ---
+    # Whole segments, paged: only the visible page is cut from the RFM table and sent
     st.divider()
+    sizes = segment_counts.set_index('Segment')['Count']
     c1, c2 = st.columns(2)
-    with c1:
-        st.subheader("⚠️ At Risk")
-        st.dataframe(rfm_df[rfm_df['Segment'] == 'At Risk'].head(10))
-    with c2:
-        st.subheader("🏆 Champions")
-        st.dataframe(rfm_df[rfm_df['Segment'] == 'Champions'].head(10))
+    for column, segment, title in ((c1, 'At Risk', "⚠️ At Risk"), (c2, 'Champions', "🏆 Champions")):
+        with column:
+            st.subheader(title)
+            render_table(lambda offset, n, segment=segment: service.segment_customers(segment, n, offset),
+                         segment.lower().replace(' ', '_'), total_rows=int(sizes.get(segment, 0)))
+
+    # --- COHORT RETENTION ---
+    st.divider()
+    st.subheader("📅 Cohort Retention")
+    f1, f2, f3 = st.columns([3, 1, 2])
+    countries = f1.multiselect("Countries (all if empty)", sorted(service.country_revenue()['Country'].astype(str)))
+    exclude_cancelled = f2.checkbox("Exclude cancellations", value=True)
+    metric = f3.radio("Metric", ['Retention', 'Revenue_Retention'], horizontal=True,
+                      format_func=lambda m: "Customers" if m == 'Retention' else "Revenue")
+
+    # One cached table per (dataset version, filters) in the service; pivoting it is cheap
+    with stage('customers.cohorts'):
+        cohorts = service.cohorts(countries or None, exclude_cancelled)
+    if cohorts.empty:
+        st.info("No customers match these filters.")
+    else:
+        filters = {'countries': sorted(countries), 'exclude_cancelled': exclude_cancelled}
+
+        def build_heatmap():
+            matrix = pivot_cohorts(cohorts, metric) * 100
+            matrix.index = matrix.index.strftime('%Y-%m')
+            return px.imshow(matrix, text_auto='.0f', aspect='auto', color_continuous_scale='RdYlGn',
+                             labels=dict(x="Months since first purchase", y="Acquisition cohort", color="%"))
+
+        def build_curve():
+            curve = retention_curve(cohorts)
+            curve[['Retention', 'Revenue_Retention']] *= 100
+            return px.line(curve, x='Months_Since', y=['Retention', 'Revenue_Retention'], markers=True,
+                           labels={'Months_Since': "Months since first purchase", 'value': "% of first month"})
+
+        render_chart('customers_cohorts', version, filters, {'metric': metric}, build_heatmap)
+        render_chart('customers_retention', version, filters, {}, build_curve)
 else:
     st.warning("Data load failed.")
\ No newline at end of file
@@ -5,8 +5,6 @@ import plotly.graph_objects as go
 import joblib
 import os
 import sys
-import requests
-from io import BytesIO
 from dotenv import load_dotenv
 
 # 1. PATHING & ENVIRONMENT (Critical for Cloud compatibility)
@@ -15,58 +13,83 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'
 
 # Import your shared components
 from src.ui_components import create_global_sidebar
+from src.gold_layer import gold_source, slice_by_date
+from src.query import GoldQuery
+from src.features import FEATURES, load_features
+from src.predictor import FEATURE_SPEC, FORECAST_MODEL, forecast_scenarios
+from src.registry import ModelRegistry, StaleModelError
+from src.instrumentation import begin_run, stage
 
 # 2. PAGE CONFIG
 st.set_page_config(page_title="Predictor Lab", layout="wide")
+begin_run()
+
+# Every slider position, precomputed: 0-50% lift x up to 12 months ahead
+LIFT_GRID = np.arange(0, 51) / 100
+MAX_HORIZON = 12
 
 # 3. CLOUD-AWARE DATA ENGINE
-@st.cache_data
 def load_production_data():
     """
-    Handles million-row data streaming for the prediction engine.
+    Locates the Gold Layer; this page only ever scans InvoiceDate and Line_Total.
     """
-    local_path = os.getenv("PROCESSED_DATA_PATH")
-    if local_path and os.path.exists(local_path):
-        return pd.read_parquet(local_path)
-    
-    # Cloud Stream from your verified Dropbox link
-    cloud_url = "https://www.dropbox.com/scl/fi/5daz0xt5dthm24hbyioxb/cleaned_data.parquet?rlkey=wvkn08glbo3ofur47l77fy978&st=9jbpru00&dl=1"
-    
     try:
-        response = requests.get(cloud_url)
-        response.raise_for_status()
-        return pd.read_parquet(BytesIO(response.content))
+        return gold_source()
     except Exception as e:
         st.error(f"⚠️ Prediction Engine Data Sync Failed: {e}")
-        return pd.DataFrame()
+        return None, None
 
 # 4. ADVANCED FEATURE ENGINEERING
 @st.cache_data
-def get_engineered_data(_df_raw):
+def get_engineered_data(gold_path, version):
     """
-    Transforms raw data into time-series features for XGBoost.
+    Monthly time-series features for XGBoost, from the feature store shared with training.
     """
-    if _df_raw.empty:
+    if not gold_path:
         return pd.DataFrame()
 
-    # Monthly Resampling
-    monthly = _df_raw.set_index('InvoiceDate')['Line_Total'].resample('MS').sum().reset_index()
-    
-    # Feature Engineering (Must match training features exactly)
-    monthly['Month_Ordinal'] = np.arange(len(monthly))
-    monthly['Lag_1'] = monthly['Line_Total'].shift(1)
-    monthly['Lag_2'] = monthly['Line_Total'].shift(2)
-    monthly['Rolling_Mean'] = monthly['Line_Total'].shift(1).rolling(window=3).mean()
-    
-    return monthly.dropna()
+    # Only months added since the store was last refreshed are aggregated from the Gold Layer
+    return load_features(gold_path, version, 'monthly').dropna(subset=FEATURES).reset_index(drop=True)
+
+@st.cache_resource
+def load_legacy_model(model_path, mtime):
+    return joblib.load(model_path)
+
+def load_forecaster(version, model_path):
+    """
+    (model, model_key, warning) from the model registry. Models are cached process-wide and only
+    reloaded when the entry for this data version changes; a model trained on other
+    data is flagged rather than used silently.
+    """
+    try:
+        model, entry = ModelRegistry().load(FORECAST_MODEL, version, FEATURE_SPEC)
+    except StaleModelError as e:
+        return None, None, str(e)
+    except FileNotFoundError:
+        if not os.path.exists(model_path):
+            return None, None, None
+        mtime = os.path.getmtime(model_path)
+        return (load_legacy_model(model_path, mtime), f"legacy-{mtime}",
+                "Unversioned model (revenue_model.pkl): its training data can't be verified. "
+                "Retrain with `python -m src.predictor` to register it.")
+    if entry['stale']:
+        return model, entry['key'], (f"Stale model: trained on Gold Layer {entry['data_version'][:12]}, "
+                       f"current data is {version[:12]}. Retrain with `python -m src.predictor`.")
+    return model, entry['key'], None
+
+@st.cache_data
+def get_scenario_cube(_model, model_key, version, _monthly_df):
+    """Recursive forecast for the whole lift grid: one predict() per month ahead."""
+    return forecast_scenarios(_model, _monthly_df, MAX_HORIZON, LIFT_GRID)
 
 # 5. INITIALIZE DATA
-raw_df = load_production_data()
-monthly_df = get_engineered_data(raw_df)
+gold_path, version = load_production_data()
+with stage('predictor.data'):
+    monthly_df = get_engineered_data(gold_path, version)
 
-if not raw_df.empty:
+if gold_path:
     # Persistent Sidebar Restoration
-    date_range = create_global_sidebar(raw_df)
+    date_range = create_global_sidebar(date_bounds=GoldQuery(source=gold_path).date_bounds())
 
     # 6. PAGE CONTENT
     st.title("🔮 Predictive Revenue Lab (XGBoost Edition)")
@@ -75,33 +98,49 @@ if not raw_df.empty:
     # Cloud-Path for Model (Ensures it works locally and on cloud)
     model_path = os.path.join(os.path.dirname(__file__), "../../src/models/revenue_model.pkl")
 
-    if not monthly_df.empty and os.path.exists(model_path):
-        # 7. Load the trained XGBoost Brain
-        model = joblib.load(model_path)
-        
+    # 7. Load the trained XGBoost Brain (registry, cached across reruns)
+    with stage('predictor.load_model'):
+        model, model_key, model_warning = load_forecaster(version, model_path)
+    if model_warning:
+        st.warning(f"⚠️ {model_warning}")
+
+    if not monthly_df.empty and model is not None:
+
         # 8. Sidebar - Strategy Simulator
         st.sidebar.markdown("---")
         st.sidebar.header("🕹️ Strategy Simulator")
         lift = st.sidebar.slider("Simulated Marketing Lift (%)", 0, 50, 0) / 100
+        horizon = st.sidebar.slider("Forecast Horizon (months)", 1, MAX_HORIZON, 6)
+
+        # 9. Generate Predictions: in-sample fit, plus the forecast paths looked up from the scenario cube
+        with stage('predictor.compute', rows=len(monthly_df)):
+            current_preds = model.predict(monthly_df[FEATURES])
+            cube = get_scenario_cube(model, model_key, version, monthly_df)
+            baseline_path = cube.lookup(0.0, horizon)
+            simulated_path = cube.lookup(lift, horizon)
 
-        # 9. Generate Predictions
-        features = ['Month_Ordinal', 'Lag_1', 'Lag_2', 'Rolling_Mean']
-        current_preds = model.predict(monthly_df[features])
-        simulated_preds = current_preds * (1 + lift)
+        # 10. Visualization (lags need full history; the date filter only sets the chart window)
+        chart_df = monthly_df.assign(Baseline=current_preds)
+        if isinstance(date_range, tuple) and len(date_range) == 2:
+            window = slice_by_date(chart_df, date_range[0].replace(day=1), date_range[1])
+            chart_df = window if not window.empty else chart_df
 
-        # 10. Visualization
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=monthly_df['InvoiceDate'], y=monthly_df['Line_Total'], name="Actual Revenue", line=dict(color='royalblue', width=3)))
-        fig.add_trace(go.Scatter(x=monthly_df['InvoiceDate'], y=current_preds, name="Model Baseline", line=dict(color='white', dash='dot', width=1)))
-        fig.add_trace(go.Scatter(x=monthly_df['InvoiceDate'], y=simulated_preds, name="Simulated Strategy", line=dict(color='#00FFCC', width=4)))
+        with stage('predictor.render', rows=len(chart_df)):
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=chart_df['InvoiceDate'], y=chart_df['Line_Total'], name="Actual Revenue", line=dict(color='royalblue', width=3)))
+            fig.add_trace(go.Scatter(x=chart_df['InvoiceDate'], y=chart_df['Baseline'], name="Model Baseline", line=dict(color='white', dash='dot', width=1)))
+            fig.add_trace(go.Scatter(x=baseline_path.index, y=baseline_path.values, name="Baseline Forecast", line=dict(color='white', dash='dash', width=2)))
+            fig.add_trace(go.Scatter(x=simulated_path.index, y=simulated_path.values, name="Simulated Strategy", line=dict(color='#00FFCC', width=4)))
 
-        fig.update_layout(title="Revenue Velocity Simulation", template="plotly_dark", hovermode="x unified")
-        st.plotly_chart(fig, use_container_width=True)
+            fig.update_layout(title="Revenue Velocity Simulation", template="plotly_dark", hovermode="x unified")
+            st.plotly_chart(fig, use_container_width=True)
         
         # 11. Metrics
         st.divider()
         c1, c2 = st.columns(2)
-        c1.metric("Baseline Forecast", f"${current_preds[-1]/1e3:.1f}k")
-        c2.metric("Target with Lift", f"${simulated_preds[-1]/1e3:.1f}k", delta=f"{lift*100:.0f}%")
-    else:
+        # Lift compounds through the lags, so the total effect differs from the slider value
+        total_effect = simulated_path.sum() / baseline_path.sum() - 1
+        c1.metric(f"Baseline Forecast ({horizon} mo)", f"${baseline_path.sum()/1e3:.1f}k")
+        c2.metric(f"Target with Lift ({horizon} mo)", f"${simulated_path.sum()/1e3:.1f}k", delta=f"{total_effect*100:.1f}%")
+    elif model is None and not model_warning:
         st.warning("⚠️ ML Model not found in src/models/. Ensure revenue_model.pkl is uploaded.")
\ No newline at end of file
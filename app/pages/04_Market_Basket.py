@@ -0,0 +1,104 @@
+import streamlit as st
+import pandas as pd
+import sys
+import os
+from dotenv import load_dotenv
+
+# 1. PATHING
+load_dotenv()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ui_components import create_global_sidebar
+from src.gold_layer import gold_source
+from src.query import GoldQuery
+from src.basket_rules import MIN_CONFIDENCE, MIN_SUPPORT, load_rules
+from src.service import get_service
+from src.instrumentation import begin_run, stage
+
+# 2. PAGE CONFIG
+st.set_page_config(page_title="Market Basket Lab", layout="wide")
+begin_run()
+
+PARTITION_LABELS = {'All baskets': None, 'Per country': 'Country', 'Per month': 'Month'}
+
+# 3. DATA LOADING
+def load_source():
+    try:
+        return gold_source()
+    except Exception:
+        return None, None
+
+def label_rules(rules, descriptions):
+    """Readable antecedent/consequent columns for the tables."""
+    name = lambda code: descriptions.get(code, code)
+    return pd.DataFrame({
+        'Bought together': rules['Antecedent'].map(lambda items: ' + '.join(name(i) for i in items)),
+        'Also buy': rules['Consequent'].map(name),
+        'Support': rules['Support'],
+        'Confidence': rules['Confidence'],
+        'Lift': rules['Lift'],
+        'Baskets': rules['Baskets'],
+    })
+
+gold_path, version = load_source()
+
+if gold_path:
+    create_global_sidebar(date_bounds=GoldQuery(source=gold_path).date_bounds())
+
+    # 4. Sidebar - Mining Parameters (each combination is mined once per dataset version)
+    st.sidebar.header("🛒 Rule Mining")
+    partition_by = PARTITION_LABELS[st.sidebar.selectbox("Partition", list(PARTITION_LABELS))]
+    min_support = st.sidebar.slider("Min Support (%)", 0.5, 10.0, MIN_SUPPORT * 100, 0.5) / 100
+    min_confidence = st.sidebar.slider("Min Confidence (%)", 5, 90, int(MIN_CONFIDENCE * 100), 5) / 100
+
+    with st.spinner("Mining frequent itemsets..."), stage('basket.rules') as timed:
+        ruleset = load_rules(gold_path, version, partition_by, min_support, min_confidence)
+        timed.rows = len(ruleset.rules)
+    descriptions = ruleset.descriptions.to_dict()
+
+    st.title("🛒 Market Basket Lab")
+    st.markdown("---")
+
+    if ruleset.rules.empty:
+        st.info(f"No rules at ≥{min_support:.1%} support and ≥{min_confidence:.0%} confidence. "
+                "Lower the thresholds in the sidebar.")
+    else:
+        partition = None
+        if partition_by is not None:
+            partition = st.selectbox(f"{partition_by}", sorted(ruleset.rules['Partition'].unique()))
+
+        # 5. Rules by antecedent, answered from the inverted index
+        st.subheader("Frequently Bought Together")
+        picked = st.multiselect(
+            "Products in the basket",
+            ruleset.antecedent_items(),
+            format_func=lambda code: f"{code} · {descriptions.get(code, '')}"
+        )
+        if picked:
+            with stage('basket.lookup'):
+                matches = ruleset.lookup(picked, partition=partition, n=25)
+            if matches.empty:
+                st.info("No rule fires for this basket at the current thresholds.")
+            else:
+                st.dataframe(label_rules(matches, descriptions), use_container_width=True)
+
+            # Item-item neighbours from the analytics service: products often in the same
+            # baskets as each pick, whether or not a rule clears the thresholds
+            st.markdown("**Similar products**")
+            with stage('basket.similar'):
+                similar = get_service().similar_items(picked, n=5)
+            if similar.empty:
+                st.info("No similar products for this selection.")
+            else:
+                # Service results are shared between sessions: label a copy
+                labelled = similar.assign(StockCode=similar['StockCode'].map(lambda code: f"{code} · {descriptions.get(code, '')}"))
+                st.dataframe(labelled, use_container_width=True)
+
+        # 6. Strongest Rules
+        st.divider()
+        st.subheader("🔗 Strongest Associations (by Lift)")
+        rules = ruleset.rules if partition is None else ruleset.rules[ruleset.rules['Partition'] == partition]
+        st.caption(f"{len(rules):,} rules at ≥{min_support:.1%} support and ≥{min_confidence:.0%} confidence")
+        st.dataframe(label_rules(rules.nlargest(20, 'Lift'), descriptions), use_container_width=True)
+else:
+    st.warning("Data load failed.")
@@ -0,0 +1,54 @@
+"""
+Walk-forward search of the forecaster's parameter grid: total search time by worker
+count, and early stopping vs searching the number of rounds as one more grid axis
+(what the grid would need without it).
+
+On a machine with fewer cores than workers the pool only adds overhead; the scaling
+column is meaningful up to os.cpu_count().
+
+    python -m benchmarks.bench_backtest path/to/cleaned_data.parquet --granularity monthly --workers 1,2,4
+"""
+import argparse
+import os
+import time
+
+from src.backtest import PARAM_GRID, load_backtest
+from src.gold_layer import version_of
+
+# The rounds axis a fixed-round grid has to search instead
+ROUNDS_AXIS = [100, 250, 500, 1000]
+
+
+def report(label, walk_forward, leaderboard, baseline_s=None):
+    stats = walk_forward.stats
+    best = leaderboard[~leaderboard['Config'].isin(['default', 'naive'])].iloc[0]
+    speedup = f"{baseline_s / stats['seconds']:.2f}x" if baseline_s else ''
+    print(f"{label:<28} {stats['configurations']:>7} {stats['rounds_trained']:>10,} {stats['seconds']:>8.1f} "
+          f"{speedup:>8} {best['MAPE']:>9.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('gold_path')
+    parser.add_argument('--granularity', default='monthly')
+    parser.add_argument('--workers', default=f"1,{os.cpu_count() or 1}")
+    args = parser.parse_args()
+    version = version_of(args.gold_path)
+
+    started = time.perf_counter()
+    walk_forward = load_backtest(args.gold_path, version, args.granularity)
+    built_ms = (time.perf_counter() - started) * 1e3
+    started = time.perf_counter()
+    assert load_backtest(args.gold_path, version, args.granularity) is walk_forward
+    print(f"{args.granularity}: {len(walk_forward.folds)} folds, test periods from "
+          f"{walk_forward.test_dates[0]:%Y-%m-%d}; features + folds {built_ms:.0f} ms, "
+          f"cached {(time.perf_counter() - started) * 1e3:.2f} ms; {os.cpu_count()} CPU(s)")
+
+    print(f"{'search':<28} {'configs':>7} {'rounds':>10} {'seconds':>8} {'scaling':>8} {'best MAPE':>9}")
+    baseline_s = None
+    for workers in [int(w) for w in args.workers.split(',')]:
+        leaderboard = walk_forward.search(workers=workers)
+        report(f"early stopping, {workers} worker(s)", walk_forward, leaderboard, baseline_s)
+        baseline_s = baseline_s or walk_forward.stats['seconds']
+
+    leaderboard = walk_forward.search({**PARAM_GRID, 'n_estimators': ROUNDS_AXIS}, workers=1, early_stopping=None)
+    report("fixed rounds axis, 1 worker", walk_forward, leaderboard)
@@ -0,0 +1,54 @@
+"""
+Association rule mining: FP-growth time and peak memory per partitioning, next to
+what a dense one-hot basket matrix of the same data would take, and rule lookup
+latency by antecedent.
+
+    python -m benchmarks.bench_basket_rules 1000000 --support 0.01 --confidence 0.2
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_raw_chunks
+from src.basket_rules import RULE_COLUMNS, RuleSet, encode_baskets, mine_rules
+from src.data_loader import DataEngineer
+
+if __name__ == "__main__":
+    def option(name, default):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 1_000_000
+    min_support = float(option('--support', 0.01))
+    min_confidence = float(option('--confidence', 0.2))
+
+    df = pd.concat([DataEngineer.apply_cleaning_rules(chunk)[RULE_COLUMNS] for chunk in synthetic_raw_chunks(n_rows)],
+                   ignore_index=True)
+    offsets, codes, items = encode_baskets(df)
+    one_hot_mb = (len(offsets) - 1) * len(items) / 2**20
+    print(f"{len(df):,} rows, {len(offsets) - 1:,} baskets x {len(items):,} products "
+          f"(dense one-hot: {one_hot_mb:,.0f} MB as bool)")
+    print(f"{'partition':>10} {'rules':>8} {'mine s':>8} {'peak MB':>8} {'lookup ms':>10}")
+
+    rng = np.random.default_rng(0)
+    for by in (None, 'Country', 'Month'):
+        started = time.perf_counter()
+        rules = mine_rules(df, by, min_support, min_confidence)
+        seconds = time.perf_counter() - started
+        # Separate traced run: tracemalloc slows the pure-Python mining several times over
+        tracemalloc.start()
+        mine_rules(df, by, min_support, min_confidence)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+        ruleset = RuleSet(rules)
+        antecedents = ruleset.antecedent_items()
+        lookup_ms = float('nan')
+        if antecedents:
+            baskets = [list(rng.choice(antecedents, min(3, len(antecedents)), replace=False)) for _ in range(200)]
+            started = time.perf_counter()
+            for basket in baskets:
+                ruleset.lookup(basket)
+            lookup_ms = (time.perf_counter() - started) / len(baskets) * 1e3
+        print(f"{by or 'All':>10} {len(rules):>8,} {seconds:>8.2f} {peak_mb:>8.0f} {lookup_ms:>10.2f}")
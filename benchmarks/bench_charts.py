@@ -0,0 +1,90 @@
+"""
+Dashboard payloads: what each chart and table costs to build, serialize and ship,
+rebuilt on every rerun (the pages before the rendering layer) vs the cached, decimated
+and paged versions from src.ui_components.
+
+"per rerun" is the server work st.plotly_chart does for a figure (figure -> dict ->
+JSON) plus, when uncached, the plotly express build; payloads are the JSON (charts)
+or Arrow (tables) bytes sent to the browser. Browser-side drawing is not measured.
+
+    python -m benchmarks.bench_charts path/to/cleaned_data.parquet --points 100000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+import plotly.tools
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+from src.cohorts import pivot_cohorts
+from src.service import AnalyticsService
+from src.ui_components import CHART_MAX_POINTS, TABLE_PAGE_ROWS, SerializedFigure, decimate
+
+
+def timed_ms(func, repeat=5):
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat * 1e3
+
+
+def sent(figure):
+    """What st.plotly_chart serializes for a figure."""
+    return pio.to_json(plotly.tools.return_figure_from_figure_or_data(figure, validate_figure=True), validate=False)
+
+
+def chart_row(label, build, decimated=None):
+    """Uncached: build + serialize every rerun. Cached: the stored JSON handed over as a SerializedFigure."""
+    payload, uncached_ms = timed_ms(lambda: sent(build()))
+    cached_payload = pio.to_json(decimated() if decimated else build(), validate=False)
+    _, cached_ms = timed_ms(lambda: sent(SerializedFigure(cached_payload)))
+    print(f"{label:<34} {uncached_ms:>9.1f} {len(payload) / 1024:>9.1f} {cached_ms:>9.2f} "
+          f"{len(cached_payload) / 1024:>9.1f}")
+
+
+def table_row(label, frame):
+    payload, whole_ms = timed_ms(lambda: convert_pandas_df_to_arrow_bytes(frame))
+    page, page_ms = timed_ms(lambda: convert_pandas_df_to_arrow_bytes(frame.iloc[:TABLE_PAGE_ROWS]))
+    print(f"{label:<34} {whole_ms:>9.1f} {len(payload) / 1024:>9.1f} {page_ms:>9.2f} {len(page) / 1024:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('gold_path')
+    parser.add_argument('--points', type=int, default=100_000, help="length of the synthetic long series")
+    args = parser.parse_args()
+    service = AnalyticsService(source=lambda: (args.gold_path, 'bench'))
+
+    print(f"{'chart / table':<34} {'every ms':>9} {'every KB':>9} {'cached ms':>9} {'cached KB':>9}")
+    for freq, name in (('MS', 'monthly'), ('W-MON', 'weekly'), ('D', 'daily')):
+        trend = service.revenue_trend(None, None, freq)
+        chart_row(f"trend, {name} ({len(trend)} points)",
+                  lambda: px.area(trend, x='InvoiceDate', y='Line_Total'),
+                  lambda: px.area(decimate(trend, 'InvoiceDate', 'Line_Total'), x='InvoiceDate', y='Line_Total'))
+
+    # A series the size customer-level or intraday charts reach
+    rng = np.random.default_rng(42)
+    long = pd.DataFrame({'InvoiceDate': pd.date_range('2009-12-01', periods=args.points, freq='min'),
+                         'Line_Total': rng.normal(0, 1, args.points).cumsum()})
+    _, lttb_ms = timed_ms(lambda: decimate(long, 'InvoiceDate', 'Line_Total'), repeat=3)
+    chart_row(f"synthetic ({args.points:,} points)",
+              lambda: px.line(long, x='InvoiceDate', y='Line_Total'),
+              lambda: px.line(decimate(long, 'InvoiceDate', 'Line_Total'), x='InvoiceDate', y='Line_Total'))
+
+    countries = service.country_revenue()
+    chart_row(f"choropleth ({len(countries)} countries)",
+              lambda: px.choropleth(countries, locations='Country', locationmode='country names', color='Line_Total'))
+    segments = service.rfm_segments()
+    chart_row("segment donut", lambda: px.pie(segments, values='Count', names='Segment', hole=0.5))
+    matrix = pivot_cohorts(service.cohorts(), 'Retention') * 100
+    chart_row(f"cohort heatmap ({matrix.shape[0]}x{matrix.shape[1]})",
+              lambda: px.imshow(matrix, text_auto='.0f', aspect='auto'))
+
+    print(f"{'':<34} {'whole ms':>9} {'whole KB':>9} {'page ms':>9} {'page KB':>9}")
+    rfm = service.rfm()
+    table_row(f"RFM table ({len(rfm):,} customers)", rfm)
+    at_risk = rfm[rfm['Segment'] == 'At Risk']
+    table_row(f"At Risk segment ({len(at_risk):,})", at_risk)
+    print(f"LTTB {args.points:,} -> {CHART_MAX_POINTS} points: {lttb_ms:.1f} ms")
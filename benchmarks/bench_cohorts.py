@@ -0,0 +1,70 @@
+"""
+Cohort matrix benchmark: the groupby/transform/nunique pandas formulation vs the
+bincount engine in src.cohorts, on synthetic Gold Layer rows (same generator as the
+RFM benchmark, plus Country and Is_Cancelled for the filters).
+
+    python -m benchmarks.bench_cohorts 1000000 10000000
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_rfm import synthetic_gold_layer
+from src.cohorts import CohortMatrix, retention_curve
+
+
+def synthetic_cohort_rows(n_rows, seed=42):
+    """Customers join evenly over the span: a row can only belong to a customer who has joined by then."""
+    df = synthetic_gold_layer(n_rows, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    n_customers = max(100, n_rows // 180)
+    dates = df['InvoiceDate'].to_numpy().astype(np.int64)
+    joined = np.maximum(1, (dates - dates[0]) / (dates[-1] - dates[0] + 1) * n_customers).astype(np.int64)
+    customer = (rng.random(n_rows) * joined).astype(np.int64) + 12000
+    ids = pd.Series(pd.Categorical(customer).rename_categories(lambda code: str(code)))
+    df['Customer ID'] = ids.where(df['Customer ID'].notna())
+    df['Country'] = pd.Categorical(rng.choice(['United Kingdom', 'Germany', 'France', 'EIRE'], n_rows,
+                                              p=[0.9, 0.04, 0.03, 0.03]))
+    df['Is_Cancelled'] = rng.random(n_rows) < 0.02
+    return df
+
+
+def pandas_cohorts(df):
+    """Reference: first month per customer via transform, distinct customers per cell via nunique."""
+    df = df[df['Customer ID'].notna()]
+    month = df['InvoiceDate'].dt.year * 12 + df['InvoiceDate'].dt.month
+    first = month.groupby(df['Customer ID'], observed=True).transform('min')
+    age = month - first
+    grouped = df.groupby([first.rename('Cohort'), age.rename('Months_Since')], observed=True)
+    cells = pd.DataFrame({'Customers': grouped['Customer ID'].nunique(), 'Revenue': grouped['Line_Total'].sum()})
+    return cells.reset_index()
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000]
+    print(f"{'rows':>12} {'filter':<22} {'cohorts':>7} {'pandas s':>9} {'bincount s':>10} {'speedup':>8}")
+    for n_rows in sizes:
+        df = synthetic_cohort_rows(n_rows)
+        filters = [
+            ('all rows', df),
+            ('no cancellations', df[~df['Is_Cancelled']]),
+            ('Germany+France', df[df['Country'].isin(['Germany', 'France']) & ~df['Is_Cancelled']]),
+        ]
+        for label, rows in filters:
+            reference, pandas_s = timed(pandas_cohorts, rows)
+            table, engine_s = timed(lambda r: CohortMatrix.build(r).to_frame(), rows)
+
+            # Same non-empty cells, same counts and revenue
+            cells = table[table['Customers'] > 0].reset_index(drop=True)
+            assert len(cells) == len(reference)
+            assert (cells['Customers'].to_numpy() == reference['Customers'].to_numpy()).all()
+            assert np.allclose(cells['Revenue'].to_numpy(), reference['Revenue'].to_numpy(), rtol=1e-9)
+            retention_curve(table)
+            print(f"{n_rows:>12,} {label:<22} {table['Cohort'].nunique():>7} {pandas_s:>9.2f} {engine_s:>10.2f} "
+                  f"{pandas_s / engine_s:>7.1f}x")
@@ -0,0 +1,36 @@
+"""
+Latency of one global date-filter change: boolean mask vs binary-search slice vs
+row-group-pruned read from disk.
+
+    python -m benchmarks.bench_date_filter path/to/cleaned_data.parquet
+"""
+import sys
+import time
+import pandas as pd
+
+from src.gold_layer import read_date_range, slice_by_date
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    df = pd.read_parquet(path)
+    first, last = df['InvoiceDate'].iloc[0], df['InvoiceDate'].iloc[-1]
+    span = last - first
+    print(f"{len(df):,} rows, {span.days} days")
+    print(f"{'window':>8} {'rows':>10} {'mask ms':>9} {'slice ms':>9} {'disk ms':>9}")
+    for fraction in (0.05, 0.25, 1.0):
+        start = (last - span * fraction).date()
+        end = last.date()
+        masked, mask_s = best_of(lambda: df.loc[(df['InvoiceDate'].dt.date >= start) & (df['InvoiceDate'].dt.date <= end)])
+        sliced, slice_s = best_of(lambda: slice_by_date(df, start, end))
+        on_disk, disk_s = best_of(lambda: read_date_range(path, start, end, columns=['Country', 'Line_Total']))
+        assert len(masked) == len(sliced) == len(on_disk)
+        print(f"{fraction:>8.0%} {len(sliced):>10,} {mask_s * 1e3:>9.1f} {slice_s * 1e3:>9.3f} {disk_s * 1e3:>9.1f}")
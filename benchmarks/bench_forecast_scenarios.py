@@ -0,0 +1,71 @@
+"""
+What-if forecasting: forecast_scenarios (all lift scenarios stepped together, one
+predict() per month ahead) vs the naive recursion that, for every scenario and every
+month, appends the prediction to the history, rebuilds add_lag_features and predicts
+the last row. Both must produce the same paths.
+
+    python -m benchmarks.bench_forecast_scenarios --horizons 3,6,12,24 --scenarios 1,11,51,201
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.predictor import FEATURES, XGB_PARAMS, add_lag_features, forecast_scenarios
+
+
+def synthetic_monthly(n_months=36, seed=42):
+    """Monthly revenue with trend, a Q4 peak and noise, as the gold layer resamples it."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2009-12-01', periods=n_months, freq='MS')
+    revenue = 600_000 + 8_000 * np.arange(n_months) + 250_000 * dates.month.isin([10, 11, 12]) \
+        + rng.normal(0, 40_000, n_months)
+    return pd.DataFrame({'InvoiceDate': dates, 'Line_Total': revenue})
+
+
+def naive_scenarios(model, monthly, horizon, lifts):
+    """One scenario and one month at a time, recomputing the features from scratch."""
+    paths = np.empty((len(lifts), horizon))
+    for i, lift in enumerate(lifts):
+        history = monthly[['InvoiceDate', 'Line_Total']]
+        for step in range(horizon):
+            next_date = history['InvoiceDate'].iloc[-1] + pd.offsets.MonthBegin(1)
+            history = pd.concat([history, pd.DataFrame({'InvoiceDate': [next_date], 'Line_Total': [np.nan]})],
+                                ignore_index=True)
+            features = add_lag_features(history)
+            value = model.predict(features[FEATURES].iloc[[-1]])[0] * (1 + lift)
+            history.loc[history.index[-1], 'Line_Total'] = value
+            paths[i, step] = value
+    return paths
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+if __name__ == "__main__":
+    def option(name, default):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    horizons = [int(h) for h in option('--horizons', '3,6,12,24').split(',')]
+    scenarios = [int(s) for s in option('--scenarios', '1,11,51,201').split(',')]
+
+    monthly = add_lag_features(synthetic_monthly())
+    train = monthly.dropna()
+    model = xgb.XGBRegressor(**XGB_PARAMS).fit(train[FEATURES], train['Line_Total'])
+    print(f"{len(monthly)} months of history, lifts spread over 0-50%")
+    print(f"{'horizon':>8} {'scenarios':>10} {'naive ms':>10} {'batched ms':>11} {'speedup':>8}")
+
+    for horizon in horizons:
+        for n in scenarios:
+            lifts = np.linspace(0, 0.5, n)
+            # The naive loop is slow enough that one pass is a fair measurement
+            naive, naive_s = timed(lambda: naive_scenarios(model, monthly, horizon, lifts), repeat=1)
+            cube, batched_s = timed(lambda: forecast_scenarios(model, monthly, horizon, lifts))
+            assert np.allclose(cube.values, naive, rtol=1e-5), "batched paths differ from the naive recursion"
+            print(f"{horizon:>8} {n:>10} {naive_s * 1e3:>10.1f} {batched_s * 1e3:>11.2f} {naive_s / batched_s:>7.0f}x")
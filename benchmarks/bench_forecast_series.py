@@ -0,0 +1,66 @@
+"""
+Per-series forecasting: series trained one by one (filter, resample, features, fit
+with XGBoost's default threading) vs RevenuePredictor.train_series (one grouped
+feature pass, pooled fits with bounded threads).
+
+    python -m benchmarks.bench_forecast_series 1000000 --by Country,Segment --workers 1,2,4
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+
+from benchmarks.synthetic import synthetic_raw_chunks
+from src.data_loader import DataEngineer
+from src.predictor import FEATURES, MIN_SERIES_MONTHS, XGB_PARAMS, RevenuePredictor, add_lag_features, with_segments
+
+
+def synthetic_gold(n_rows, seed=42):
+    return pd.concat([DataEngineer.apply_cleaning_rules(chunk) for chunk in synthetic_raw_chunks(n_rows, seed)],
+                     ignore_index=True)
+
+
+def one_by_one(df, keys):
+    """The straightforward loop: every series filtered and featurized on its own."""
+    models = {}
+    for key in df[keys].dropna().drop_duplicates().itertuples(index=False):
+        mask = np.logical_and.reduce([df[k].to_numpy() == v for k, v in zip(keys, key)])
+        monthly = df[mask].set_index('InvoiceDate')['Line_Total'].resample('MS').sum().reset_index()
+        monthly = add_lag_features(monthly).dropna()
+        if len(monthly) < MIN_SERIES_MONTHS:
+            continue
+        X_train, _, y_train, _ = train_test_split(monthly[FEATURES], monthly['Line_Total'], test_size=0.2, shuffle=False)
+        models[tuple(key)] = xgb.XGBRegressor(**XGB_PARAMS).fit(X_train, y_train)
+    return models
+
+if __name__ == "__main__":
+    def option(name, default):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 1_000_000
+    keys = option('--by', 'Country').split(',')
+    workers = [int(w) for w in option('--workers', f"1,{os.cpu_count() or 1}").split(',')]
+
+    df = synthetic_gold(n_rows)
+    if 'Segment' in keys:
+        df = with_segments(df)
+    print(f"{n_rows:,} rows, series by {keys}, {os.cpu_count()} CPU(s)")
+
+    started = time.perf_counter()
+    baseline = one_by_one(df, keys)
+    baseline_s = time.perf_counter() - started
+    print(f"{'one by one':>20} {len(baseline):>6} models {baseline_s:>8.2f} s")
+
+    predictor = RevenuePredictor()
+    predictor.series_save_path = os.path.join(tempfile.mkdtemp(), 'series_models.joblib')
+    for n in workers:
+        started = time.perf_counter()
+        models = predictor.train_series(keys, df=df, workers=n)
+        seconds = time.perf_counter() - started
+        assert len(models.index) == len(baseline)
+        print(f"{f'batch, {n} worker(s)':>20} {len(models.index):>6} models {seconds:>8.2f} s "
+              f"({baseline_s / seconds:.2f}x)")
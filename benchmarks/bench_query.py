@@ -0,0 +1,77 @@
+"""
+Time and peak memory of the Logistics page computation (revenue by country over a
+date range, cancellations excluded) and the Predictor Lab's monthly series: full
+read vs projected/pushed-down read vs batch-wise aggregation. Each case runs in a
+fresh process so peak RSS isn't shared.
+
+    python -m benchmarks.bench_query path/to/cleaned_data.parquet [start] [end]
+"""
+import json
+import resource
+import subprocess
+import sys
+import time
+import pandas as pd
+
+from src.query import GoldQuery
+
+
+def country_full(path, start, end):
+    df = pd.read_parquet(path)
+    window = df[(df['InvoiceDate'] >= start) & (df['InvoiceDate'] < pd.Timestamp(end) + pd.Timedelta(days=1))]
+    return window[~window['Is_Cancelled']].groupby('Country', observed=True)['Line_Total'].sum()
+
+
+def country_projected(path, start, end):
+    query = GoldQuery(['Country', 'Line_Total'], source=path).between(start, end).exclude_cancelled()
+    return query.to_pandas().groupby('Country', observed=True)['Line_Total'].sum()
+
+
+def country_batched(path, start, end):
+    query = GoldQuery(source=path).between(start, end).exclude_cancelled()
+    return query.aggregate('Country').set_index('Country')['Line_Total']
+
+
+def monthly_full(path, start, end):
+    return pd.read_parquet(path).set_index('InvoiceDate')['Line_Total'].resample('MS').sum()
+
+
+def monthly_batched(path, start, end):
+    return GoldQuery(source=path).aggregate(freq='MS').set_index('InvoiceDate')['Line_Total']
+
+
+CASES = [country_full, country_projected, country_batched, monthly_full, monthly_batched]
+
+
+def run_case(name, path, start, end):
+    case = next(func for func in CASES if func.__name__ == name)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    result = case(path, start, end)
+    seconds = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'case': name,
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': round(peak / 1024, 1),
+        'delta_rss_mb': round((peak - baseline) / 1024, 1),
+        'checksum': round(float(result.sum()), 2),
+    }
+
+if __name__ == "__main__":
+    if '--case' in sys.argv:
+        name, path, start, end = sys.argv[sys.argv.index('--case') + 1:][:4]
+        print(json.dumps(run_case(name, path, start, end)))
+        sys.exit(0)
+
+    path = sys.argv[1]
+    first, last = GoldQuery(source=path).date_bounds()
+    start = sys.argv[2] if len(sys.argv) > 2 else str((last - (last - first) * 0.25).date())
+    end = sys.argv[3] if len(sys.argv) > 3 else str(last.date())
+    print(f"Window {start} .. {end}")
+    print(f"{'case':>18} {'seconds':>8} {'peak MB':>8} {'+MB':>8}")
+    for func in CASES:
+        out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_query', '--case', func.__name__, path, start, end],
+                             capture_output=True, text=True, check=True)
+        row = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{row['case']:>18} {row['seconds']:>8.3f} {row['peak_rss_mb']:>8.1f} {row['delta_rss_mb']:>8.1f}")
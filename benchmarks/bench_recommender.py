@@ -0,0 +1,74 @@
+"""
+Item-item recommender: index build time and peak memory as the catalogue grows, and
+batched query throughput (recommend for N customers, neighbours for N products).
+A dense item x item matrix would need n_items**2 * 4 bytes (40 GB at 100k SKUs);
+the blocked build keeps only the top-k per product.
+
+    python -m benchmarks.bench_recommender --rows 1000000 --items 5000,20000,100000,200000
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from src.recommender import ItemRecommender
+
+LINES_PER_INVOICE = 20
+ROWS_PER_CUSTOMER = 180
+
+
+def synthetic_baskets(n_rows, n_items, seed=42):
+    """Invoice x StockCode lines with a long-tail product popularity, as in the real catalogue."""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_items + 1) ** 0.8
+    n_invoices = max(1, n_rows // LINES_PER_INVOICE)
+    n_customers = max(100, n_rows // ROWS_PER_CUSTOMER)
+    invoice = np.sort(rng.integers(0, n_invoices, n_rows))
+    customer = rng.integers(0, n_customers, n_invoices)
+    return pd.DataFrame({
+        'Invoice': invoice,
+        'StockCode': rng.choice(n_items, n_rows, p=popularity / popularity.sum()),
+        'Customer ID': customer[invoice],
+    })
+
+
+def peak_memory(func, *args):
+    """(result, seconds, peak MB of Python/NumPy allocations while func ran)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+if __name__ == "__main__":
+    def option(name, default):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    n_rows = int(option('--rows', 1_000_000))
+    catalogues = [int(n) for n in option('--items', '5000,20000,100000,200000').split(',')]
+    n_queries = int(option('--queries', 10_000))
+    k = int(option('--k', 20))
+
+    print(f"{n_rows:,} basket lines, top-{k} neighbours, {n_queries:,} queries per batch")
+    print(f"{'items':>8} {'build s':>8} {'peak MB':>8} {'index MB':>9} "
+          f"{'customers/s':>12} {'products/s':>11}")
+    for n_items in catalogues:
+        baskets = synthetic_baskets(n_rows, n_items)
+        model, build_s, peak_mb = peak_memory(ItemRecommender(k=k).fit, baskets)
+        index_mb = (model.neighbors.nbytes + model.scores.nbytes) / 2**20
+
+        # Cycled when the data has fewer customers than queries
+        customers = model.customer_ids[np.arange(n_queries) % len(model.customer_ids)]
+        started = time.perf_counter()
+        model.recommend(customers, n=10)
+        customers_per_s = len(customers) / (time.perf_counter() - started)
+
+        products = model.items[np.random.default_rng(0).integers(0, len(model.items), n_queries)]
+        started = time.perf_counter()
+        model.similar_items(products, n=10)
+        products_per_s = len(products) / (time.perf_counter() - started)
+        print(f"{n_items:>8} {build_s:>8.2f} {peak_mb:>8.0f} {index_mb:>9.1f} "
+              f"{customers_per_s:>12,.0f} {products_per_s:>11,.0f}")
@@ -0,0 +1,173 @@
+"""
+Remote Gold Layer: the original full download (one GET buffered into BytesIO, then
+every column parsed) vs the parallel resumable download vs footer-first range reads,
+served by a local HTTP stand-in with per-connection bandwidth, latency and
+injected connection drops. Reports time-to-first-chart (the Logistics page's
+country revenue) and bytes transferred.
+
+    python -m benchmarks.bench_remote_parquet path/to/cleaned_data.parquet --mbps 40 --latency-ms 50
+    python -m benchmarks.bench_remote_parquet path/to/cleaned_data.parquet --fail-every 7
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+import pandas as pd
+import requests
+
+from src.gold_layer import GoldLayer
+from src.query import GoldQuery
+from src.remote_parquet import open_remote
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Static files with single byte ranges, ETag / If-None-Match and a simulated
+    link: `latency` seconds before each answer, `bytes_per_s` per connection, and
+    every `fail_every`-th response cut off halfway through its body.
+    """
+    protocol_version = 'HTTP/1.1'
+    directory = '.'
+    latency = 0.0
+    bytes_per_s = None
+    fail_every = 0
+    served = 0
+    counter_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = os.path.join(self.directory, os.path.basename(self.path.split('?')[0]))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        time.sleep(self.latency)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        start, stop = 0, stat.st_size
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            stop = min(int(match.group(2)) + 1 if match.group(2) else stat.st_size, stat.st_size)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{stop - 1}/{stat.st_size}')
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(stop - start))
+        self.end_headers()
+
+        with RangeRequestHandler.counter_lock:
+            RangeRequestHandler.served += 1
+            drop = self.fail_every and RangeRequestHandler.served % self.fail_every == 0
+        if drop:
+            stop = start + (stop - start) // 2
+        with open(path, 'rb') as fh:
+            fh.seek(start)
+            remaining = stop - start
+            while remaining:
+                piece = fh.read(min(remaining, 64 << 10))
+                self.wfile.write(piece)
+                remaining -= len(piece)
+                if self.bytes_per_s:
+                    time.sleep(len(piece) / self.bytes_per_s)
+        if drop:
+            self.close_connection = True
+
+
+def serve(directory, latency_ms=0, mbps=None, fail_every=0):
+    """Starts the stand-in on a free local port; returns (server, base_url)."""
+    handler = type('Handler', (RangeRequestHandler,), {
+        'directory': directory,
+        'latency': latency_ms / 1e3,
+        'bytes_per_s': mbps * 1e6 / 8 if mbps else None,
+        'fail_every': fail_every,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def country_revenue(query):
+    return query.aggregate('Country').set_index('Country')['Line_Total'].sort_index()
+
+
+def legacy_full_download(url):
+    """What the cloud path used to do: buffer the whole file, parse every column."""
+    started = time.perf_counter()
+    response = requests.get(url)
+    df = pd.read_parquet(BytesIO(response.content))
+    revenue = df.groupby('Country', observed=True)['Line_Total'].sum().sort_index()
+    return revenue, time.perf_counter() - started, len(response.content), 1
+
+
+def parallel_download(url, cache_dir, start=None):
+    started = time.perf_counter()
+    layer = GoldLayer(local_path='', cloud_url=url, cache_dir=cache_dir)
+    path, _ = layer.locate()
+    revenue = country_revenue(GoldQuery(['Country', 'Line_Total'], source=path).between(start))
+    return revenue, time.perf_counter() - started, layer.stats['bytes_downloaded'], layer.stats['requests']
+
+
+def range_reads(url, start=None):
+    started = time.perf_counter()
+    layer = GoldLayer(local_path='', cloud_url=url)
+    layer.remote_mode = 'range'
+    path, _ = layer.locate()
+    revenue = country_revenue(GoldQuery(['Country', 'Line_Total'], source=path).between(start))
+    stats = open_remote(url).stats
+    return revenue, time.perf_counter() - started, stats['bytes'], stats['requests']
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('gold_path')
+    parser.add_argument('--mbps', type=float, default=40.0, help="bandwidth per connection")
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--fail-every', type=int, default=0, help="cut off every Nth response")
+    args = parser.parse_args()
+
+    server, base_url = serve(os.path.dirname(os.path.abspath(args.gold_path)), args.latency_ms, args.mbps,
+                             args.fail_every)
+    name = os.path.basename(args.gold_path)
+    size = os.path.getsize(args.gold_path)
+    last_date = pd.read_parquet(args.gold_path, columns=['InvoiceDate'])['InvoiceDate'].max()
+    print(f"{name}: {size / 1e6:.1f} MB, {args.mbps:g} Mbit/s per connection, {args.latency_ms:g} ms latency"
+          + (f", every {args.fail_every}th response dropped" if args.fail_every else ""))
+    print(f"{'method':<34} {'first chart s':>13} {'MB moved':>9} {'requests':>9}")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        runs = []
+        if not args.fail_every:
+            # The original path has no retries, so it can't survive dropped connections
+            runs.append(('full GET into BytesIO (before)', lambda url: legacy_full_download(url)))
+        runs += [
+            ('parallel resumable download', lambda url: parallel_download(url, cache_dir)),
+            ('range reads, all dates', lambda url: range_reads(url)),
+            ('range reads, last 30 days', lambda url: range_reads(url, last_date - pd.Timedelta(days=29))),
+        ]
+        reference = None
+        for run, (label, method) in enumerate(runs):
+            # A distinct query string per run: nothing is served from a previous run's caches
+            revenue, seconds, moved, n_requests = method(f"{base_url}/{name}?run={run}")
+            if 'last 30' not in label:
+                reference = revenue if reference is None else reference
+                assert (revenue - reference).abs().max() < 1e-6 * reference.abs().max()
+            print(f"{label:<34} {seconds:>13.2f} {moved / 1e6:>9.2f} {n_requests:>9}")
+    finally:
+        shutil.rmtree(cache_dir)
+        server.shutdown()
@@ -0,0 +1,61 @@
+"""
+RFM engine benchmark: legacy lambda/regex implementation vs the vectorized one.
+
+    python -m benchmarks.bench_rfm 1000000 10000000 50000000
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from src.analytics import SEGMENT_PATTERNS, rfm_aggregates, score_rfm
+
+
+def synthetic_gold_layer(n_rows, n_customers=None, seed=42):
+    """Cleaned-schema frame with roughly the row/customer/invoice ratios of the real data."""
+    rng = np.random.default_rng(seed)
+    n_customers = n_customers or max(100, n_rows // 180)
+    n_invoices = max(10, n_rows // 20)
+    start = pd.Timestamp('2009-12-01').value
+    span = pd.Timedelta(days=740).value
+    customers = pd.Series(rng.integers(12000, 12000 + n_customers, n_rows).astype(str))
+    customers[rng.random(n_rows) < 0.2] = None
+    return pd.DataFrame({
+        'Invoice': rng.integers(489000, 489000 + n_invoices, n_rows).astype(str),
+        'InvoiceDate': pd.to_datetime(np.sort(rng.integers(start, start + span, n_rows))),
+        'Customer ID': customers,
+        'Line_Total': rng.gamma(2.0, 10.0, n_rows),
+    })
+
+
+def legacy_rfm(df):
+    """The pre-vectorization implementation, kept here as the reference."""
+    snapshot_date = df['InvoiceDate'].max() + pd.Timedelta(days=1)
+    rfm = df.groupby('Customer ID').agg({
+        'InvoiceDate': lambda x: (snapshot_date - x.max()).days,
+        'Invoice': 'nunique',
+        'Line_Total': 'sum'
+    }).rename(columns={'InvoiceDate': 'Recency', 'Invoice': 'Frequency', 'Line_Total': 'Monetary'})
+    rfm = rfm[rfm.index.notnull()]
+    rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
+    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
+    rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
+    rfm['RFM_Score'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str)
+    rfm['Segment'] = rfm['RFM_Score'].replace(SEGMENT_PATTERNS, regex=True)
+    return rfm
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000]
+    print(f"{'rows':>12} {'customers':>10} {'legacy s':>9} {'vector s':>9} {'speedup':>8}")
+    for n_rows in sizes:
+        df = synthetic_gold_layer(n_rows)
+        legacy, legacy_s = timed(legacy_rfm, df)
+        vectorized, vector_s = timed(lambda d: score_rfm(rfm_aggregates(d)), df)
+        pd.testing.assert_frame_equal(legacy, vectorized)
+        print(f"{n_rows:>12,} {len(vectorized):>10,} {legacy_s:>9.2f} {vector_s:>9.2f} {legacy_s / vector_s:>7.1f}x")
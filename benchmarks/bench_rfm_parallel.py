@@ -0,0 +1,33 @@
+"""
+Scaling curve of the partitioned RFM aggregation: 1..N worker processes against
+the serial path, with a results check at every point. Pools are warmed first, so
+the timings exclude worker start-up.
+
+    python -m benchmarks.bench_rfm_parallel 10000000 --workers 1,2,4,8,16
+"""
+import os
+import sys
+import pandas as pd
+
+from benchmarks.bench_rfm import synthetic_gold_layer, timed
+from src.analytics import parallel_rfm_aggregates, rfm_aggregates
+
+if __name__ == "__main__":
+    workers = [1, 2, 4, os.cpu_count() or 1]
+    if '--workers' in sys.argv:
+        pos = sys.argv.index('--workers')
+        workers = [int(w) for w in sys.argv[pos + 1].split(',')]
+        del sys.argv[pos:pos + 2]
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000]
+
+    print(f"{os.cpu_count()} CPU(s) available")
+    print(f"{'rows':>12} {'workers':>8} {'seconds':>8} {'speedup':>8}")
+    for n_rows in sizes:
+        df = synthetic_gold_layer(n_rows)
+        serial, serial_s = timed(rfm_aggregates, df)
+        print(f"{n_rows:>12,} {'serial':>8} {serial_s:>8.2f} {1.0:>7.2f}x")
+        for n in sorted(set(workers)):
+            parallel_rfm_aggregates(df.head(10_000), n)  # start the pool
+            result, seconds = timed(parallel_rfm_aggregates, df, n)
+            pd.testing.assert_frame_equal(serial, result)
+            print(f"{n_rows:>12,} {n:>8} {seconds:>8.2f} {serial_s / seconds:>7.2f}x")
@@ -0,0 +1,74 @@
+"""
+Gold Layer encodings: the original object-string schema vs the compact one
+(categoricals, int32 invoice numbers, 32-bit measures). Both files are written from
+the same synthetic rows; reported per encoding are file size, load time, in-memory
+footprint and the groupbys the pages run.
+
+    python -m benchmarks.bench_schema 1000000
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_raw_chunks
+from src.analytics import rfm_aggregates
+from src.data_loader import CATEGORICAL_COLUMNS, DataEngineer, gold_schema
+
+GROUPBYS = {
+    'revenue by Country': lambda df: df.groupby('Country', observed=True)['Line_Total'].sum(),
+    'top Descriptions': lambda df: df.groupby('Description', observed=True)['Line_Total'].sum().nlargest(5),
+    'orders by Country': lambda df: df.groupby('Country', observed=True)['Invoice'].nunique(),
+    'RFM aggregates': rfm_aggregates,
+}
+
+
+def legacy_frame(df):
+    """The compact frame decoded back to the original layout: strings everywhere."""
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+    df['Invoice'] = np.where(df['Is_Cancelled'], 'C', '') + df['Invoice'].astype(str).to_numpy(dtype=object)
+    df['Line_Total'] = df['Line_Total'].astype(np.float64)
+    return df
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    compact = pd.concat([DataEngineer.apply_cleaning_rules(chunk) for chunk in synthetic_raw_chunks(n_rows)],
+                        ignore_index=True)
+    # Categories differ per chunk, so concat falls back to object; re-encode before writing
+    compact = compact.astype({col: 'category' for col in CATEGORICAL_COLUMNS})
+
+    tmp_dir = tempfile.mkdtemp()
+    paths = {'object strings': os.path.join(tmp_dir, 'object_strings.parquet'),
+             'compact': os.path.join(tmp_dir, 'compact.parquet')}
+    legacy_frame(compact).to_parquet(paths['object strings'], index=False, row_group_size=100_000)
+    compact.to_parquet(paths['compact'], index=False, row_group_size=100_000, schema=gold_schema(compact))
+    del compact
+
+    print(f"{len(pd.read_parquet(paths['compact'], columns=['Invoice'])):,} cleaned rows")
+    results = {}
+    for name, path in paths.items():
+        df, load_s = timed(pd.read_parquet, path)
+        row = {'file MB': os.path.getsize(path) / 2**20, 'load s': load_s,
+               'memory MB': df.memory_usage(deep=True).sum() / 2**20}
+        for label, func in GROUPBYS.items():
+            row[f'{label} ms'] = timed(func, df)[1] * 1e3
+        results[name] = row
+        del df
+
+    print(f"{'':>24} {'object strings':>15} {'compact':>10} {'ratio':>7}")
+    for metric in results['compact']:
+        before, after = results['object strings'][metric], results['compact'][metric]
+        print(f"{metric:>24} {before:>15.2f} {after:>10.2f} {before / after:>6.1f}x")
@@ -0,0 +1,90 @@
+"""
+Throughput of the analytics service under concurrent sessions. Each session thread
+replays page reruns (cockpit, logistics, customers) with date windows drawn from a
+small set, as users moving the same slider do. Compares no result cache (every
+rerun recomputes), the shared in-process cache, and the same cache behind the HTTP
+endpoint.
+
+    python -m benchmarks.bench_service path/to/cleaned_data.parquet --sessions 1,4,16 --reruns 20
+"""
+import argparse
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from src.gold_layer import version_of
+from src.query import GoldQuery
+from src.service import AnalyticsClient, AnalyticsService, ResultCache, serve
+
+
+def rerun(api, window):
+    """The service calls of one rerun of each thin-client page."""
+    start, end = window
+    api.date_bounds()
+    api.kpis(start, end)
+    api.revenue_trend(start, end)
+    api.top_products(start, end, 5)
+    api.country_revenue(start, end)
+    api.rfm_segments()
+    api.segment_customers('At Risk', 10)
+    api.segment_customers('Champions', 10)
+    return 8
+
+
+def run_sessions(make_api, windows, sessions, reruns, seed=42):
+    latencies = []
+    calls = [0]
+    lock = threading.Lock()
+
+    def session(idx):
+        api = make_api()
+        rng = np.random.default_rng(seed + idx)
+        for _ in range(reruns):
+            started = time.perf_counter()
+            n = rerun(api, windows[rng.integers(len(windows))])
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                calls[0] += n
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return calls[0] / elapsed, np.percentile(latencies, 50) * 1e3, np.percentile(latencies, 95) * 1e3
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('gold_path')
+    parser.add_argument('--sessions', default='1,4,16')
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--windows', type=int, default=6, help="distinct date windows the sessions pick from")
+    args = parser.parse_args()
+
+    version = version_of(args.gold_path)
+    source = lambda: (args.gold_path, version)
+    first, last = GoldQuery(source=args.gold_path).date_bounds()
+    # Trailing windows of 1..N months ending at the last day, like the sidebar's date slider
+    windows = [((last - pd.DateOffset(months=m)).date(), last.date()) for m in range(1, args.windows + 1)]
+    # Warm the daily cube and the RFM state once, so every mode starts from the same place
+    AnalyticsService(ResultCache(max_bytes=0), source).kpis()
+    AnalyticsService(ResultCache(max_bytes=0), source).rfm()
+
+    print(f"{'mode':<22} {'sessions':>8} {'queries/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for sessions in [int(s) for s in args.sessions.split(',')]:
+        uncached = AnalyticsService(ResultCache(max_bytes=0), source)
+        shared = AnalyticsService(ResultCache(), source)
+        server = serve(AnalyticsService(ResultCache(), source), port=0)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        modes = [
+            ('no result cache', lambda: uncached),
+            ('shared cache', lambda: shared),
+            ('shared cache, HTTP', lambda: AnalyticsClient(url)),
+        ]
+        for label, make_api in modes:
+            qps, p50, p95 = run_sessions(make_api, windows, sessions, args.reruns)
+            print(f"{label:<22} {sessions:>8} {qps:>10.0f} {p50:>8.1f} {p95:>8.1f}")
+        server.shutdown()
@@ -0,0 +1,112 @@
+"""
+Several server processes loading the whole Gold Layer: pd.read_parquet (every process
+decodes its own copy) vs the memory-mapped Arrow snapshot (one page-cache copy shared
+by all of them). Each worker loads the frame, runs a country groupby over it and then
+holds it while the others load, so the memory figures are taken with all N alive.
+
+RSS counts shared pages in every process that maps them; PSS splits them between
+the processes, so the PSS sum is what the machine actually spends. Page cache is warm
+for both paths (the Parquet file and the snapshot are read once beforehand).
+
+    python -m benchmarks.bench_snapshot path/to/cleaned_data.parquet --processes 1,4,8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from src.gold_layer import snapshot_path_for, version_of, write_snapshot
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def memory_mb():
+    """Rss, Pss and private (clean + dirty) MB of this process from /proc/self/smaps_rollup."""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as fh:
+        for line in fh:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                fields[name] = int(value.split()[0]) / 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'], 'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def worker(mode, gold_path):
+    """Child process: load, touch every row once, report, then wait for the parent to let go."""
+    import pandas as pd
+    from src.gold_layer import read_gold_table
+    baseline = memory_mb()
+    started = time.perf_counter()
+    if mode == 'parquet':
+        df = pd.read_parquet(gold_path)
+    else:
+        df = read_gold_table(gold_path)
+    load_s = time.perf_counter() - started
+    df.groupby('Country', observed=True)['Line_Total'].sum()
+    first_query_s = time.perf_counter() - started
+    print(json.dumps({'load_s': load_s, 'first_query_s': first_query_s, 'baseline': baseline}), flush=True)
+    sys.stdin.readline()
+    print(json.dumps(memory_mb()), flush=True)
+    sys.stdin.readline()
+
+
+def run(mode, gold_path, processes):
+    """Starts `processes` workers, waits until all have loaded, then samples their memory."""
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    children = [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_snapshot', gold_path, '--worker', mode],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env, cwd=PROJECT_ROOT)
+                for _ in range(processes)]
+    loads = [json.loads(child.stdout.readline()) for child in children]
+    memory = []
+    for child in children:
+        child.stdin.write('\n')
+        child.stdin.flush()
+        memory.append(json.loads(child.stdout.readline()))
+    for child in children:
+        child.stdin.write('\n')
+        child.stdin.flush()
+        child.wait()
+
+    def mean(values):
+        return sum(values) / len(values)
+
+    return {
+        'load_ms': mean([load['load_s'] for load in loads]) * 1e3,
+        'first_query_ms': mean([load['first_query_s'] for load in loads]) * 1e3,
+        # Memory added by loading, on top of the interpreter and imports
+        'rss_mb': mean([m['rss'] - load['baseline']['rss'] for m, load in zip(memory, loads)]),
+        'pss_total_mb': sum(m['pss'] - load['baseline']['pss'] for m, load in zip(memory, loads)),
+        'private_mb': mean([m['private'] - load['baseline']['private'] for m, load in zip(memory, loads)]),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('gold_path')
+    parser.add_argument('--processes', default='1,4,8')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker, args.gold_path)
+        sys.exit(0)
+
+    snapshot_path = snapshot_path_for(args.gold_path)
+    started = time.perf_counter()
+    import pyarrow.parquet as pq
+    write_snapshot(pq.read_table(args.gold_path), snapshot_path, version_of(args.gold_path))
+    print(f"{os.path.basename(args.gold_path)}: {os.path.getsize(args.gold_path) / 1e6:.1f} MB Parquet, "
+          f"{os.path.getsize(snapshot_path) / 1e6:.1f} MB snapshot (published in {time.perf_counter() - started:.2f} s)")
+    # Warm the page cache for both files
+    for path in (args.gold_path, snapshot_path):
+        with open(path, 'rb') as fh:
+            while fh.read(1 << 24):
+                pass
+
+    print(f"{'mode':<10} {'procs':>5} {'load ms':>8} {'1st query ms':>12} {'RSS/proc MB':>11} "
+          f"{'private/proc MB':>15} {'PSS total MB':>12}")
+    for processes in [int(p) for p in args.processes.split(',')]:
+        for mode in ('parquet', 'snapshot'):
+            r = run(mode, args.gold_path, processes)
+            print(f"{mode:<10} {processes:>5} {r['load_ms']:>8.0f} {r['first_query_ms']:>12.0f} {r['rss_mb']:>11.0f} "
+                  f"{r['private_mb']:>15.0f} {r['pss_total_mb']:>12.0f}")
@@ -0,0 +1,297 @@
+"""
+End-to-end benchmark suite on seeded synthetic data: ETL, analytics, forecasting and
+the compute behind each dashboard page, without Streamlit.
+
+Each stage runs in its own process, so peak RSS belongs to that stage alone; the
+process's import footprint is reported next to it. Results go to JSON, and --compare
+diffs two result files stage by stage.
+
+    python -m benchmarks.suite --rows 1000000,10000000,50000000 --output bench_results.json
+    python -m benchmarks.suite --rows 1000000 --skip clean_data
+    python -m benchmarks.suite --compare before.json after.json
+"""
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+from benchmarks.synthetic import write_raw_csv
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_ROWS = [1_000_000, 10_000_000, 50_000_000]
+PACKAGES = ['pandas', 'numpy', 'pyarrow', 'xgboost', 'scikit-learn', 'streamlit']
+
+
+# --- 1. Stages (run inside the child process) ---
+def stage_clean_data_streaming(ctx):
+    from src.data_loader import DataEngineer
+    return DataEngineer().clean_data_streaming()['rows_in']
+
+
+def stage_clean_data(ctx):
+    from src.data_loader import DataEngineer
+    engineer = DataEngineer()
+    # Written beside the streaming output so later stages keep using that one
+    engineer.output_path = ctx['in_memory_path']
+    return len(engineer.clean_data())
+
+
+def stage_generate_rfm(ctx):
+    from src.analytics import CustomerAnalytics
+    analyzer = CustomerAnalytics()
+    analyzer.generate_rfm()
+    return len(analyzer.df)
+
+
+def stage_train_forecaster(ctx):
+    from src.predictor import RevenuePredictor
+    predictor = RevenuePredictor()
+    predictor.model_save_path = ctx['model_path']
+    predictor.train_forecaster()
+    return ctx['gold_rows']
+
+
+def stage_page_cockpit(ctx):
+    """main_app.py: cube (ETL-built, loaded from disk) plus whole-range and last-90-days KPIs."""
+    from src.cube import load_cube
+    from src.gold_layer import gold_source
+    from src.query import GoldQuery
+    path, version = gold_source()
+    cube = load_cube(None, version, path)
+    first, last = GoldQuery(source=path).date_bounds()
+    for start in (first, last - np.timedelta64(90, 'D')):
+        cube.kpis(start, last)
+        cube.revenue_trend(start, last)
+        cube.top_products(start, last, n=5)
+    return ctx['gold_rows']
+
+
+def stage_page_logistics(ctx):
+    """01_Logistics_Intelligence.py: revenue by country over the whole range."""
+    from src.gold_layer import gold_source
+    from src.query import GoldQuery
+    path, _ = gold_source()
+    first, last = GoldQuery(source=path).date_bounds()
+    GoldQuery(['Country', 'Line_Total'], source=path).between(first, last).aggregate('Country')
+    return ctx['gold_rows']
+
+
+def stage_page_customer(ctx):
+    """02_Customer_Intelligence.py: cold RFM state built from the projected columns."""
+    from src.analytics import RFM_COLUMNS, CustomerAnalytics
+    from src.gold_layer import gold_source
+    from src.query import GoldQuery
+    path, _ = gold_source()
+    if os.path.exists(ctx['rfm_state_path']):
+        os.remove(ctx['rfm_state_path'])
+    CustomerAnalytics(GoldQuery(RFM_COLUMNS, source=path).to_pandas()).generate_rfm_incremental(ctx['rfm_state_path'])
+    return ctx['gold_rows']
+
+
+def stage_page_predictor(ctx):
+    """03_Predictor_Lab.py: monthly features from the feature store and the registered model's predictions."""
+    from src.features import FEATURES, load_features
+    from src.gold_layer import gold_source
+    from src.predictor import FEATURE_SPEC, FORECAST_MODEL
+    from src.registry import ModelRegistry
+    path, version = gold_source()
+    monthly = load_features(path, version, 'monthly').dropna(subset=FEATURES)
+    model, _ = ModelRegistry().load(FORECAST_MODEL, version, FEATURE_SPEC)
+    model.predict(monthly[FEATURES])
+    return ctx['gold_rows']
+
+
+# name -> (function, stages it needs)
+STAGES = {
+    'clean_data_streaming': (stage_clean_data_streaming, []),
+    'clean_data': (stage_clean_data, []),
+    'generate_rfm': (stage_generate_rfm, ['clean_data_streaming']),
+    'train_forecaster': (stage_train_forecaster, ['clean_data_streaming']),
+    'page_cockpit': (stage_page_cockpit, ['clean_data_streaming']),
+    'page_logistics': (stage_page_logistics, ['clean_data_streaming']),
+    'page_customer': (stage_page_customer, ['clean_data_streaming']),
+    'page_predictor': (stage_page_predictor, ['train_forecaster']),
+}
+
+
+def peak_rss_mb():
+    """
+    High-water RSS of this process. VmHWM starts fresh at exec, whereas ru_maxrss on
+    Linux carries over the parent's peak, so it is only the fallback.
+    """
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_stage_in_process(name, ctx):
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    rows = STAGES[name][0](ctx)
+    seconds = time.perf_counter() - started
+    peak = peak_rss_mb()
+    return {
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': round(peak, 1),
+        'baseline_rss_mb': round(baseline, 1),
+        'rows': rows,
+        'rows_per_sec': round(rows / seconds) if seconds else None,
+    }
+
+
+# --- 2. Orchestration (parent process) ---
+def environment():
+    from importlib.metadata import PackageNotFoundError, version
+    packages = {}
+    for name in PACKAGES:
+        try:
+            packages[name] = version(name)
+        except PackageNotFoundError:
+            packages[name] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        memory_gb = round(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 2**30, 1)
+    except (ValueError, OSError, AttributeError):
+        memory_gb = None
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'memory_gb': memory_gb,
+        'packages': packages,
+    }
+
+
+def run_stage(name, ctx, timeout=None):
+    env = dict(
+        os.environ,
+        RAW_DATA_PATH=ctx['raw_path'],
+        PROCESSED_DATA_PATH=ctx['gold_path'],
+        PROCESSED_DATASET_PATH='',  # never pick up a developer's partitioned dataset
+        RFM_STATE_PATH=ctx['rfm_state_path'],
+        MODEL_REGISTRY_DIR=ctx['registry_dir'],
+        PYTHONPATH=PROJECT_ROOT,
+    )
+    command = [sys.executable, '-m', 'benchmarks.suite', '--stage', name, '--context', json.dumps(ctx)]
+    try:
+        out = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'status': 'timeout'}
+    if out.returncode != 0:
+        lines = (out.stderr or out.stdout).strip().splitlines()
+        # A negative return code is a signal, typically the OOM killer (-9)
+        return {'status': 'failed', 'returncode': out.returncode, 'error': lines[-1] if lines else ''}
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return dict(result, status='ok')
+
+
+def run_suite(sizes, stages, data_dir, seed=42, timeout=None, keep=False):
+    report = dict(environment(), seed=seed, results=[])
+    for n_rows in sizes:
+        raw_path = os.path.join(data_dir, f'raw_{n_rows}_{seed}.csv')
+        if not os.path.exists(raw_path):
+            print(f"🧪 Generating {n_rows:,} synthetic rows -> {raw_path}")
+            write_raw_csv(raw_path, n_rows, seed)
+        work_dir = os.path.join(data_dir, f'run_{n_rows}_{seed}')
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        ctx = {
+            'raw_path': raw_path,
+            'gold_path': os.path.join(work_dir, 'cleaned_data.parquet'),
+            'in_memory_path': os.path.join(work_dir, 'in_memory', 'cleaned_data.parquet'),
+            'model_path': os.path.join(work_dir, 'revenue_model.pkl'),
+            'rfm_state_path': os.path.join(work_dir, 'rfm_state.npz'),
+            'registry_dir': os.path.join(work_dir, 'registry'),
+            'gold_rows': None,
+        }
+
+        finished = set()
+        for name in stages:
+            missing = [dep for dep in STAGES[name][1] if dep not in finished]
+            if missing:
+                result = {'status': 'skipped', 'error': f"needs {', '.join(missing)}"}
+            else:
+                result = run_stage(name, ctx, timeout)
+            if result['status'] == 'ok':
+                finished.add(name)
+                if name == 'clean_data_streaming':
+                    import pyarrow.parquet as pq
+                    ctx['gold_rows'] = pq.ParquetFile(ctx['gold_path']).metadata.num_rows
+            report['results'].append(dict(result, input_rows=n_rows, stage=name))
+            shown = (f"{result['seconds']:>9.2f} s {result['peak_rss_mb']:>9.1f} MB"
+                     if result['status'] == 'ok' else f"{result['status']}: {result.get('error', '')}")
+            print(f"{n_rows:>12,} {name:>22} {shown}")
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def compare(before_path, after_path, threshold=0.10):
+    """Prints time and memory ratios per (rows, stage); returns the regressions beyond threshold."""
+    with open(before_path) as fh:
+        before = {(r['input_rows'], r['stage']): r for r in json.load(fh)['results']}
+    with open(after_path) as fh:
+        after = {(r['input_rows'], r['stage']): r for r in json.load(fh)['results']}
+    regressions = []
+    print(f"{'rows':>12} {'stage':>22} {'time':>8} {'memory':>8}")
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        if old['status'] != 'ok' or new['status'] != 'ok':
+            print(f"{key[0]:>12,} {key[1]:>22} {old['status']} -> {new['status']}")
+            if old['status'] == 'ok':
+                regressions.append(key)
+            continue
+        time_ratio = new['seconds'] / old['seconds'] if old['seconds'] else float('nan')
+        memory_ratio = new['peak_rss_mb'] / old['peak_rss_mb']
+        flag = ' ⚠️' if time_ratio > 1 + threshold or memory_ratio > 1 + threshold else ''
+        if flag:
+            regressions.append(key)
+        print(f"{key[0]:>12,} {key[1]:>22} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def _option(name, default=None):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+if __name__ == "__main__":
+    if '--stage' in sys.argv:
+        print(json.dumps(run_stage_in_process(_option('--stage'), json.loads(_option('--context')))))
+        sys.exit(0)
+    if '--compare' in sys.argv:
+        pos = sys.argv.index('--compare')
+        found = compare(sys.argv[pos + 1], sys.argv[pos + 2], float(_option('--threshold', 0.10)))
+        sys.exit(1 if found else 0)
+
+    sizes = [int(n) for n in _option('--rows', ','.join(map(str, DEFAULT_ROWS))).split(',')]
+    skip = set(filter(None, _option('--skip', '').split(',')))
+    only = _option('--stages')
+    stages = [name for name in (only.split(',') if only else STAGES) if name not in skip]
+    data_dir = _option('--data-dir', os.getenv("BENCH_DATA_DIR", os.path.join(PROJECT_ROOT, 'data', 'bench')))
+    timeout = _option('--timeout')
+
+    report = run_suite(sizes, stages, data_dir, seed=int(_option('--seed', 42)),
+                       timeout=float(timeout) if timeout else None, keep='--keep' in sys.argv)
+    output = _option('--output', os.path.join(data_dir, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"))
+    with open(output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    print(f"📄 Results written to {output}")
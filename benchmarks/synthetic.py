@@ -0,0 +1,113 @@
+"""
+Seeded generator for the raw retail export read by DataEngineer (Online Retail II layout).
+
+Ratios follow the real 1.07M-row extract: ~20 lines per invoice, ~180 rows per
+customer, ~22% guest lines without Customer ID, ~2% cancelled invoices ('C' prefix,
+negative quantities), a few missing descriptions and zero prices for the cleaning
+rules to drop, and a UK-heavy country mix. Rows come out in InvoiceDate order over
+the original two-year span, whatever the row count.
+
+    python -m benchmarks.synthetic 10000000 data/bench/raw_10000000.csv
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+RAW_COLUMNS = ['Invoice', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'Price', 'Customer ID', 'Country']
+
+START = pd.Timestamp('2009-12-01 07:45:00')
+END = pd.Timestamp('2011-12-09 12:50:00')
+N_PRODUCTS = 5_000
+LINES_PER_INVOICE = 20
+ROWS_PER_CUSTOMER = 180
+
+COUNTRIES = {
+    'United Kingdom': 0.90, 'EIRE': 0.018, 'Germany': 0.017, 'France': 0.014, 'Netherlands': 0.005,
+    'Spain': 0.004, 'Switzerland': 0.003, 'Belgium': 0.003, 'Portugal': 0.003, 'Australia': 0.002,
+    'Channel Islands': 0.002, 'Italy': 0.002, 'Norway': 0.002, 'Sweden': 0.002, 'Cyprus': 0.002,
+    'Finland': 0.002, 'Austria': 0.002, 'Denmark': 0.002, 'Japan': 0.002, 'Poland': 0.002,
+    'USA': 0.002, 'Unspecified': 0.001, 'Greece': 0.001, 'Canada': 0.001, 'Singapore': 0.001,
+    'Iceland': 0.001, 'Israel': 0.001, 'Brazil': 0.001,
+}
+
+
+def _catalogue(rng):
+    codes = np.array([f"{c}" for c in rng.choice(np.arange(10_000, 99_999), N_PRODUCTS, replace=False)])
+    descriptions = np.array([f"PRODUCT {code} {word}" for code, word in
+                             zip(codes, rng.choice(['MUG', 'LANTERN', 'BAG', 'CANDLE', 'CARD', 'SIGN'], N_PRODUCTS))])
+    prices = np.round(rng.lognormal(1.0, 0.8, N_PRODUCTS), 2).astype(np.float32)
+    # Popularity follows a long tail, like the real catalogue
+    weights = 1.0 / np.arange(1, N_PRODUCTS + 1) ** 0.8
+    return codes, descriptions, prices, weights / weights.sum()
+
+
+def synthetic_raw_chunks(n_rows, seed=42, chunk_rows=1_000_000):
+    """Yields raw-export DataFrames of up to chunk_rows rows; same seed, same rows."""
+    rng = np.random.default_rng(seed)
+    codes, descriptions, prices, popularity = _catalogue(rng)
+    country_names = np.array(list(COUNTRIES))
+    country_weights = np.array(list(COUNTRIES.values()))
+    country_weights = country_weights / country_weights.sum()
+    n_customers = max(100, n_rows // ROWS_PER_CUSTOMER)
+    span = (END - START).value
+    next_invoice = 489_434
+
+    for first in range(0, n_rows, chunk_rows):
+        n = min(chunk_rows, n_rows - first)
+        # 1. Invoices: a new one starts on ~1 row in LINES_PER_INVOICE
+        starts = rng.random(n) < 1 / LINES_PER_INVOICE
+        starts[0] = True
+        line_invoice = np.cumsum(starts) - 1
+        n_invoices = int(starts.sum())
+        invoice_no = next_invoice + np.arange(n_invoices)
+        next_invoice += n_invoices
+
+        # 2. Per-invoice attributes, broadcast to the lines
+        row_pos = first + np.flatnonzero(starts)
+        invoice_date = START.value + (row_pos / n_rows * span).astype(np.int64)
+        invoice_date -= invoice_date % 60_000_000_000  # whole minutes, as in the export
+        cancelled = rng.random(n_invoices) < 0.02
+        customer = rng.integers(12_346, 12_346 + n_customers, n_invoices).astype(str).astype(object)
+        customer[rng.random(n_invoices) < 0.22] = None
+        country = rng.choice(len(country_names), n_invoices, p=country_weights)
+
+        # 3. Line attributes
+        product = rng.choice(N_PRODUCTS, n, p=popularity)
+        quantity = rng.geometric(0.15, n).astype(np.int32)
+        quantity[cancelled[line_invoice]] *= -1
+        price = prices[product].copy()
+        price[rng.random(n) < 0.005] = 0.0
+        description = descriptions[product].astype(object)
+        description[rng.random(n) < 0.003] = None
+
+        invoice = np.char.add(np.where(cancelled, 'C', ''), invoice_no.astype(str))
+        yield pd.DataFrame({
+            'Invoice': invoice[line_invoice],
+            'StockCode': codes[product],
+            'Description': description,
+            'Quantity': quantity,
+            'InvoiceDate': pd.to_datetime(invoice_date[line_invoice]),
+            'Price': price,
+            'Customer ID': customer[line_invoice],
+            'Country': country_names[country[line_invoice]],
+        }, columns=RAW_COLUMNS)
+
+
+def write_raw_csv(path, n_rows, seed=42, chunk_rows=1_000_000):
+    """Writes the synthetic export as CSV in chunks (bounded memory) and swaps it in atomically."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    header = True
+    for chunk in synthetic_raw_chunks(n_rows, seed, chunk_rows):
+        chunk.to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False,
+                     date_format='%Y-%m-%d %H:%M:%S')
+        header = False
+    os.replace(tmp_path, path)
+    return path
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    out = sys.argv[2] if len(sys.argv) > 2 else f"raw_{n_rows}.csv"
+    write_raw_csv(out, n_rows)
+    print(f"✅ {n_rows:,} synthetic rows written to {out}")
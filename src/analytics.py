@@ -1,11 +1,27 @@
 import pandas as pd
 import numpy as np
+import hashlib
 import os
+import re
+import pyarrow as pa
+import pyarrow.compute as pc
 from dotenv import load_dotenv
 
+from src.instrumentation import instrumented, record_rows
+from src.parallel import SharedTable, get_pool, resolve_workers, run_on_shared_table
+
 load_dotenv()
 
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RFM_STATE_PATH = os.getenv("RFM_STATE_PATH", os.path.join(PROJECT_ROOT, 'data', 'processed', 'rfm_state.npz'))
+RFM_COLUMNS = ['Customer ID', 'Invoice', 'InvoiceDate', 'Line_Total']
+# Rows of the already folded history compared to detect a rebuilt dataset
+HISTORY_SAMPLE_ROWS = 64
+# New (customer, invoice) keys buffered before they are merged into the sorted array
+PAIR_BUFFER_MIN = 1 << 16
+
 class CustomerAnalytics:
+    @instrumented('analytics.init')
     def __init__(self, input_df=None, **kwargs):
         # The 'Super-Flexible' Constructor
         # This handles 'input_df', 'df', or positional arguments
@@ -20,46 +36,389 @@ class CustomerAnalytics:
                 self.df = pd.read_parquet(path)
             else:
                 self.df = pd.DataFrame()
-        
-        print(f"DEBUG: CustomerAnalytics initialized with {len(self.df)} rows.")
+        record_rows(len(self.df))
+
+    @instrumented('analytics.generate_rfm')
+    def generate_rfm(self, workers=None):
+        """workers > 1 (or ANALYTICS_WORKERS) aggregates customer partitions on a process pool."""
+        if self.df.empty:
+            return pd.DataFrame()
+        record_rows(len(self.df))
+        if resolve_workers(workers) > 1:
+            return score_rfm(parallel_rfm_aggregates(self.df, workers))
+        return score_rfm(rfm_aggregates(self.df))
 
-    def generate_rfm(self):
+    @instrumented('analytics.generate_rfm_incremental')
+    def generate_rfm_incremental(self, state_path=None):
+        """Same result as generate_rfm, but only rows newer than the saved RFMState are aggregated."""
         if self.df.empty:
             return pd.DataFrame()
+        state_path = state_path or RFM_STATE_PATH
+        state = RFMState.load(state_path)
+        record_rows(len(self.df))
+        if state.refresh(self.df):
+            state.save(state_path)
+        return state.rfm()
+
+
+# Score patterns as originally written; applied in order, like Series.replace(regex=True)
+SEGMENT_PATTERNS = {
+    r'[1-2][1-2]': 'Hibernating', r'[1-2][3-4]': 'At Risk', r'[1-2]5': 'Can\'t Lose Them',
+    r'3[1-2]': 'About to Sleep', r'33': 'Need Attention', r'[3-4][4-5]': 'Loyalists',
+    r'41': 'Promising', r'51': 'New Customers', r'[4-5][2-3]': 'Potential Loyalists',
+    r'5[4-5]': 'Champions'
+}
+
 
-        df = self.df
+def _build_segment_table():
+    """Evaluates the patterns once for all 25 (R, F) pairs -> 5x5 lookup tables."""
+    scores = np.empty((5, 5), dtype=object)
+    segments = np.empty((5, 5), dtype=object)
+    for r in range(1, 6):
+        for f in range(1, 6):
+            label = f"{r}{f}"
+            for pattern, segment in SEGMENT_PATTERNS.items():
+                label = re.sub(pattern, segment, label)
+            scores[r - 1, f - 1] = f"{r}{f}"
+            segments[r - 1, f - 1] = label
+    return scores, segments
+
+
+RFM_SCORE_TABLE, SEGMENT_TABLE = _build_segment_table()
+
+
+def rfm_aggregates(df, snapshot_date=None):
+    """
+    Per-customer Recency/Frequency/Monetary. Each key column is hashed exactly once;
+    every reduction then runs on integer codes.
+    """
+    if snapshot_date is None:
         snapshot_date = df['InvoiceDate'].max() + pd.Timedelta(days=1)
-        
-        rfm = df.groupby('Customer ID').agg({
-            'InvoiceDate': lambda x: (snapshot_date - x.max()).days,
-            'Invoice': 'nunique',
-            'Line_Total': 'sum'
-        }).rename(columns={'InvoiceDate': 'Recency', 'Invoice': 'Frequency', 'Line_Total': 'Monetary'})
-
-        rfm = rfm[rfm.index.notnull()]
-        
-        # Define bins safely
-        for col in ['Recency', 'Frequency', 'Monetary']:
-            if rfm[col].nunique() < 5: # Handle edge cases with small data
-                rfm[col + '_Score'] = 1
-            else:
-                if col == 'Recency':
-                    rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
-                elif col == 'Frequency':
-                    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
-                else:
-                    rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
-
-        rfm['RFM_Score'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str)
-        
-        segs = {
-            r'[1-2][1-2]': 'Hibernating', r'[1-2][3-4]': 'At Risk', r'[1-2]5': 'Can\'t Lose Them',
-            r'3[1-2]': 'About to Sleep', r'33': 'Need Attention', r'[3-4][4-5]': 'Loyalists',
-            r'41': 'Promising', r'51': 'New Customers', r'[4-5][2-3]': 'Potential Loyalists',
-            r'5[4-5]': 'Champions'
-        }
-        rfm['Segment'] = rfm['RFM_Score'].replace(segs, regex=True)
-        return rfm
+
+    # sort=True keeps the customer order identical to groupby('Customer ID') on strings;
+    # a categorical column is factorized on its codes, once its categories are in that order
+    customer_ids = df['Customer ID']
+    if isinstance(customer_ids.dtype, pd.CategoricalDtype):
+        customer_ids = customer_ids.cat.set_categories(customer_ids.cat.categories.sort_values())
+    cust_codes, customers = pd.factorize(customer_ids, sort=True)
+    customers = np.asarray(customers, dtype=object)
+    inv_codes, invoices = pd.factorize(df['Invoice'])
+    valid = (cust_codes >= 0) & (inv_codes >= 0)
+    cust_codes = cust_codes[valid]
+    n_customers = len(customers)
+
+    grouped = df.loc[valid, ['InvoiceDate', 'Line_Total']].groupby(cust_codes, sort=True)
+    last_purchase = grouped['InvoiceDate'].max().to_numpy()
+    monetary = grouped['Line_Total'].sum().to_numpy()
+
+    # Distinct invoices per customer = distinct (customer, invoice) pairs counted per customer
+    pairs = pd.unique(cust_codes.astype(np.int64) * len(invoices) + inv_codes[valid])
+    frequency = np.bincount(pairs // len(invoices), minlength=n_customers)
+
+    return pd.DataFrame({
+        'Recency': (snapshot_date - pd.DatetimeIndex(last_purchase)).days.astype(np.int64),
+        'Frequency': frequency.astype(np.int64),
+        'Monetary': monetary
+    }, index=pd.Index(customers, name='Customer ID'))
+
+
+def _partition_ids(table, start, stop, n_partitions):
+    """Worker: hash partition of each row in [start, stop), by Customer ID."""
+    customers = table.column('Customer ID').slice(start, stop - start).to_pandas()
+    hashes = pd.util.hash_pandas_object(customers, index=False).to_numpy()
+    return (hashes % np.uint64(n_partitions)).astype(np.int32)
+
+
+def _partition_aggregates(table, start, stop, snapshot_date):
+    """Worker: rfm_aggregates over one customer partition."""
+    return rfm_aggregates(table.slice(start, stop - start).to_pandas(), snapshot_date)
+
+
+def parallel_rfm_aggregates(data, workers=None, partitions_per_worker=2):
+    """
+    rfm_aggregates on a process pool; same result as the serial path.
+
+    1. Workers hash Customer ID over contiguous row ranges into partition ids.
+    2. Rows are regrouped by partition (stable, so per-customer row order is kept)
+       and each partition is aggregated by a worker; a customer lives in exactly
+       one partition, so partials only need concatenating.
+    Both passes read an Arrow copy of the four RFM columns from shared memory.
+    Scoring stays global (score_rfm on the merged table).
+    """
+    workers = resolve_workers(workers)
+    if isinstance(data, pd.DataFrame):
+        data = pa.Table.from_pandas(data[RFM_COLUMNS], preserve_index=False)
+    table = data.select(RFM_COLUMNS)
+    if workers == 1 or table.num_rows == 0:
+        return rfm_aggregates(table.to_pandas())
+
+    pool = get_pool(workers)
+    snapshot_date = pd.Timestamp(pc.max(table.column('InvoiceDate')).as_py()) + pd.Timedelta(days=1)
+    n_partitions = workers * partitions_per_worker
+
+    # 1. Hash partitioning, one row range per worker
+    bounds = np.linspace(0, table.num_rows, workers + 1).astype(np.int64)
+    with SharedTable(table.select(['Customer ID'])) as shared:
+        futures = [pool.submit(run_on_shared_table, shared.name, _partition_ids, start, stop, n_partitions)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        partition_ids = np.concatenate([future.result() for future in futures])
+
+    # 2. Per-partition aggregation
+    order = np.argsort(partition_ids, kind='stable')
+    offsets = np.r_[0, np.cumsum(np.bincount(partition_ids, minlength=n_partitions))]
+    with SharedTable(table.take(pa.array(order))) as shared:
+        futures = [pool.submit(run_on_shared_table, shared.name, _partition_aggregates, start, stop, snapshot_date)
+                   for start, stop in zip(offsets[:-1], offsets[1:]) if stop > start]
+        partials = [future.result() for future in futures]
+    return pd.concat(partials).sort_index()
+
+
+def _quintile_codes(values, col):
+    """0-4 quintile codes; columns with fewer than 5 distinct values all land in score 1."""
+    if values.nunique() < 5: # Handle edge cases with small data
+        return np.full(len(values), 4 if col == 'Recency' else 0, dtype=np.int8)
+    if col == 'Frequency':
+        values = values.rank(method='first')
+    return pd.qcut(values, 5, labels=False).to_numpy(dtype=np.int8)
+
+
+def score_rfm(rfm):
+    """Adds R/F/M scores, RFM_Score and Segment to a Recency/Frequency/Monetary frame."""
+    rfm = rfm.copy()
+    r_codes = _quintile_codes(rfm['Recency'], 'Recency')
+    f_codes = _quintile_codes(rfm['Frequency'], 'Frequency')
+    m_codes = _quintile_codes(rfm['Monetary'], 'Monetary')
+
+    rfm['R_Score'] = pd.Categorical.from_codes(r_codes, categories=[5, 4, 3, 2, 1], ordered=True)
+    rfm['F_Score'] = pd.Categorical.from_codes(f_codes, categories=[1, 2, 3, 4, 5], ordered=True)
+    rfm['M_Score'] = pd.Categorical.from_codes(m_codes, categories=[1, 2, 3, 4, 5], ordered=True)
+
+    # Integer scores index straight into the precomputed 5x5 tables
+    r_idx = 4 - r_codes.astype(np.intp)
+    f_idx = f_codes.astype(np.intp)
+    rfm['RFM_Score'] = RFM_SCORE_TABLE[r_idx, f_idx]
+    rfm['Segment'] = SEGMENT_TABLE[r_idx, f_idx]
+    return rfm
+
+
+def history_fingerprint(df, rows):
+    """Hash of HISTORY_SAMPLE_ROWS evenly spaced rows (first and last included) of df's first `rows` rows."""
+    if rows == 0:
+        return ''
+    positions = np.unique(np.linspace(0, rows - 1, HISTORY_SAMPLE_ROWS).astype(np.int64))
+    sample = df.iloc[positions]
+    digest = hashlib.sha256(str(rows).encode())
+    digest.update(sample['InvoiceDate'].to_numpy(dtype='datetime64[ns]').tobytes())
+    digest.update(sample['Line_Total'].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class RFMState:
+    """
+    Persistent per-customer RFM aggregates: last purchase, distinct invoices, monetary sum.
+
+    Applying a batch costs O(batch), not O(history):
+    - distinct invoice counts stay exact through a sorted array of (customer, invoice)
+      hashes; new hashes wait in a set that is merged into the array once it holds a
+      quarter as many keys (and before saving)
+    - customers map to their slot through a dict kept across batches; the per-customer
+      arrays grow by doubling
+    Scoring runs on the compact state instead of the raw rows.
+    """
+
+    COLUMNS = {'customer_ids': object, 'last_purchase': 'datetime64[ns]', 'frequency': np.int64,
+               'monetary': np.float64}
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        """Empty state: no customers, no invoices, no history."""
+        self.customer_ids = np.empty(0, dtype=object)
+        self.last_purchase = np.empty(0, dtype='datetime64[ns]')
+        self.frequency = np.empty(0, dtype=np.int64)
+        self.monetary = np.empty(0, dtype=np.float64)
+        self.pair_keys = np.empty(0, dtype=np.uint64)
+        self.pending_keys = set()
+        # Snapshot anchor: latest InvoiceDate over all rows, including guest checkouts
+        self.max_date = None
+        # Fingerprint of the history folded in so far, used to detect a rebuilt dataset
+        self.rows_seen = 0
+        self.history = ''
+        self._slots = None
+        self._buffers = None
+
+    def _slot_map(self):
+        if self._slots is None:
+            self._slots = {customer: slot for slot, customer in enumerate(self.customer_ids)}
+        return self._slots
+
+    def _grow(self, extra):
+        """Extends the per-customer arrays by `extra` slots, reallocating only when the capacity runs out."""
+        size = len(self.customer_ids)
+        if self._buffers is None or size + extra > len(self._buffers['frequency']):
+            capacity = max(size + extra, 2 * size, 1024)
+            buffers = {}
+            for name, dtype in self.COLUMNS.items():
+                buffers[name] = np.empty(capacity, dtype=dtype)
+                buffers[name][:size] = getattr(self, name)
+            self._buffers = buffers
+        for name in self.COLUMNS:
+            setattr(self, name, self._buffers[name][:size + extra])
+
+    def compact(self):
+        """Merges the buffered invoice keys into the sorted array."""
+        if self.pending_keys:
+            pending = np.sort(np.fromiter(self.pending_keys, dtype=np.uint64, count=len(self.pending_keys)))
+            self.pair_keys = np.insert(self.pair_keys, np.searchsorted(self.pair_keys, pending), pending)
+            self.pending_keys = set()
+
+    def _new_keys(self, keys):
+        """Mask of the (unique) keys not seen before; records them."""
+        # A batch this large pays for merging straight into the array
+        direct = 4 * len(keys) >= len(self.pair_keys)
+        if direct:
+            self.compact()
+        pos = np.searchsorted(self.pair_keys, keys)
+        known = np.zeros(len(keys), dtype=bool)
+        in_range = pos < len(self.pair_keys)
+        known[in_range] = self.pair_keys[pos[in_range]] == keys[in_range]
+        if direct:
+            self.pair_keys = np.insert(self.pair_keys, pos[~known], keys[~known])
+            return ~known
+        unknown = np.flatnonzero(~known)
+        candidates = keys[unknown].tolist()
+        fresh = np.array([key not in self.pending_keys for key in candidates], dtype=bool)
+        self.pending_keys.update(candidates)
+        if 4 * len(self.pending_keys) > max(PAIR_BUFFER_MIN, len(self.pair_keys)):
+            self.compact()
+        known[unknown[~fresh]] = True
+        return ~known
+
+    def apply(self, batch):
+        """Folds a batch of new transactions into the state. Returns the number of rows used."""
+        if batch.empty:
+            return 0
+        batch_max = batch['InvoiceDate'].max()
+        self.max_date = batch_max if self.max_date is None else max(self.max_date, batch_max)
+        self.rows_seen += len(batch)
+
+        batch = batch[batch['Customer ID'].notna() & batch['Invoice'].notna()]
+        if batch.empty:
+            return 0
+
+        # 1. Invoices never seen before for their customer
+        keys = pd.util.hash_pandas_object(batch[['Customer ID', 'Invoice']], index=False).to_numpy()
+        keys, first_rows = np.unique(keys, return_index=True)
+        new_invoices = batch['Customer ID'].iloc[first_rows[self._new_keys(keys)]].value_counts()
+
+        # 2. Batch-level aggregates for the affected customers only
+        grouped = batch.groupby('Customer ID', observed=True)
+        last_purchase = grouped['InvoiceDate'].max()
+        delta_ids = last_purchase.index
+        delta_freq = new_invoices.reindex(delta_ids, fill_value=0).to_numpy(dtype=np.int64)
+        delta_monetary = grouped['Line_Total'].sum().to_numpy(dtype=np.float64)
+        delta_last = last_purchase.to_numpy(dtype='datetime64[ns]')
+
+        # 3. Merge into the state
+        slots = self._slot_map()
+        if slots:
+            idx = np.fromiter((slots.get(customer, -1) for customer in delta_ids), dtype=np.int64,
+                              count=len(delta_ids))
+        else:
+            idx = np.full(len(delta_ids), -1, dtype=np.int64)
+        seen = idx >= 0
+        rows = idx[seen]
+        self.last_purchase[rows] = np.maximum(self.last_purchase[rows], delta_last[seen])
+        self.frequency[rows] += delta_freq[seen]
+        self.monetary[rows] += delta_monetary[seen]
+
+        fresh = np.flatnonzero(~seen)
+        if len(fresh):
+            size = len(self.customer_ids)
+            self._grow(len(fresh))
+            new_slots = np.arange(size, size + len(fresh))
+            self.customer_ids[new_slots] = delta_ids.to_numpy(dtype=object)[fresh]
+            self.last_purchase[new_slots] = delta_last[fresh]
+            self.frequency[new_slots] = delta_freq[fresh]
+            self.monetary[new_slots] = delta_monetary[fresh]
+            slots.update(zip(self.customer_ids[new_slots], new_slots.tolist()))
+        return len(batch)
+
+    def refresh(self, df):
+        """
+        Applies only the rows of df newer than the state's latest InvoiceDate. If the
+        history up to that date no longer matches the rows the state was built from
+        (e.g. after a full rebuild), the state is rebuilt from df instead. Returns the
+        number of rows folded in.
+
+        On a date-sorted df (as the Gold Layer is written) the boundary is a binary
+        search and only HISTORY_SAMPLE_ROWS rows of the history are read, so a rebuild
+        is caught when it changes the row count or a sampled row, not a single
+        unsampled value.
+        """
+        if not df['InvoiceDate'].is_monotonic_increasing:
+            df = df.iloc[np.argsort(df['InvoiceDate'].to_numpy(), kind='stable')]
+        dates = df['InvoiceDate'].to_numpy()
+        start = 0
+        if self.max_date is not None:
+            start = int(np.searchsorted(dates, np.datetime64(self.max_date, 'ns'), side='right'))
+            if start != self.rows_seen or history_fingerprint(df, start) != self.history:
+                self._reset()
+                start = 0
+        new_rows = len(df) - start
+        if new_rows:
+            self.apply(df.iloc[start:])
+            self.history = history_fingerprint(df, self.rows_seen)
+        return new_rows
+
+    def rfm(self):
+        """Scored RFM table, identical in layout to CustomerAnalytics.generate_rfm()."""
+        if self.max_date is None:
+            return pd.DataFrame()
+        snapshot_date = self.max_date + pd.Timedelta(days=1)
+        rfm = pd.DataFrame({
+            'Recency': (snapshot_date - pd.DatetimeIndex(self.last_purchase)).days.astype(np.int64),
+            'Frequency': self.frequency,
+            'Monetary': self.monetary
+        }, index=pd.Index(self.customer_ids, name='Customer ID'))
+        return score_rfm(rfm.sort_index())
+
+    def save(self, path):
+        """Writes the whole state as one .npz, swapped in atomically."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.compact()
+        # Per process, so concurrent savers don't write into each other's file
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            customer_ids=self.customer_ids.astype(str),
+            last_purchase=self.last_purchase,
+            frequency=self.frequency,
+            monetary=self.monetary,
+            pair_keys=self.pair_keys,
+            max_date=np.array([self.max_date.to_datetime64()], dtype='datetime64[ns]'),
+            rows_seen=np.array([self.rows_seen]),
+            history=np.array([self.history])
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with np.load(path) as data:
+            state.customer_ids = data['customer_ids'].astype(object)
+            state.last_purchase = data['last_purchase']
+            state.frequency = data['frequency']
+            state.monetary = data['monetary']
+            state.pair_keys = data['pair_keys']
+            state.max_date = pd.Timestamp(data['max_date'][0])
+            state.rows_seen = int(data['rows_seen'][0])
+            # States saved before the sampled fingerprint never match, so they are rebuilt once
+            state.history = str(data['history'][0]) if 'history' in data else ''
+        return state
     
 if __name__ == "__main__":
     # Test block for local development
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from dotenv import load_dotenv
+from sklearn.model_selection import ParameterGrid
+
+from src.features import FEATURES, load_features
+from src.instrumentation import instrumented, record_rows
+from src.parallel import get_pool, resolve_workers
+from src.predictor import XGB_PARAMS
+
+load_dotenv()
+
+# Searched around XGB_PARAMS; the number of rounds is left to early stopping
+PARAM_GRID = {
+    'learning_rate': [0.01, 0.05, 0.1],
+    'max_depth': [2, 3, 4, 6],
+    'min_child_weight': [1, 3],
+    'subsample': [0.8, 1.0],
+}
+# Ceiling on boosting rounds when early stopping decides
+MAX_ROUNDS = 2000
+EARLY_STOPPING_ROUNDS = int(os.getenv("BACKTEST_EARLY_STOPPING", 50))
+# Periods in the first fold's training window
+MIN_TRAIN_PERIODS = int(os.getenv("BACKTEST_MIN_TRAIN", 12))
+# Share of each training window held out to pick the number of rounds
+VALIDATION_SHARE = 0.2
+
+_BACKTESTS = {}
+_LOCK = threading.Lock()
+
+
+def mape(actual, predicted):
+    """Mean absolute percentage error (%) over periods with non-zero actuals (empty periods have none)."""
+    nonzero = actual != 0
+    if not nonzero.any():
+        return np.nan
+    return float(np.mean(np.abs((actual[nonzero] - predicted[nonzero]) / actual[nonzero])) * 100)
+
+
+def rmse(actual, predicted):
+    return float(np.sqrt(np.mean((actual - predicted) ** 2)))
+
+
+def _score_config(params, early_stopping, folds, n_threads):
+    """
+    Worker: fits one configuration on every fold and returns its test predictions
+    (folds concatenated), the boosting rounds kept per fold, the rounds trained in
+    total (early stopping probes included) and the fit time.
+    """
+    started = time.perf_counter()
+    predictions, rounds = [], []
+    trained = 0
+    for X_train, y_train, n_val, X_test, _ in folds:
+        n_rounds = params['n_estimators']
+        if early_stopping:
+            # 1. Pick the rounds on the held-out tail of the window...
+            probe = xgb.XGBRegressor(**{**params, 'n_estimators': MAX_ROUNDS}, early_stopping_rounds=early_stopping,
+                                     n_jobs=n_threads)
+            probe.fit(X_train[:-n_val], y_train[:-n_val], eval_set=[(X_train[-n_val:], y_train[-n_val:])],
+                      verbose=False)
+            n_rounds = probe.best_iteration + 1
+            trained += probe.get_booster().num_boosted_rounds()
+        # 2. ...then refit on the whole window, so the latest periods still train the model
+        model = xgb.XGBRegressor(**{**params, 'n_estimators': n_rounds}, n_jobs=n_threads)
+        model.fit(X_train, y_train)
+        predictions.append(model.predict(X_test))
+        rounds.append(n_rounds)
+        trained += n_rounds
+    return np.concatenate(predictions), rounds, trained, time.perf_counter() - started
+
+
+class WalkForwardBacktest:
+    """
+    Expanding-window backtest of the forecaster over a training frame (FeatureStore rows
+    with every feature defined). Fold k trains on every period before cut_k and is
+    scored on the `horizon` periods from cut_k on, cut_k stepping from min_train to the
+    end. Like the test split of train_forecaster, test periods use their actual lags.
+
+    The fold matrices are sliced once here and shared by every configuration searched.
+    """
+
+    def __init__(self, frame, min_train=MIN_TRAIN_PERIODS, horizon=1, validation=VALIDATION_SHARE):
+        if len(frame) <= min_train:
+            raise ValueError(f"❌ Need more than {min_train} periods to backtest (have {len(frame)}).")
+        X = frame[FEATURES].to_numpy(dtype=np.float64)
+        y = frame['Line_Total'].to_numpy(dtype=np.float64)
+        self.folds = []
+        self.test_dates = []
+        for cut in range(min_train, len(frame), horizon):
+            n_val = max(1, int(round(cut * validation)))
+            self.folds.append((X[:cut], y[:cut], n_val, X[cut:cut + horizon], y[cut:cut + horizon]))
+            self.test_dates.append(frame['InvoiceDate'].iloc[cut])
+        self.actual = np.concatenate([fold[4] for fold in self.folds])
+        # Previous period's revenue as the forecast: the bar any configuration has to clear
+        self.naive = np.concatenate([fold[3][:, FEATURES.index('Lag_1')] for fold in self.folds])
+        self.stats = {}
+
+    def configurations(self, grid=None):
+        """XGB_PARAMS overridden by every combination of the grid."""
+        return [{**XGB_PARAMS, **combo} for combo in ParameterGrid(grid or PARAM_GRID)]
+
+    def _row(self, label, params, predictions, rounds, trained, seconds):
+        return {
+            'Config': label,
+            **{name: params.get(name, np.nan) for name in ('learning_rate', 'max_depth', 'min_child_weight',
+                                                           'subsample', 'colsample_bytree')},
+            'MAPE': mape(self.actual, predictions),
+            'RMSE': rmse(self.actual, predictions),
+            'Mean_Rounds': float(np.mean(rounds)) if rounds else np.nan,
+            'Fit_Seconds': seconds,
+        }
+
+    def search(self, grid=None, workers=None, xgb_threads=None, early_stopping=EARLY_STOPPING_ROUNDS):
+        """
+        Scores every configuration on every fold on a process pool (one task per
+        configuration) and returns the leaderboard sorted by MAPE. The current XGB_PARAMS
+        (fixed 500 rounds) and the naive last-period forecast are ranked alongside.
+        """
+        workers = resolve_workers(workers, "FORECAST_WORKERS")
+        if xgb_threads is None:
+            xgb_threads = int(os.getenv("FORECAST_XGB_THREADS", 0)) or max(1, (os.cpu_count() or 1) // workers)
+        configs = self.configurations(grid)
+        tasks = [(params, early_stopping) for params in configs] + [(XGB_PARAMS, None)]
+        started = time.perf_counter()
+
+        if workers == 1:
+            results = [_score_config(params, stopping, self.folds, xgb_threads) for params, stopping in tasks]
+        else:
+            # Chunks are pickled whole and pickle writes a shared object once, so the
+            # fold matrices cross to the workers once per chunk rather than once per task
+            chunksize = max(1, len(tasks) // (workers * 4))
+            params, stopping = zip(*tasks)
+            results = list(get_pool(workers).map(_score_config, params, stopping, [self.folds] * len(tasks),
+                                                 [xgb_threads] * len(tasks), chunksize=chunksize))
+
+        rows = [self._row(f"grid-{i}", params, *result) for i, (params, result) in enumerate(zip(configs, results))]
+        rows.append(self._row('default', XGB_PARAMS, *results[-1]))
+        rows.append(self._row('naive', {}, self.naive, [], 0, 0.0))
+        leaderboard = pd.DataFrame(rows).sort_values(['MAPE', 'RMSE']).reset_index(drop=True)
+        self.stats = {
+            'configurations': len(configs),
+            'folds': len(self.folds),
+            'rounds_trained': int(sum(result[2] for result in results)),
+            'workers': workers,
+            'xgb_threads': xgb_threads,
+            'seconds': time.perf_counter() - started,
+        }
+        return leaderboard
+
+
+def load_backtest(gold_path, version, granularity='monthly', min_train=MIN_TRAIN_PERIODS, horizon=1):
+    """Process-wide folds for a Gold Layer version, so repeated searches don't rebuild the matrices."""
+    key = (gold_path, version, granularity, min_train, horizon)
+    with _LOCK:
+        if key not in _BACKTESTS:
+            frame = load_features(gold_path, version, granularity).dropna(subset=FEATURES).reset_index(drop=True)
+            for stale in [k for k in _BACKTESTS if k[0] == gold_path and k[2] == granularity]:
+                del _BACKTESTS[stale]
+            _BACKTESTS[key] = WalkForwardBacktest(frame, min_train, horizon)
+        return _BACKTESTS[key]
+
+
+@instrumented('backtest.search')
+def backtest(gold_path, version, granularity='monthly', grid=None, workers=None, min_train=MIN_TRAIN_PERIODS,
+             horizon=1):
+    """Walk-forward leaderboard of the parameter grid for the Gold Layer at gold_path."""
+    walk_forward = load_backtest(gold_path, version, granularity, min_train, horizon)
+    record_rows(len(walk_forward.actual) * (len(walk_forward.configurations(grid)) + 1))
+    leaderboard = walk_forward.search(grid, workers)
+    return leaderboard, walk_forward.stats
+
+if __name__ == "__main__":
+    import sys
+    from src.gold_layer import gold_source
+    path, version = gold_source()
+    granularity = sys.argv[1] if len(sys.argv) > 1 else 'monthly'
+    leaderboard, stats = backtest(path, version, granularity)
+    print(leaderboard.head(10).round(3).to_string(index=False))
+    print(f"✅ {stats['configurations']} configurations x {stats['folds']} folds in {stats['seconds']:.1f} s "
+          f"({stats['workers']} worker(s))")
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from src.instrumentation import instrumented, record_rows
+from src.query import GoldQuery
+
+load_dotenv()
+
+RULES_DIR = os.getenv("BASKET_RULES_DIR", "data/processed/basket_rules")
+MIN_SUPPORT = float(os.getenv("BASKET_MIN_SUPPORT", 0.01))
+MIN_CONFIDENCE = float(os.getenv("BASKET_MIN_CONFIDENCE", 0.2))
+MAX_ITEMSET = int(os.getenv("BASKET_MAX_ITEMSET", 3))
+# Floor on the basket count of a frequent itemset, so a small partition's relative
+# support threshold can't drop to one or two baskets and make everything "frequent"
+MIN_BASKETS = int(os.getenv("BASKET_MIN_BASKETS", 10))
+# Gold Layer columns rule mining reads
+RULE_COLUMNS = ['Invoice', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'Country', 'Is_Cancelled']
+PARTITIONS = (None, 'Country', 'Month')
+# Column -> dtype of a rules table (an empty one keeps them, so sorting and lookups still work)
+RULE_DTYPES = {'Partition': object, 'Antecedent': object, 'Consequent': object, 'Support': np.float64,
+               'Confidence': np.float64, 'Lift': np.float64, 'Baskets': np.int64}
+
+# Process-wide: cache key -> RuleSet, one entry per parameter set of the current version
+_RULES = {}
+_LOCK = threading.Lock()
+# One lock per cache key, held while that parameter set is mined (others aren't blocked)
+_KEY_LOCKS = {}
+
+
+def encode_baskets(df):
+    """
+    Integer-encoded baskets of the sales lines in df (cancelled invoices and returns
+    dropped): CSR-style (offsets, item codes) with each product once per basket, plus
+    the distinct StockCodes the codes index into.
+    """
+    sold = (df['Quantity'].to_numpy() > 0) & ~df['Is_Cancelled'].to_numpy()
+    invoice_codes, _ = pd.factorize(df['Invoice'].to_numpy()[sold])
+    item_codes, items = pd.factorize(df['StockCode'][sold], sort=True)
+    items = np.asarray(items, dtype=object)
+    # One sorted pass over (basket, item) keys dedupes repeated lines and groups baskets
+    pairs = np.unique(invoice_codes.astype(np.int64) * max(len(items), 1) + item_codes)
+    baskets, codes = np.divmod(pairs, max(len(items), 1))
+    offsets = np.r_[0, np.cumsum(np.bincount(baskets))]
+    return offsets, codes.astype(np.int32), items
+
+
+def _grow(transactions, suffix, min_count, max_len, out):
+    """
+    Pattern growth on a conditional pattern base: transactions are (path, count) pairs,
+    each path holding item ranks in descending frequency order, so the prefix before
+    an item is that item's conditional base, as in an FP-tree. Identical paths are
+    merged with their counts summed, which is what the tree's shared branches do.
+    """
+    counts = Counter()
+    for path, count in transactions:
+        for item in path:
+            counts[item] += count
+    frequent = {item for item, count in counts.items() if count >= min_count}
+    out.update(((item, *suffix), counts[item]) for item in frequent)
+    if len(suffix) + 1 >= max_len:
+        # Last level: the counts are all that's needed, no conditional bases
+        return
+    if len(frequent) < len(counts):
+        # Like building the FP-tree: infrequent items never enter the paths
+        transactions = [(tuple(i for i in path if i in frequent), count) for path, count in transactions]
+
+    occurrences = defaultdict(list)
+    for t_idx, (path, _) in enumerate(transactions):
+        for pos, item in enumerate(path):
+            occurrences[item].append((t_idx, pos))
+
+    for item in frequent:
+        base = Counter()
+        for t_idx, pos in occurrences[item]:
+            path, count = transactions[t_idx]
+            if pos:
+                base[path[:pos]] += count
+        if base:
+            _grow(list(base.items()), (item, *suffix), min_count, max_len, out)
+
+
+def frequent_itemsets(offsets, codes, min_count, max_len=MAX_ITEMSET):
+    """
+    FP-growth over integer-encoded baskets: {itemset (tuple of item codes): basket count}
+    for every itemset of up to max_len items in at least min_count baskets. Baskets are
+    never one-hot encoded; identical baskets collapse into one weighted path.
+    """
+    item_counts = np.bincount(codes, minlength=int(codes.max()) + 1 if len(codes) else 0)
+    # 1. Rank frequent items, most frequent first; infrequent ones leave the baskets
+    frequent = np.flatnonzero(item_counts >= min_count)
+    frequent = frequent[np.argsort(-item_counts[frequent], kind='stable')]
+    rank_of = np.full(len(item_counts), -1, dtype=np.int64)
+    rank_of[frequent] = np.arange(len(frequent))
+    ranks = rank_of[codes]
+    basket_of = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    keep = ranks >= 0
+    ranks, basket_of = ranks[keep], basket_of[keep]
+    order = np.lexsort((ranks, basket_of))
+    ranks, basket_of = ranks[order], basket_of[order]
+
+    # 2. Weighted paths: identical baskets are counted once
+    bounds = np.flatnonzero(np.diff(basket_of)) + 1
+    paths = Counter(map(tuple, np.split(ranks, bounds))) if len(ranks) else Counter()
+    found = {}
+    _grow([(tuple(int(i) for i in path), count) for path, count in paths.items()], (), min_count, max_len, found)
+    return {tuple(sorted(int(frequent[r]) for r in itemset)): count for itemset, count in found.items()}
+
+
+def association_rules(itemsets, n_baskets, items, min_confidence=MIN_CONFIDENCE):
+    """
+    Single-consequent rules {antecedent} -> consequent from frequent itemsets, with
+    support, confidence and lift. Every antecedent of a frequent itemset is itself
+    frequent, so its count is always in itemsets.
+    """
+    rows = []
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        for consequent in itemset:
+            antecedent = tuple(i for i in itemset if i != consequent)
+            confidence = count / itemsets[antecedent]
+            if confidence >= min_confidence:
+                rows.append((antecedent, consequent, count, confidence, confidence * n_baskets / itemsets[(consequent,)]))
+    rules = pd.DataFrame(rows, columns=['Antecedent', 'Consequent', 'Baskets', 'Confidence', 'Lift'])
+    rules['Support'] = rules['Baskets'] / max(n_baskets, 1)
+    rules['Antecedent'] = [list(items[list(a)]) for a in rules['Antecedent']]
+    rules['Consequent'] = items[rules['Consequent'].to_numpy(dtype=np.int64)]
+    return rules
+
+
+@instrumented('basket.mine_rules')
+def mine_rules(df, by=None, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE, max_len=MAX_ITEMSET,
+               min_baskets=MIN_BASKETS):
+    """
+    Association rules over the invoice baskets of df, optionally mined separately per
+    Country or per Month (support is then relative to the partition's baskets, with
+    at least min_baskets baskets). Partitions are mined one after the other, so only
+    one is encoded at a time.
+    """
+    if by not in PARTITIONS:
+        raise ValueError(f"❌ Unknown partition '{by}' (use one of {PARTITIONS}).")
+    record_rows(len(df))
+    if by is None:
+        groups = [('All', df)]
+    else:
+        keys = df['InvoiceDate'].dt.strftime('%Y-%m') if by == 'Month' else df['Country']
+        groups = df.groupby(keys, sort=True, observed=True)
+
+    frames = []
+    for partition, part in groups:
+        offsets, codes, items = encode_baskets(part)
+        n_baskets = len(offsets) - 1
+        if n_baskets == 0:
+            continue
+        min_count = max(min_baskets, int(np.ceil(min_support * n_baskets)))
+        itemsets = frequent_itemsets(offsets, codes, min_count, max_len)
+        rules = association_rules(itemsets, n_baskets, items, min_confidence)
+        if len(rules):
+            frames.append(rules.assign(Partition=partition))
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in RULE_DTYPES.items()})
+    return pd.concat(frames, ignore_index=True)[list(RULE_DTYPES)]
+
+
+class RuleSet:
+    """
+    Mined rules with an inverted index from product to the rules whose antecedent holds
+    it, so "what follows from these products" is a bincount over a few postings
+    instead of a scan over every rule.
+    """
+
+    def __init__(self, rules, descriptions=None, version=None):
+        self.rules = rules.reset_index(drop=True)
+        self.version = version
+        self.descriptions = descriptions if descriptions is not None else pd.Series(dtype=object)
+        sizes = self.rules['Antecedent'].map(len).to_numpy().astype(np.int64)
+        self.antecedent_sizes = sizes
+        self.postings = {}
+        if not len(sizes):
+            return
+        flat = pd.Series(np.concatenate(self.rules['Antecedent'].to_numpy()), dtype=object)
+        rule_ids = np.repeat(np.arange(len(self.rules)), sizes)
+        self.postings = {item: rule_ids[rows] for item, rows in flat.groupby(flat.to_numpy(), sort=False).indices.items()}
+
+    def antecedent_items(self):
+        return sorted(self.postings)
+
+    def lookup(self, items, partition=None, min_lift=None, n=20):
+        """Rules whose whole antecedent is among `items`, best confidence first."""
+        hits = [self.postings[item] for item in set(items) if item in self.postings]
+        if not hits:
+            return self.rules.iloc[:0]
+        matched = np.bincount(np.concatenate(hits), minlength=len(self.rules))
+        rules = self.rules[matched == self.antecedent_sizes]
+        if partition is not None:
+            rules = rules[rules['Partition'] == partition]
+        if min_lift is not None:
+            rules = rules[rules['Lift'] >= min_lift]
+        rules = rules[~rules['Consequent'].isin(set(items))]
+        rules = rules.sort_values(['Confidence', 'Lift'], ascending=False).head(n)
+        if len(self.descriptions):
+            rules = rules.assign(Description=rules['Consequent'].map(self.descriptions))
+        return rules
+
+
+def _cache_key(version, params):
+    return hashlib.sha256(json.dumps([version, params], sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_rules(gold_path, version, by=None, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE,
+               max_len=MAX_ITEMSET, min_baskets=MIN_BASKETS, rules_dir=None):
+    """
+    RuleSet for a Gold Layer version and parameter set: from the process cache, else
+    from the Parquet cache in rules_dir (BASKET_RULES_DIR), else mined and saved there.
+    """
+    params = {'by': by, 'min_support': min_support, 'min_confidence': min_confidence, 'max_len': max_len,
+              'min_baskets': min_baskets}
+    key = _cache_key(version, params)
+    with _LOCK:
+        if key in _RULES:
+            return _RULES[key]
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+
+    # Mining runs under this parameter set's own lock: concurrent callers of the same key
+    # wait for one result, while other keys (and cache hits) go ahead
+    with key_lock:
+        if key in _RULES:
+            return _RULES[key]
+        rules_dir = rules_dir or RULES_DIR
+        rules_path = os.path.join(rules_dir, f'{key}.parquet')
+        descriptions_path = os.path.join(rules_dir, f'{key}_descriptions.parquet')
+        if os.path.exists(rules_path) and os.path.exists(descriptions_path):
+            rules = pd.read_parquet(rules_path).astype(RULE_DTYPES)
+            rules['Antecedent'] = rules['Antecedent'].map(list)
+            descriptions = pd.read_parquet(descriptions_path)['Description']
+        else:
+            started = time.perf_counter()
+            df = GoldQuery(RULE_COLUMNS, source=gold_path).to_pandas()
+            rules = mine_rules(df, by, min_support, min_confidence, max_len, min_baskets)
+            descriptions = df.groupby('StockCode', observed=True)['Description'].first().astype(object)
+            descriptions = descriptions[descriptions.index.isin(set(rules['Consequent']) | set(rules['Antecedent'].explode()))]
+            print(f"🛒 {len(rules):,} rules mined in {time.perf_counter() - started:.2f}s")
+            os.makedirs(rules_dir, exist_ok=True)
+            descriptions.rename_axis('StockCode').to_frame().to_parquet(descriptions_path + '.tmp')
+            os.replace(descriptions_path + '.tmp', descriptions_path)
+            # The rules file is written last: it marks the cache entry complete
+            rules.to_parquet(rules_path + '.tmp', index=False)
+            os.replace(rules_path + '.tmp', rules_path)
+        ruleset = RuleSet(rules, descriptions, version)
+        with _LOCK:
+            # Only the current version stays resident
+            for stale in [k for k, cached in _RULES.items() if cached.version != version]:
+                del _RULES[stale]
+                _KEY_LOCKS.pop(stale, None)
+            _RULES[key] = ruleset
+        return ruleset
+
+if __name__ == "__main__":
+    from src.gold_layer import gold_source
+
+    gold_path, version = gold_source()
+    by = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] in PARTITIONS else None
+    ruleset = load_rules(gold_path, version, by)
+    print(ruleset.rules.sort_values('Lift', ascending=False).head(10))
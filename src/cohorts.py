@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from src.instrumentation import instrumented, record_rows
+from src.query import GoldQuery
+
+# Gold Layer columns a cohort matrix is built from (Country / Is_Cancelled are only filtered on)
+COHORT_COLUMNS = ['Customer ID', 'InvoiceDate', 'Line_Total']
+TABLE_COLUMNS = ['Cohort', 'Months_Since', 'Customers', 'Revenue', 'Cohort_Size', 'Cohort_Revenue',
+                 'Retention', 'Revenue_Retention']
+
+
+def month_codes(dates):
+    """
+    InvoiceDate -> integer month code (months since 1970-01). Converting every row to
+    datetime64[M] is slow, so rows map to days and a per-day lookup table gives the month.
+    """
+    days = dates.to_numpy(dtype='datetime64[ns]').view(np.int64) // 86_400_000_000_000
+    if not len(days):
+        return days
+    first = days.min()
+    lookup = np.arange(first, days.max() + 1).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return lookup[days - first]
+
+
+class CohortMatrix:
+    """
+    Monthly acquisition cohorts x months since first purchase.
+
+    customers[c, a] counts the customers of cohort c (first purchase in month
+    first_month + c) who bought in their a-th month after it; revenue[c, a] is what
+    the cohort spent in that month. Cells a cohort hasn't reached yet (past the last
+    month of data) are 0 in the arrays and NaN in the frames.
+    """
+
+    def __init__(self, first_month, customers, revenue):
+        self.first_month = int(first_month)
+        self.customers = customers
+        self.revenue = revenue
+
+    @classmethod
+    def build(cls, df):
+        """
+        One vectorized pass over the rows: customers become integer codes, dates month
+        codes, and every cell is a bincount over flat (cohort, age) indices. Guest rows
+        (no Customer ID) belong to no cohort and are skipped.
+        """
+        ids = df['Customer ID']
+        if isinstance(ids.dtype, pd.CategoricalDtype):
+            customer = ids.cat.codes.to_numpy(dtype=np.int64, copy=True)
+        else:
+            customer = pd.factorize(ids)[0]
+        if not (customer >= 0).any():
+            return cls(0, np.zeros((0, 0), dtype=np.int64), np.zeros((0, 0)))
+        month = month_codes(df['InvoiceDate'])
+        line_total = df['Line_Total'].to_numpy(dtype=np.float64)
+        # Guests share one extra slot instead of being masked out (cheaper than copying every column)
+        n_customers = int(customer.max()) + 1
+        customer[customer < 0] = n_customers
+
+        # 1. Each customer's first month, by scattering row months into one slot per customer
+        first_month = month.min()
+        n_months = int(month.max() - first_month) + 1
+        first = np.full(n_customers + 1, month.max())
+        np.minimum.at(first, customer, month)
+        cohort = first - first_month
+        # The guest slot lands in a spare cohort row that is dropped at the end
+        cohort[n_customers] = n_months
+        age = month - first[customer]
+
+        # 2. Revenue per (cohort, age) cell
+        cells = (n_months + 1) * n_months
+        revenue = np.bincount(cohort[customer] * n_months + age, weights=line_total, minlength=cells)
+
+        # 3. Active customers per cell: a customer x month bitmap counts each (customer, age) once
+        active = np.zeros((n_customers + 1) * n_months, dtype=bool)
+        active[customer * n_months + age] = True
+        active_customer, active_age = np.divmod(np.flatnonzero(active), n_months)
+        customers = np.bincount(cohort[active_customer] * n_months + active_age, minlength=cells)
+        shape = (n_months + 1, n_months)
+        return cls(first_month, customers.reshape(shape)[:-1], revenue.reshape(shape)[:-1])
+
+    # --- Views ---
+    @property
+    def n_months(self):
+        return len(self.customers)
+
+    def cohorts(self):
+        """Month start of every cohort."""
+        codes = self.first_month + np.arange(self.n_months)
+        return pd.DatetimeIndex(codes.astype('datetime64[M]').astype('datetime64[ns]'), name='Cohort')
+
+    def observed(self):
+        """Mask of the cells inside the data: cohort c has been observed for n_months - c months."""
+        ages = np.arange(self.n_months)
+        return ages[None, :] < (self.n_months - ages)[:, None]
+
+    def to_frame(self):
+        """
+        Tidy table, one row per observed cell: Cohort, Months_Since, Customers, Revenue,
+        Cohort_Size, Cohort_Revenue (the cohort's first-month revenue), Retention (share
+        of the cohort active) and Revenue_Retention (revenue relative to the first month).
+        """
+        if not self.n_months:
+            return pd.DataFrame(columns=TABLE_COLUMNS)
+        cohort_idx, age = np.nonzero(self.observed())
+        sizes = self.customers[:, 0]
+        first_revenue = self.revenue[:, 0]
+        customers = self.customers[cohort_idx, age]
+        revenue = self.revenue[cohort_idx, age]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame = pd.DataFrame({
+                'Cohort': self.cohorts()[cohort_idx],
+                'Months_Since': age,
+                'Customers': customers,
+                'Revenue': revenue,
+                'Cohort_Size': sizes[cohort_idx],
+                'Cohort_Revenue': first_revenue[cohort_idx],
+                'Retention': customers / sizes[cohort_idx],
+                'Revenue_Retention': revenue / first_revenue[cohort_idx],
+            })
+        # Cohorts nobody joined (gap months) have no size to divide by
+        return frame[frame['Cohort_Size'] > 0].reset_index(drop=True)
+
+
+def pivot_cohorts(frame, metric='Retention'):
+    """Cohort x Months_Since matrix of one metric from the tidy table; unobserved cells are NaN."""
+    return frame.pivot(index='Cohort', columns='Months_Since', values=metric)
+
+
+def retention_curve(frame):
+    """
+    Average customer and revenue retention by months since first purchase, each age
+    weighted by the cohorts that have reached it (cohort size / first-month revenue).
+    """
+    sums = frame.groupby('Months_Since')[['Customers', 'Cohort_Size', 'Revenue', 'Cohort_Revenue']].sum()
+    curve = pd.DataFrame({
+        'Retention': sums['Customers'] / sums['Cohort_Size'],
+        'Revenue_Retention': sums['Revenue'] / sums['Cohort_Revenue'],
+        'Cohorts': frame.groupby('Months_Since').size(),
+    })
+    return curve.reset_index()
+
+
+@instrumented('cohorts.build')
+def cohort_table(path, countries=None, exclude_cancelled=True):
+    """Tidy cohort table for the Gold Layer at path, from a projected, filtered scan."""
+    query = GoldQuery(COHORT_COLUMNS, source=path)
+    if countries:
+        query = query.for_countries(countries)
+    if exclude_cancelled:
+        query = query.exclude_cancelled()
+    df = query.to_pandas()
+    record_rows(len(df))
+    return CohortMatrix.build(df).to_frame()
+
+if __name__ == "__main__":
+    from src.gold_layer import gold_source
+    table = cohort_table(gold_source()[0])
+    print((pivot_cohorts(table) * 100).round(1).iloc[:12, :7])
+    print(retention_curve(table).head(13))
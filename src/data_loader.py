@@ -1,66 +1,334 @@
 import pandas as pd
 import numpy as np
 import os
+import shutil
+import sys
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 
+from src.cube import DailyCube, RunningCube, cube_path_for
+from src.gold_layer import file_digest, snapshot_path_for, write_snapshot
+from src.instrumentation import instrumented, record_rows
+
+# Repetitive text columns are read straight into categoricals, so each distinct
+# string is held once and the ETL never materializes a column of Python strings
+DTYPE_SPEC = {
+    'Invoice': str,
+    'StockCode': 'category',
+    'Description': 'category',
+    'Quantity': np.int32,
+    'Price': np.float32,
+    'Customer ID': 'category',
+    'Country': 'category'
+}
+CATEGORICAL_COLUMNS = ['StockCode', 'Description', 'Customer ID', 'Country']
+
+# Rough pandas footprint of one raw row (object strings dominate)
+ROW_BYTES_ESTIMATE = 600
+
+# Invoice numbers stay below this; a letter prefix other than 'C' is folded in above it
+INVOICE_PREFIX_BASE = 10_000_000
+
+# Dates sampled per row group when picking the bucket boundaries of an out-of-core sort
+SORT_SAMPLE_PER_GROUP = 1_000
+
+
+def gold_schema(df):
+    """
+    Arrow schema for a cleaned chunk. Fixing it from the first chunk stops an
+    all-null column in a later chunk from changing a column's type mid-file.
+    Categoricals become dictionary<int32, string> whatever their code width in the
+    first chunk, since a later chunk may hold more categories.
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        if field.type == pa.null():
+            schema = schema.set(i, field.with_type(pa.string()))
+        elif pa.types.is_dictionary(field.type):
+            schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), pa.string())))
+    return schema
+
+
+def compact_frame(df):
+    """
+    Compact Gold Layer encoding of a cleaned frame: text columns as categoricals
+    (dictionary-encoded in Parquet), Invoice as an int32 (see encode_invoices),
+    int32/float32 raw measures. Line_Total stays float64: it is what every revenue
+    total sums.
+    """
+    df = df.copy(deep=False)
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype('category').cat.remove_unused_categories()
+    if not pd.api.types.is_integer_dtype(df['Invoice']):
+        df['Invoice'] = encode_invoices(df['Invoice'])
+    df['Quantity'] = df['Quantity'].astype(np.int32)
+    df['Price'] = df['Price'].astype(np.float32)
+    return df
+
+
+def encode_invoices(invoices):
+    """
+    Invoice strings as int32 codes, without losing the prefix:
+    - '489449' -> 489449, and 'C489449' -> 489449 too (the cancellation is in Is_Cancelled)
+    - any other letter, e.g. the bad-debt adjustment 'A563185' ->
+      -(ord('A') * INVOICE_PREFIX_BASE + 563185), so it can't collide with invoice 563185
+    Anything else raises ValueError rather than being silently renumbered.
+    """
+    first = invoices.str[:1]
+    prefixed = ~first.str.isdigit().fillna(False).astype(bool)
+    numbers = invoices.where(~prefixed, invoices.str[1:])
+    try:
+        codes = numbers.astype(np.int64).to_numpy()
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"❌ Unsupported invoice number format: {e}") from e
+    other = (prefixed & (first != 'C')).to_numpy()
+    if other.any():
+        letters = first[other]
+        if not letters.str.fullmatch('[A-Z]').all() or (codes[other] >= INVOICE_PREFIX_BASE).any():
+            raise ValueError(f"❌ Unsupported invoice prefixes: {sorted(set(invoices[other]))[:5]}")
+        ords = letters.map(ord).to_numpy(dtype=np.int64)
+        codes[other] = -(ords * INVOICE_PREFIX_BASE + codes[other])
+    return codes.astype(np.int32)
+
+
+def decode_invoices(codes, cancelled):
+    """Invoice strings back from encode_invoices codes and the Is_Cancelled flags."""
+    codes = np.asarray(codes, dtype=np.int64)
+    prefixes = np.where(np.asarray(cancelled, dtype=bool), 'C', '').astype(object)
+    other = codes < 0
+    prefixes[other] = [chr(letter) for letter in -codes[other] // INVOICE_PREFIX_BASE]
+    return pd.Series(prefixes + (np.abs(codes) % INVOICE_PREFIX_BASE).astype(str).astype(object))
+
+
+def sort_parquet_by_date(src_path, dst_path, rows_per_bucket, row_group_rows):
+    """
+    Out-of-core sort of a Parquet file on InvoiceDate. Bucket boundaries come from a
+    per-row-group sample. One pass then splits every row group into per-bucket spill
+    files; each bucket is read back, sorted in memory and written in order, so the
+    input is read twice whatever its order and only about one bucket is resident.
+    """
+    pf = pq.ParquetFile(src_path)
+    sample = []
+    for rg in range(pf.num_row_groups):
+        dates = pf.read_row_group(rg, columns=['InvoiceDate']).column(0).to_numpy()
+        step = max(1, len(dates) // SORT_SAMPLE_PER_GROUP)
+        sample.append(dates[::step])
+    sample = np.sort(np.concatenate(sample))
+    n_buckets = max(1, -(-pf.metadata.num_rows // rows_per_bucket))
+    bounds = np.unique(sample[np.linspace(0, len(sample) - 1, n_buckets + 1).astype(int)[1:-1]])
+
+    # 1. Split: bucket b holds bounds[b - 1] <= InvoiceDate < bounds[b]
+    spill_dir = dst_path + '.spill'
+    os.makedirs(spill_dir, exist_ok=True)
+    spills = {}
+    try:
+        for rg in range(pf.num_row_groups):
+            table = pf.read_row_group(rg)
+            bucket = np.searchsorted(bounds, table.column('InvoiceDate').to_numpy(), side='right')
+            order = np.argsort(bucket, kind='stable')
+            offsets = np.r_[0, np.cumsum(np.bincount(bucket, minlength=len(bounds) + 1))]
+            grouped = table.take(pa.array(order))
+            for b in np.flatnonzero(np.diff(offsets)):
+                if b not in spills:
+                    spills[b] = pq.ParquetWriter(os.path.join(spill_dir, f'{b}.parquet'), pf.schema_arrow)
+                spills[b].write_table(grouped.slice(offsets[b], offsets[b + 1] - offsets[b]))
+        for spill in spills.values():
+            spill.close()
+
+        # 2. Sort each bucket once, in bucket order
+        with pq.ParquetWriter(dst_path, pf.schema_arrow) as writer:
+            for b in sorted(spills):
+                bucket = pq.read_table(os.path.join(spill_dir, f'{b}.parquet'), schema=pf.schema_arrow)
+                writer.write_table(bucket.sort_by('InvoiceDate'), row_group_size=row_group_rows)
+    finally:
+        for spill in spills.values():
+            spill.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
 class DataEngineer:
     def __init__(self):
         # Load .env from the root directory
         load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
-        
+
         self.raw_path = os.getenv("RAW_DATA_PATH")
         self.output_path = os.getenv("PROCESSED_DATA_PATH")
-        
+        self.memory_limit_mb = int(os.getenv("ETL_MEMORY_LIMIT_MB", 256))
+        # Row groups carry min/max statistics, so date-range reads can skip most of them
+        self.row_group_rows = int(os.getenv("GOLD_ROW_GROUP_ROWS", 100_000))
+        # Also publish an uncompressed Arrow snapshot that server processes memory-map and share
+        self.arrow_snapshot = os.getenv("GOLD_ARROW_SNAPSHOT", "0") == "1"
+
         if not self.raw_path:
             raise FileNotFoundError("❌ RAW_DATA_PATH not found in .env file!")
         print(f"📂 Target File: {self.raw_path}")
 
-    def clean_data(self):
-        print("🚀 Starting Enterprise ETL Pipeline...")
-        
-        dtype_spec = {
-            'Invoice': str,
-            'StockCode': str,
-            'Description': str,
-            'Quantity': np.int32,
-            'Price': np.float32,
-            'Customer ID': str
-        }
-        
-        # FIX: Ensure this is indented correctly inside the function
-        df = pd.read_csv(
-            self.raw_path, 
-            dtype=dtype_spec, 
-            parse_dates=['InvoiceDate'], 
-            encoding='ISO-8859-1'
-        )
-        
-        # FIX: Define initial_count before cleaning
-        initial_count = len(df)
-        
+    @staticmethod
+    def apply_cleaning_rules(df):
+        """Cleaning rules shared by the in-memory and streaming pipelines (row-local only)."""
         # 1. Handle Cancellations
         df['Is_Cancelled'] = df['Invoice'].str.startswith('C', na=False)
-        
+
         # 2. Feature Engineering
         df['Line_Total'] = df['Quantity'] * df['Price']
-        
+
         # 3. Cleaning
         df = df.dropna(subset=['Description'])
-        
+
         # 4. Remove obvious data errors (Price must be > 0)
         df = df[(df['Price'] > 0)]
-        
+
+        # 5. Compact schema: categoricals, integer invoice keys, 32-bit measures
+        return compact_frame(df)
+
+    def _save_cube(self, cube):
+        """Stamps the KPI cube with the Gold Layer version it summarizes and writes it next to it."""
+        cube.source_version = file_digest(self.output_path)
+        cube_path = cube_path_for(self.output_path)
+        cube.save(cube_path)
+        print(f"🧊 KPI cube saved to: {cube_path}")
+
+    @instrumented('etl.snapshot')
+    def _save_snapshot(self):
+        """
+        Converts the Gold Layer just written into its Arrow IPC snapshot. The table is
+        read back from the Parquet file so the snapshot has exactly its schema; this
+        step holds the whole Arrow table in memory once.
+        """
+        table = pq.read_table(self.output_path)
+        record_rows(table.num_rows)
+        snapshot_path = write_snapshot(table, snapshot_path_for(self.output_path), file_digest(self.output_path))
+        print(f"🗺️ Arrow snapshot saved to: {snapshot_path}")
+
+    @instrumented('etl.clean_data')
+    def clean_data(self, build_cube=True, snapshot=None):
+        print("🚀 Starting Enterprise ETL Pipeline...")
+
+        # FIX: Ensure this is indented correctly inside the function
+        df = pd.read_csv(
+            self.raw_path,
+            dtype=DTYPE_SPEC,
+            parse_dates=['InvoiceDate'],
+            encoding='ISO-8859-1'
+        )
+
+        # FIX: Define initial_count before cleaning
+        initial_count = len(df)
+        record_rows(initial_count)
+
+        df = self.apply_cleaning_rules(df)
+
         print(f"✅ Cleaned {initial_count - len(df)} outlier/junk rows.")
         print(f"📊 Final Row Count: {len(df)}")
-        
-        # 5. Export to Parquet (The Enterprise Way)
+
+        # 5. Export to Parquet (The Enterprise Way), time-sorted for date slicing
+        df = df.sort_values('InvoiceDate', kind='stable')
         # Create folder if it doesn't exist
         os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
-        df.to_parquet(self.output_path, index=False)
-        
+        df.to_parquet(self.output_path, index=False, row_group_size=self.row_group_rows)
+
         print(f"📦 Gold Layer saved to: {self.output_path}")
+
+        # 6. Daily KPI cube for the Executive Cockpit
+        if build_cube:
+            self._save_cube(DailyCube.build(df))
+
+        # 7. Memory-mappable snapshot for multi-process servers
+        if snapshot or (snapshot is None and self.arrow_snapshot):
+            self._save_snapshot()
         return df
 
+    def chunk_rows(self, memory_limit_mb=None):
+        memory_limit_mb = memory_limit_mb or self.memory_limit_mb
+        # A raw chunk and its cleaned copy are alive at the same time
+        return max(10_000, (memory_limit_mb << 20) // (2 * ROW_BYTES_ESTIMATE))
+
+    def iter_clean_chunks(self, path=None, memory_limit_mb=None):
+        """Yields (raw_row_count, cleaned_chunk) pairs sized to stay under the memory ceiling."""
+        reader = pd.read_csv(
+            path or self.raw_path,
+            dtype=DTYPE_SPEC,
+            parse_dates=['InvoiceDate'],
+            encoding='ISO-8859-1',
+            chunksize=self.chunk_rows(memory_limit_mb)
+        )
+        with reader:
+            for chunk in reader:
+                yield len(chunk), self.apply_cleaning_rules(chunk)
+
+    @instrumented('etl.clean_data_streaming')
+    def clean_data_streaming(self, memory_limit_mb=None, build_cube=True, snapshot=None):
+        """
+        Bounded-memory variant of clean_data: reads the CSV in chunks, cleans each
+        chunk with the same rules and appends it to the Parquet file as row groups.
+        Chronological exports come out time-sorted directly; otherwise an out-of-core
+        sort pass follows. Returns run statistics instead of the DataFrame.
+        """
+        memory_limit_mb = memory_limit_mb or self.memory_limit_mb
+        print(f"🚀 Starting Streaming ETL Pipeline (ceiling ~{memory_limit_mb} MB)...")
+
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        tmp_path = self.output_path + '.tmp'
+        writer = None
+        cube = RunningCube()
+        rows_in = rows_out = 0
+        last_date = None
+        in_order = True
+        started = time.perf_counter()
+        try:
+            for raw_rows, df in self.iter_clean_chunks(memory_limit_mb=memory_limit_mb):
+                rows_in += raw_rows
+                rows_out += len(df)
+                if df.empty:
+                    continue
+                if build_cube:
+                    cube.add(df)
+                df = df.sort_values('InvoiceDate', kind='stable')
+                if last_date is not None and df['InvoiceDate'].iloc[0] < last_date:
+                    in_order = False
+                last_date = df['InvoiceDate'].iloc[-1]
+                if writer is None:
+                    schema = gold_schema(df)
+                    writer = pq.ParquetWriter(tmp_path, schema)
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+                                   row_group_size=self.row_group_rows)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            raise ValueError(f"❌ No rows found in {self.raw_path}")
+        if not in_order:
+            print("🔀 Export is not chronological, running out-of-core sort...")
+            sorted_path = self.output_path + '.sorted.tmp'
+            sort_parquet_by_date(tmp_path, sorted_path, self.chunk_rows(memory_limit_mb), self.row_group_rows)
+            os.replace(sorted_path, tmp_path)
+        os.replace(tmp_path, self.output_path)
+
+        elapsed = time.perf_counter() - started
+        record_rows(rows_in)
+        stats = {
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(rows_in / elapsed) if elapsed else None,
+        }
+        print(f"✅ Cleaned {rows_in - rows_out} outlier/junk rows.")
+        print(f"📊 Final Row Count: {rows_out}")
+        print(f"⚡ Throughput: {stats['rows_per_sec']:,} rows/s")
+        print(f"📦 Gold Layer saved to: {self.output_path}")
+        if build_cube:
+            self._save_cube(cube.result())
+        if snapshot or (snapshot is None and self.arrow_snapshot):
+            self._save_snapshot()
+        return stats
+
 if __name__ == "__main__":
     engineer = DataEngineer()
-    engineer.clean_data()
\ No newline at end of file
+    snapshot = True if '--snapshot' in sys.argv else None
+    if '--stream' in sys.argv:
+        engineer.clean_data_streaming(snapshot=snapshot)
+    else:
+        engineer.clean_data(snapshot=snapshot)
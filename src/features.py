@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from dotenv import load_dotenv
+
+from src.gold_layer import version_of
+from src.instrumentation import instrumented, record_rows
+from src.query import GoldQuery
+from src.remote_parquet import is_remote
+
+load_dotenv()
+
+# The one definition of the forecasting features, shared by training, the Predictor Lab
+# and the recursive forecast. Month_Ordinal is the period ordinal at any granularity;
+# the name is kept because registered models were trained on it.
+FEATURES = ['Month_Ordinal', 'Lag_1', 'Lag_2', 'Rolling_Mean']
+LAGS = [1, 2]
+ROLLING_WINDOW = 3
+# Granularity -> pandas frequency of the period starts (weeks start on Monday)
+GRANULARITIES = {'daily': 'D', 'weekly': 'W-MON', 'monthly': 'MS'}
+# Where materialized features live when the Gold Layer is remote (no directory beside it)
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR")
+
+_FRAMES = {}
+_LOCK = threading.Lock()
+# One lock per (gold_path, granularity), held while its store is refreshed (others aren't blocked)
+_KEY_LOCKS = {}
+
+
+def check_granularity(granularity):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"❌ Unknown granularity '{granularity}' (expected one of {sorted(GRANULARITIES)}).")
+    return granularity
+
+
+def add_lag_features(periods, keys=None):
+    """
+    Lag/rolling features on period totals sorted by (keys, InvoiceDate), for every
+    series in one grouped pass. keys=None treats the frame as a single series.
+    """
+    periods = periods.copy()
+    if not keys:
+        lag_1 = periods['Line_Total'].shift(1)
+        periods['Month_Ordinal'] = np.arange(len(periods))
+        periods['Lag_1'] = lag_1
+        periods['Lag_2'] = periods['Line_Total'].shift(2)
+        periods['Rolling_Mean'] = lag_1.rolling(window=ROLLING_WINDOW).mean()
+        return periods
+
+    grouped = periods.groupby(keys, sort=False, observed=True)
+    lag_1 = grouped['Line_Total'].shift(1)
+    periods['Month_Ordinal'] = grouped.cumcount()
+    periods['Lag_1'] = lag_1
+    periods['Lag_2'] = grouped['Line_Total'].shift(2)
+    # Rows are sorted by key, so the grouped rolling result lines up positionally
+    group_ids = grouped.ngroup().to_numpy()
+    periods['Rolling_Mean'] = lag_1.groupby(group_ids, sort=False).rolling(window=ROLLING_WINDOW).mean().to_numpy()
+    return periods
+
+
+def next_features(window, ordinal):
+    """
+    Features of the period after `window` (n_paths x ROLLING_WINDOW latest totals,
+    oldest first), as add_lag_features would compute them once that period is appended.
+    """
+    return pd.DataFrame({
+        'Month_Ordinal': np.full(len(window), ordinal),
+        'Lag_1': window[:, -1],
+        'Lag_2': window[:, -2],
+        'Rolling_Mean': window[:, -ROLLING_WINDOW:].mean(axis=1),
+    }, columns=FEATURES)
+
+
+def period_starts(dates, granularity):
+    """Start of the period each InvoiceDate falls in."""
+    days = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    if granularity == 'monthly':
+        return days.astype('datetime64[M]').astype('datetime64[ns]')
+    if granularity == 'weekly':
+        # 1970-01-01 was a Thursday: (days + 3) % 7 counts days since Monday
+        days = days - (days.astype(np.int64) + 3) % 7
+    return days.astype('datetime64[ns]')
+
+
+def period_totals(query, granularity):
+    """Line_Total and row count per period of a GoldQuery, aggregated one scanned batch at a time."""
+    partials = []
+    rows = 0
+    for batch in query.batches(columns=['InvoiceDate', 'Line_Total']):
+        rows += len(batch)
+        periods = period_starts(batch['InvoiceDate'], granularity)
+        partials.append(batch['Line_Total'].astype(np.float64).groupby(periods).agg(['sum', 'size']))
+    record_rows(rows)
+    if not partials:
+        return pd.DataFrame(columns=['InvoiceDate', 'Line_Total', 'Rows']), rows
+    totals = pd.concat(partials).groupby(level=0).sum()
+    totals = pd.DataFrame({
+        'InvoiceDate': totals.index.to_numpy(dtype='datetime64[ns]'),
+        'Line_Total': totals['sum'].to_numpy(),
+        'Rows': totals['size'].to_numpy(dtype=np.int64),
+    })
+    return totals, rows
+
+
+def store_dir_for(gold_path):
+    """data/processed/cleaned_data.parquet -> data/processed/cleaned_data_features/"""
+    if FEATURE_STORE_DIR:
+        return FEATURE_STORE_DIR
+    if is_remote(gold_path):
+        digest = hashlib.sha256(gold_path.encode()).hexdigest()[:16]
+        return os.path.join('data', 'cache', 'features', digest)
+    return os.path.splitext(gold_path.rstrip('/\\'))[0] + '_features'
+
+
+class FeatureStore:
+    """
+    Materialized period totals and lag/rolling features of the Gold Layer, one table per
+    granularity (daily, weekly, monthly), kept beside the Gold Layer.
+
+    A refresh after new data arrives scans only the rows from the last stored period on:
+    that period (possibly partial) is recomputed, later ones are appended, and the
+    features are re-derived from the stored totals. The stored history is trusted if the
+    Gold Layer still holds the same number of rows before that period (counted from
+    row-group statistics); otherwise the table is rebuilt. Retroactive edits that keep
+    the row count need rebuild().
+    """
+
+    def __init__(self, gold_path, store_dir=None):
+        self.gold_path = gold_path
+        self.store_dir = store_dir or store_dir_for(gold_path)
+        self.stats = {}
+
+    def _paths(self, granularity):
+        base = os.path.join(self.store_dir, check_granularity(granularity))
+        return base + '.parquet', base + '.json'
+
+    # --- 1. Persistence ---
+    def load(self, granularity):
+        """(features, meta) as last saved, or (None, None) if there are none."""
+        table_path, meta_path = self._paths(granularity)
+        if not os.path.exists(meta_path):
+            return None, None
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        return pd.read_parquet(table_path), meta
+
+    def save(self, granularity, features, version):
+        os.makedirs(self.store_dir, exist_ok=True)
+        table_path, meta_path = self._paths(granularity)
+        # The meta file is replaced last: a table without a matching meta is never trusted
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        # Per process, so concurrent writers never share a temporary file
+        tmp_suffix = f'.{os.getpid()}.tmp'
+        features.to_parquet(table_path + tmp_suffix, index=False)
+        os.replace(table_path + tmp_suffix, table_path)
+        meta = {
+            'source_version': version,
+            'granularity': granularity,
+            'freq': GRANULARITIES[granularity],
+            'periods': len(features),
+            'rows': int(features['Rows'].sum()),
+        }
+        with open(meta_path + tmp_suffix, 'w') as fh:
+            json.dump(meta, fh, indent=2)
+        os.replace(meta_path + tmp_suffix, meta_path)
+
+    # --- 2. Materializing ---
+    def _materialize(self, totals, granularity):
+        """Regrids totals onto every period (empty ones as 0, like resample) and adds the features."""
+        if totals.empty:
+            return add_lag_features(totals)
+        grid = pd.date_range(totals['InvoiceDate'].iloc[0], totals['InvoiceDate'].iloc[-1],
+                             freq=GRANULARITIES[granularity], name='InvoiceDate')
+        totals = totals.set_index('InvoiceDate').reindex(grid, fill_value=0).reset_index()
+        totals['Rows'] = totals['Rows'].astype(np.int64)
+        return add_lag_features(totals[['InvoiceDate', 'Line_Total', 'Rows']])
+
+    def rebuild(self, granularity='monthly', version=None):
+        version = version or version_of(self.gold_path)
+        totals, scanned = period_totals(GoldQuery(source=self.gold_path), granularity)
+        features = self._materialize(totals, granularity)
+        self.save(granularity, features, version)
+        self.stats = {'mode': 'rebuilt', 'rows_scanned': scanned, 'new_periods': len(features)}
+        return features
+
+    @instrumented('features.refresh')
+    def refresh(self, granularity='monthly', version=None):
+        """Brings the stored features up to the current Gold Layer version and returns them."""
+        version = version or version_of(self.gold_path)
+        features, meta = self.load(granularity)
+        if meta is None or features.empty:
+            return self.rebuild(granularity, version)
+        if meta['source_version'] == version:
+            self.stats = {'mode': 'cached', 'rows_scanned': 0, 'new_periods': 0}
+            return features
+
+        # 1. Is the history before the last stored period unchanged?
+        boundary = features['InvoiceDate'].iloc[-1]
+        before = ds.field('InvoiceDate') < pa.scalar(np.datetime64(boundary, 'ns'), pa.timestamp('ns'))
+        history_rows = int(features['Rows'].iloc[:-1].sum())
+        if GoldQuery(source=self.gold_path).where(before, ['InvoiceDate']).count() != history_rows:
+            return self.rebuild(granularity, version)
+
+        # 2. Re-aggregate only the last stored period and everything after it
+        since = ds.field('InvoiceDate') >= pa.scalar(np.datetime64(boundary, 'ns'), pa.timestamp('ns'))
+        fresh, scanned = period_totals(GoldQuery(source=self.gold_path).where(since, ['InvoiceDate']), granularity)
+        kept = features.iloc[:-1][['InvoiceDate', 'Line_Total', 'Rows']]
+        features = self._materialize(pd.concat([kept, fresh], ignore_index=True), granularity)
+        self.save(granularity, features, version)
+        self.stats = {'mode': 'appended', 'rows_scanned': scanned, 'new_periods': len(features) - len(kept)}
+        return features
+
+    def training_frame(self, granularity='monthly', version=None):
+        """Periods with every feature defined (the first ones lack lags), ready for fit/predict."""
+        return self.refresh(granularity, version).dropna(subset=FEATURES).reset_index(drop=True)
+
+
+def load_features(gold_path, version, granularity='monthly'):
+    """Process-wide features for a Gold Layer version, refreshed from the store once per version."""
+    key = (gold_path, version, granularity)
+    with _LOCK:
+        if key in _FRAMES:
+            return _FRAMES[key]
+        key_lock = _KEY_LOCKS.setdefault((gold_path, granularity), threading.Lock())
+
+    # The refresh runs under this store's own lock: concurrent callers wait for one result,
+    # while other stores (and cache hits) go ahead
+    with key_lock:
+        if key in _FRAMES:
+            return _FRAMES[key]
+        features = FeatureStore(gold_path).refresh(granularity, version)
+        with _LOCK:
+            for stale in [k for k in _FRAMES if k[0] == gold_path and k[2] == granularity]:
+                del _FRAMES[stale]
+            _FRAMES[key] = features
+        return features
+
+if __name__ == "__main__":
+    import sys
+    from src.gold_layer import gold_source
+    path, version = gold_source()
+    store = FeatureStore(path)
+    for granularity in sys.argv[1:] or list(GRANULARITIES):
+        features = store.refresh(granularity, version)
+        print(f"✅ {granularity}: {len(features)} periods ({store.stats['mode']}, "
+              f"{store.stats['rows_scanned']:,} rows scanned) in {store.store_dir}")
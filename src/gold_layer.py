@@ -0,0 +1,383 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from dotenv import load_dotenv
+
+from src.instrumentation import instrumented, record_rows
+from src.remote_parquet import RemoteFile, is_remote, open_remote
+
+load_dotenv()
+
+# Verified Dropbox link for the cloud deployment (override with GOLD_LAYER_URL)
+DEFAULT_CLOUD_URL = "https://www.dropbox.com/scl/fi/5daz0xt5dthm24hbyioxb/cleaned_data.parquet?rlkey=wvkn08glbo3ofur47l77fy978&st=9jbpru00&dl=1"
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = '_manifest.json'
+# Schema metadata key of an Arrow snapshot: the Parquet version it was converted from
+SNAPSHOT_VERSION_KEY = b'gold_source_version'
+
+# Process-wide state shared by every page and every session of the server
+_TABLES = {}
+_DIGESTS = {}
+_SNAPSHOTS = {}
+_LOCK = threading.Lock()
+_SNAPSHOT_LOCK = threading.Lock()
+
+
+def file_digest(path):
+    """SHA-256 of a file, memoised on (size, mtime) so reruns don't rehash it."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _DIGESTS:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+        _DIGESTS[key] = sha.hexdigest()
+    return _DIGESTS[key]
+
+
+def dataset_files(path):
+    """Committed part files of a partitioned Gold Layer directory, in partition order."""
+    with open(os.path.join(path, MANIFEST_NAME)) as fh:
+        parts = json.load(fh)['parts']
+    return [os.path.join(path, rel_path) for rel_path in sorted(parts)]
+
+
+def version_of(path):
+    """Content version of a Gold Layer file, or of a partitioned dataset via its manifest."""
+    if is_remote(path):
+        return open_remote(path).version
+    if os.path.isdir(path):
+        # The manifest is rewritten on every committed ingest, so it versions the dataset
+        return file_digest(os.path.join(path, MANIFEST_NAME))
+    return file_digest(path)
+
+
+def snapshot_path_for(path):
+    """data/processed/cleaned_data.parquet -> data/processed/cleaned_data.arrow"""
+    return os.path.splitext(path)[0] + '.arrow'
+
+
+def write_snapshot(table, path, source_version):
+    """
+    Publishes `table` as an uncompressed Arrow IPC file stamped with the Parquet version
+    it mirrors. It is written as one record batch with unified dictionaries, so readers
+    get contiguous columns they can view without copying. The file is written beside the
+    target and renamed over it: processes that still map the previous snapshot keep
+    reading its (unlinked) pages, and new readers only ever see a complete file.
+    """
+    table = table.unify_dictionaries().combine_chunks()
+    metadata = dict(table.schema.metadata or {})
+    metadata[SNAPSHOT_VERSION_KEY] = source_version.encode()
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def open_snapshot(path, version):
+    """
+    Memory-mapped Arrow table of the snapshot beside a Gold Layer file, or None if there
+    is none or it was converted from another version. Its buffers live in the page cache,
+    shared by every process that maps the same file.
+    """
+    if is_remote(path) or os.path.isdir(path):
+        return None
+    snapshot_path = snapshot_path_for(path)
+    try:
+        st = os.stat(snapshot_path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    with _SNAPSHOT_LOCK:
+        cached = _SNAPSHOTS.get(snapshot_path)
+        if cached is None or cached[0] != key:
+            reader = pa.ipc.open_file(pa.memory_map(snapshot_path))
+            cached = (key, reader.schema.metadata.get(SNAPSHOT_VERSION_KEY, b'').decode(), reader.read_all())
+            _SNAPSHOTS[snapshot_path] = cached
+    return cached[2] if cached[1] == version else None
+
+
+def read_gold_table(path, version=None):
+    """
+    Reads either the single-file Gold Layer or the incremental partitioned one. A current
+    Arrow snapshot is preferred: its numeric, date and categorical-code columns come back
+    as read-only views over the mapped file instead of per-process copies.
+    """
+    if is_remote(path):
+        return open_remote(path).dataset().to_table().to_pandas()
+    if os.path.isdir(path):
+        files = dataset_files(path)
+        if not files:
+            return pd.DataFrame()
+        return pq.ParquetDataset(files, partitioning=None).read_pandas().to_pandas()
+    snapshot = open_snapshot(path, version or version_of(path))
+    if snapshot is not None:
+        return snapshot.to_pandas(split_blocks=True)
+    return pd.read_parquet(path)
+
+
+def _date_bounds(start, end):
+    """Inclusive calendar-day range -> half-open [lo, hi) datetime64 bounds (None = open)."""
+    lo = None if start is None else np.datetime64(pd.Timestamp(start).normalize(), 'ns')
+    hi = None if end is None else np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1), 'ns')
+    return lo, hi
+
+
+def slice_by_date(df, start=None, end=None, column='InvoiceDate'):
+    """
+    Rows of a frame sorted on `column` that fall in [start, end] (whole days).
+    Binary search on the sorted values and a positional slice: no per-row mask,
+    no Python date objects.
+    """
+    lo, hi = _date_bounds(start, end)
+    dates = df[column].to_numpy()
+    first = 0 if lo is None else np.searchsorted(dates, lo, 'left')
+    last = len(dates) if hi is None else np.searchsorted(dates, hi, 'left')
+    return df.iloc[first:last]
+
+
+def read_date_range(path, start=None, end=None, columns=None):
+    """
+    Reads [start, end] from a Gold Layer file or dataset on disk, touching only the row
+    groups whose InvoiceDate statistics overlap the range. A file is time-sorted; the
+    parts of a dataset overlap in time (one per raw extract in each month), so their
+    rows are sorted on InvoiceDate before the range is cut.
+    """
+    lo, hi = _date_bounds(start, end)
+    files = dataset_files(path) if os.path.isdir(path) else [path]
+    read_columns = None if columns is None else list(dict.fromkeys([*columns, 'InvoiceDate']))
+    tables = []
+    for file in files:
+        pf = pq.ParquetFile(file)
+        date_idx = pf.schema_arrow.get_field_index('InvoiceDate')
+        row_groups = []
+        for rg in range(pf.num_row_groups):
+            stats = pf.metadata.row_group(rg).column(date_idx).statistics
+            if stats is not None and stats.has_min_max:
+                if (hi is not None and stats.min >= hi) or (lo is not None and stats.max < lo):
+                    continue
+            row_groups.append(rg)
+        if row_groups:
+            tables.append(pf.read_row_groups(row_groups, columns=read_columns))
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    table = pa.concat_tables(tables)
+    if len(tables) > 1:
+        table = table.sort_by('InvoiceDate')
+    df = slice_by_date(table.to_pandas(), start, end)
+    return df if columns is None else df[columns]
+
+
+class GoldLayer:
+    """
+    Single access point for the cleaned Parquet Gold Layer.
+
+    Uses PROCESSED_DATASET_PATH (incremental, partitioned) or PROCESSED_DATA_PATH
+    when either exists locally, otherwise keeps a checksummed
+    copy of the cloud file on disk and revalidates it with ETag/Last-Modified.
+    Every caller in the process gets the same DataFrame object back.
+
+    GOLD_REMOTE_MODE=range skips the local copy: the cloud URL itself is the path,
+    and scans fetch only the footer and the column chunks they read (src.remote_parquet).
+    """
+
+    def __init__(self, local_path=None, cloud_url=None, cache_dir=None, revalidate_after=None, timeout=30):
+        if local_path is None:
+            candidates = [os.getenv("PROCESSED_DATASET_PATH"), os.getenv("PROCESSED_DATA_PATH")]
+            local_path = next((p for p in candidates if p and os.path.exists(p)), None)
+        self.local_path = local_path
+        self.cloud_url = cloud_url or os.getenv("GOLD_LAYER_URL", DEFAULT_CLOUD_URL)
+        self.cache_dir = cache_dir or os.getenv("GOLD_CACHE_DIR", os.path.join(PROJECT_ROOT, 'data', 'cache'))
+        if revalidate_after is None:
+            revalidate_after = os.getenv("GOLD_REVALIDATE_SECONDS", 300)
+        self.revalidate_after = float(revalidate_after)
+        self.timeout = timeout
+        self.remote_mode = os.getenv("GOLD_REMOTE_MODE", "download")
+
+        self.cache_path = os.path.join(self.cache_dir, 'cleaned_data.parquet')
+        self.meta_path = self.cache_path + '.json'
+        self.stats = {}
+        self.loaded_version = None
+        self.loaded_path = None
+
+    # --- 1. Locating the file ---
+    def resolve(self):
+        """Returns (path, version) of the Parquet file backing the Gold Layer."""
+        if self.local_path and os.path.exists(self.local_path):
+            self.stats.update(source='local', bytes_downloaded=0)
+            return self.local_path, version_of(self.local_path)
+        if self.remote_mode == 'range':
+            handle = open_remote(self.cloud_url, self.revalidate_after)
+            self.stats.update(source='range', **handle.stats)
+            return self.cloud_url, handle.version
+        meta = self._sync_remote()
+        return self.cache_path, meta['sha256']
+
+    def _read_meta(self):
+        if not (os.path.exists(self.cache_path) and os.path.exists(self.meta_path)):
+            return None
+        with open(self.meta_path) as fh:
+            return json.load(fh)
+
+    def _write_meta(self, meta):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(meta, fh, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def _sync_remote(self):
+        meta = self._read_meta()
+        if meta and time.time() - meta.get('checked_at', 0) < self.revalidate_after:
+            self.stats.update(source='cache', bytes_downloaded=0)
+            return meta
+
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        started = time.perf_counter()
+        try:
+            remote = RemoteFile(self.cloud_url, timeout=self.timeout)
+            if remote.probe(headers) is None:
+                meta['checked_at'] = time.time()
+                self._write_meta(meta)
+                self.stats.update(source='revalidated', bytes_downloaded=0, requests=remote.stats['requests'])
+                return meta
+            if remote.accepts_ranges:
+                # Parallel blocks, resumed from dest.part if an earlier attempt failed
+                new_meta = remote.download(self.cache_path)
+            else:
+                with requests.get(remote.url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    new_meta = self._stream_to_cache(response)
+        except requests.RequestException as e:
+            if meta is None:
+                raise
+            # Serve the last good copy rather than failing the whole dashboard
+            print(f"⚠️ Gold Layer revalidation failed, using cached copy: {e}")
+            self.stats.update(source='stale-cache', bytes_downloaded=0)
+            return meta
+
+        new_meta['checked_at'] = time.time()
+        self._write_meta(new_meta)
+        changed = meta is None or meta['sha256'] != new_meta['sha256']
+        self.stats.update(
+            source='download' if changed else 'download-unchanged',
+            bytes_downloaded=remote.stats['bytes'] if remote.accepts_ranges else new_meta['bytes'],
+            requests=remote.stats['requests'],
+            retries=remote.stats['retries'],
+            download_seconds=round(time.perf_counter() - started, 3),
+        )
+        return new_meta
+
+    @instrumented('gold.download')
+    def _stream_to_cache(self, response):
+        """Streams the body to a temp file while hashing it, then swaps it in atomically."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.part"
+        sha = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as fh:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    fh.write(chunk)
+                    sha.update(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, self.cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return {
+            'url': self.cloud_url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': sha.hexdigest(),
+            'bytes': size,
+        }
+
+    @instrumented('gold.locate')
+    def locate(self):
+        """(path, version) of the current Gold Layer without parsing it, for projected scans."""
+        with _LOCK:
+            path, version = self.resolve()
+            self.loaded_version = version
+            self.loaded_path = path
+            return path, version
+
+    # --- 2. Loading the shared table ---
+    @instrumented('gold.load')
+    def load(self):
+        """Returns the process-wide DataFrame, re-parsing only when the file version changes."""
+        with _LOCK:
+            path, version = self.resolve()
+            cached = _TABLES.get(path)
+            self.loaded_version = version
+            self.loaded_path = path
+            if cached and cached[0] == version:
+                self.stats['parse_seconds'] = 0.0
+                return cached[1]
+
+            started = time.perf_counter()
+            df = read_gold_table(path, version)
+            if 'InvoiceDate' in df and not df['InvoiceDate'].is_monotonic_increasing:
+                # Files written before the ETL sorted by date: sort once so slicing works
+                df = df.sort_values('InvoiceDate', kind='stable', ignore_index=True)
+            _TABLES[path] = (version, df)
+            self.stats.update(
+                version=version,
+                snapshot=open_snapshot(path, version) is not None,
+                rows=len(df),
+                parse_seconds=round(time.perf_counter() - started, 3),
+                memory_bytes=int(df.memory_usage(deep=True).sum()),
+            )
+            record_rows(len(df))
+            return df
+
+
+_DEFAULT = None
+
+
+def get_gold_layer():
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = GoldLayer()
+    return _DEFAULT
+
+
+def load_gold_layer():
+    """Shortcut used by the dashboard pages."""
+    return get_gold_layer().load()
+
+
+def gold_source():
+    """(path, version) of the Gold Layer for pages that scan it through src.query."""
+    return get_gold_layer().locate()
+
+
+def dataset_version():
+    """Content hash of the Gold Layer most recently resolved by load_gold_layer() or gold_source()."""
+    return get_gold_layer().loaded_version
+
+
+def dataset_path():
+    """Local file or directory most recently resolved by load_gold_layer() or gold_source()."""
+    return get_gold_layer().loaded_path
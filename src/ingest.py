@@ -0,0 +1,258 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from src.data_loader import DataEngineer, gold_schema
+from src.gold_layer import MANIFEST_NAME
+
+# Identifies a sales line across raw extracts (the Invoice prefix lives in Is_Cancelled)
+ROW_KEY = ['Invoice', 'Is_Cancelled', 'StockCode', 'InvoiceDate']
+
+
+def default_dataset_path():
+    path = os.getenv("PROCESSED_DATASET_PATH")
+    if path:
+        return path
+    # data/processed/cleaned_data.parquet -> data/processed/cleaned_data/
+    return os.path.splitext(os.getenv("PROCESSED_DATA_PATH", "data/processed/cleaned_data.parquet"))[0]
+
+
+def read_manifest(dataset_path):
+    manifest_path = os.path.join(dataset_path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {'watermark': None, 'files': {}, 'parts': {}}
+    with open(manifest_path) as fh:
+        return json.load(fh)
+
+
+def write_manifest(dataset_path, manifest):
+    manifest_path = os.path.join(dataset_path, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def row_keys(df):
+    """64-bit hash of each row's ROW_KEY values, comparable between raw chunks and stored parts."""
+    keys = pd.DataFrame({
+        'Invoice': df['Invoice'].to_numpy(dtype=np.int64),
+        'Is_Cancelled': df['Is_Cancelled'].to_numpy(dtype=bool),
+        'StockCode': df['StockCode'].astype(str).to_numpy(),
+        'InvoiceDate': df['InvoiceDate'].to_numpy(dtype='datetime64[ns]'),
+    })
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def sha256_of(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class IncrementalIngestor:
+    """
+    Watermark-based ingestion of raw extracts into a year/month partitioned Gold Layer.
+
+    The manifest (_manifest.json) records every raw file already processed, the
+    high-water mark on InvoiceDate and the committed part files. Only new or changed
+    raw files are cleaned. Their rows newer than the watermark are appended as they
+    are; rows at or before it are appended unless the same line (ROW_KEY) is already in
+    a committed part of their month, so overlapping daily extracts don't duplicate
+    rows while a late or out-of-order extract still lands. Part files not listed in the
+    manifest belong to an interrupted run and are removed on the next run, which makes
+    re-runs idempotent. Every part is sorted on InvoiceDate. Retroactive edits to rows
+    already ingested need a full rebuild with DataEngineer.clean_data.
+    """
+
+    def __init__(self, raw_source=None, dataset_path=None, memory_limit_mb=None):
+        self.engineer = DataEngineer()
+        load_dotenv()
+        self.raw_source = raw_source or os.getenv("RAW_DATA_DIR") or self.engineer.raw_path
+        self.dataset_path = dataset_path or default_dataset_path()
+        self.memory_limit_mb = memory_limit_mb or self.engineer.memory_limit_mb
+
+    def raw_files(self):
+        if os.path.isdir(self.raw_source):
+            return sorted(glob.glob(os.path.join(self.raw_source, '*.csv')))
+        return [self.raw_source]
+
+    def _remove_orphans(self, manifest):
+        committed = set(manifest['parts'])
+        pattern = os.path.join(self.dataset_path, 'year=*', 'month=*', '*.parquet*')
+        for path in glob.glob(pattern):
+            if os.path.relpath(path, self.dataset_path) not in committed:
+                os.remove(path)
+
+    def _changed_files(self, manifest):
+        """Yields (path, fingerprint) for raw files that are new or whose content changed."""
+        for path in self.raw_files():
+            st = os.stat(path)
+            key = os.path.abspath(path)
+            seen = manifest['files'].get(key)
+            if seen and seen['size'] == st.st_size and seen['mtime_ns'] == st.st_mtime_ns:
+                continue
+            digest = sha256_of(path)
+            if seen and seen['sha256'] == digest:
+                # Touched but identical: remember the new stat so we don't rehash next time
+                seen.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                continue
+            yield path, {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+
+    def _partition_keys(self, year, month, manifest, known):
+        """Row keys of the committed parts of one month, read once per ingested file."""
+        partition = os.path.join(f'year={year}', f'month={month:02d}')
+        if partition not in known:
+            parts = [os.path.join(self.dataset_path, p) for p in manifest['parts'] if os.path.dirname(p) == partition]
+            keys = [row_keys(pq.read_table(part, columns=ROW_KEY).to_pandas()) for part in parts]
+            known[partition] = np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+        return known[partition]
+
+    def _already_ingested(self, df, watermark, manifest, known):
+        """Mask of the rows at or before the watermark whose line is already in their month's parts."""
+        duplicate = np.zeros(len(df), dtype=bool)
+        old = np.flatnonzero((df['InvoiceDate'] <= watermark).to_numpy())
+        if not len(old):
+            return duplicate
+        candidates = df.iloc[old]
+        dates = candidates['InvoiceDate']
+        for (year, month), rows in candidates.groupby([dates.dt.year, dates.dt.month]).indices.items():
+            stored = self._partition_keys(year, month, manifest, known)
+            duplicate[old[rows]] = np.isin(row_keys(candidates.iloc[rows]), stored)
+        return duplicate
+
+    def _sort_part(self, rel_path):
+        """Rewrites a part sorted on InvoiceDate if its chunks didn't arrive in order."""
+        full_path = os.path.join(self.dataset_path, rel_path)
+        dates = pq.read_table(full_path, columns=['InvoiceDate']).column(0).to_pandas()
+        if dates.is_monotonic_increasing:
+            return
+        table = pq.read_table(full_path).sort_by('InvoiceDate')
+        pq.write_table(table, full_path + '.tmp')
+        os.replace(full_path + '.tmp', full_path)
+
+    def _ingest_file(self, path, fingerprint, manifest):
+        watermark = pd.Timestamp(manifest['watermark']) if manifest['watermark'] else None
+        writers = {}
+        new_parts = {}
+        known = {}
+        rows_in = rows_out = 0
+        schema = None
+        try:
+            for raw_rows, df in self.engineer.iter_clean_chunks(path, self.memory_limit_mb):
+                rows_in += raw_rows
+                if watermark is not None:
+                    df = df[~self._already_ingested(df, watermark, manifest, known)]
+                if df.empty:
+                    continue
+                schema = schema or gold_schema(df)
+                df = df.sort_values('InvoiceDate', kind='stable')
+                dates = df['InvoiceDate']
+                for (year, month), part in df.groupby([dates.dt.year, dates.dt.month], sort=True):
+                    # Deterministic name: re-running the same file rewrites the same parts
+                    rel_path = os.path.join(
+                        f'year={year}', f'month={month:02d}', f"part-{fingerprint['sha256'][:16]}.parquet"
+                    )
+                    if rel_path not in writers:
+                        full_path = os.path.join(self.dataset_path, rel_path)
+                        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                        writers[rel_path] = pq.ParquetWriter(full_path, schema)
+                        new_parts[rel_path] = 0
+                    writers[rel_path].write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+                    new_parts[rel_path] += len(part)
+                    rows_out += len(part)
+                    file_max = part['InvoiceDate'].max()
+                    if manifest['watermark'] is None or file_max > pd.Timestamp(manifest['watermark']):
+                        manifest['watermark'] = file_max.isoformat()
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        # Chunks are sorted on their own; a part spanning several is re-sorted before it's committed
+        for rel_path in new_parts:
+            self._sort_part(rel_path)
+        manifest['parts'].update(new_parts)
+        manifest['files'][os.path.abspath(path)] = dict(fingerprint, rows_in=rows_in, rows_appended=rows_out)
+        # Commit point: once the manifest is replaced the new parts are visible to readers
+        write_manifest(self.dataset_path, manifest)
+        return rows_in, rows_out
+
+    def run(self):
+        print("🚀 Starting Incremental Ingestion...")
+        started = time.perf_counter()
+        os.makedirs(self.dataset_path, exist_ok=True)
+        manifest = read_manifest(self.dataset_path)
+        self._remove_orphans(manifest)
+
+        files = rows_in = rows_out = 0
+        for path, fingerprint in list(self._changed_files(manifest)):
+            file_in, file_out = self._ingest_file(path, fingerprint, manifest)
+            print(f"📥 {os.path.basename(path)}: {file_out:,} of {file_in:,} rows appended")
+            files += 1
+            rows_in += file_in
+            rows_out += file_out
+        write_manifest(self.dataset_path, manifest)
+
+        stats = {
+            'files': files,
+            'rows_in': rows_in,
+            'rows_appended': rows_out,
+            'watermark': manifest['watermark'],
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        if files == 0:
+            print("✅ Gold Layer already up to date.")
+        else:
+            print(f"✅ Ingested {files} file(s); watermark now {manifest['watermark']}")
+        return stats
+
+    def compact(self, min_part_rows=250_000):
+        """Merges the parts of each partition that has any part below min_part_rows into one file."""
+        manifest = read_manifest(self.dataset_path)
+        self._remove_orphans(manifest)
+
+        by_partition = {}
+        for rel_path, rows in manifest['parts'].items():
+            by_partition.setdefault(os.path.dirname(rel_path), []).append((rel_path, rows))
+
+        merged = 0
+        stale = []
+        for partition, parts in sorted(by_partition.items()):
+            if len(parts) < 2 or min(rows for _, rows in parts) >= min_part_rows:
+                continue
+            names = sorted(rel_path for rel_path, _ in parts)
+            table = pa.concat_tables([pq.read_table(os.path.join(self.dataset_path, p)) for p in names])
+            table = table.sort_by('InvoiceDate')
+            digest = hashlib.sha256('|'.join(names).encode()).hexdigest()[:16]
+            rel_path = os.path.join(partition, f'part-compacted-{digest}.parquet')
+            pq.write_table(table, os.path.join(self.dataset_path, rel_path))
+
+            for name in names:
+                del manifest['parts'][name]
+            manifest['parts'][rel_path] = table.num_rows
+            stale.extend(names)
+            merged += len(names)
+
+        if merged:
+            write_manifest(self.dataset_path, manifest)
+            # Old parts are no longer referenced once the manifest is committed
+            for name in stale:
+                os.remove(os.path.join(self.dataset_path, name))
+        print(f"🧹 Compacted {merged} part file(s).")
+        return merged
+
+if __name__ == "__main__":
+    ingestor = IncrementalIngestor()
+    ingestor.run()
+    if '--compact' in sys.argv:
+        ingestor.compact()
@@ -0,0 +1,238 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# STAGE_LOG: unset = no log output, 'stderr' = JSON lines on stderr, otherwise a file path
+STAGE_LOG = os.getenv("STAGE_LOG")
+# STAGE_PROFILE: comma-separated stage names (or '*') to run under cProfile
+STAGE_PROFILE = {name.strip() for name in os.getenv("STAGE_PROFILE", "").split(',') if name.strip()}
+STAGE_PROFILE_DIR = os.getenv("STAGE_PROFILE_DIR", "data/profiles")
+# Shows the diagnostics panel on every page (otherwise only with ?diagnostics=1)
+STAGE_DIAGNOSTICS = os.getenv("STAGE_DIAGNOSTICS", "0") == "1"
+# How often RSS is sampled while stages are open
+STAGE_SAMPLE_MS = float(os.getenv("STAGE_SAMPLE_MS", 10))
+
+logger = logging.getLogger("ajaydatalabs.stages")
+logger.propagate = False
+if STAGE_LOG:
+    handler = logging.StreamHandler(sys.stderr) if STAGE_LOG == 'stderr' else logging.FileHandler(STAGE_LOG)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+# Per thread: the open stages (innermost last) and the records of the current run.
+# A Streamlit rerun executes on one script thread, so a thread's run is the rerun.
+_LOCAL = threading.local()
+
+# Open stages of every thread, watched by one sampler thread while there are any
+_OPEN = set()
+_OPEN_LOCK = threading.Lock()
+_SAMPLER = None
+
+
+def _memory_kb():
+    """(VmHWM, VmRSS) in kB from one read of /proc/self/status, (None, None) off Linux."""
+    found = {}
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith(('VmHWM', 'VmRSS')):
+                    found[line[:5]] = int(line.split()[1])
+                    if len(found) == 2:
+                        break
+    except OSError:
+        pass
+    return found.get('VmHWM'), found.get('VmRSS')
+
+
+def _sample_rss():
+    """Sampler thread: feeds VmRSS to every open stage until none is left."""
+    global _SAMPLER
+    while True:
+        with _OPEN_LOCK:
+            if not _OPEN:
+                _SAMPLER = None
+                return
+            stages = list(_OPEN)
+        rss_kb = _memory_kb()[1]
+        if rss_kb is None:
+            with _OPEN_LOCK:
+                _SAMPLER = None
+            return
+        for open_stage in stages:
+            open_stage._observe(rss_kb)
+        time.sleep(STAGE_SAMPLE_MS / 1e3)
+
+
+def _watch(open_stage):
+    global _SAMPLER
+    with _OPEN_LOCK:
+        _OPEN.add(open_stage)
+        if _SAMPLER is None:
+            _SAMPLER = threading.Thread(target=_sample_rss, name="stage-rss-sampler", daemon=True)
+            _SAMPLER.start()
+
+
+def _unwatch(open_stage):
+    with _OPEN_LOCK:
+        _OPEN.discard(open_stage)
+
+
+def _state():
+    if not hasattr(_LOCAL, 'stack'):
+        _LOCAL.stack = []
+        _LOCAL.records = []
+        _LOCAL.listener = None
+        _LOCAL.run_id = None
+    return _LOCAL
+
+
+class Stage:
+    """
+    One timed block: wall time, rows processed (set by the code inside), bytes produced
+    (e.g. a chart payload, when the code reports them) and peak RSS.
+
+    The kernel's high-water mark (VmHWM) is read but never reset, so it stays valid
+    for whoever else reads it. If it rose while the stage was open, it is the stage's
+    peak; otherwise the peak is the highest RSS sampled every STAGE_SAMPLE_MS, which
+    can miss a spike shorter than the interval. A nested stage hands its peak up to
+    its parent. RSS is process-wide, so
+    concurrent sessions of the same server still show up in each other's peaks.
+    """
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.bytes = None
+        self.parent = None
+        self.started = None
+        self.wall_s = None
+        self.peak_kb = None
+        self._hwm_start_kb = None
+        self._sampled_kb = 0
+        self._profiler = None
+
+    def _observe(self, rss_kb):
+        if rss_kb and rss_kb > self._sampled_kb:
+            self._sampled_kb = rss_kb
+
+    def __enter__(self):
+        state = _state()
+        self.parent = state.stack[-1] if state.stack else None
+        state.stack.append(self)
+        if (STAGE_PROFILE & {self.name, '*'}) and not any(s._profiler for s in state.stack[:-1]):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._hwm_start_kb, self.rss_start_kb = _memory_kb()
+        self._observe(self.rss_start_kb)
+        _watch(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_s = time.perf_counter() - self.started
+        _unwatch(self)
+        hwm_kb, rss_kb = _memory_kb()
+        self._observe(rss_kb)
+        if hwm_kb and self._hwm_start_kb and hwm_kb > self._hwm_start_kb:
+            # The process peak was set inside the stage: exact, unlike the samples
+            self._sampled_kb = max(self._sampled_kb, hwm_kb)
+        self.peak_kb = self._sampled_kb or None
+        state = _state()
+        state.stack.pop()
+        if self.parent is not None:
+            self.parent._observe(self.peak_kb)
+
+        record = {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'run': state.run_id,
+            'stage': self.name,
+            'parent': self.parent.name if self.parent else None,
+            'depth': len(state.stack),
+            'wall_ms': round(self.wall_s * 1e3, 3),
+            'rows': self.rows,
+            'rows_per_s': round(self.rows / self.wall_s) if self.rows and self.wall_s else None,
+            'bytes': self.bytes,
+            'rss_start_mb': round(self.rss_start_kb / 1024, 1) if self.rss_start_kb else None,
+            'peak_rss_mb': round(self.peak_kb / 1024, 1) if self.peak_kb else None,
+            'status': 'error' if exc_type else 'ok',
+        }
+        if exc_type:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(STAGE_PROFILE_DIR, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            record['profile'] = os.path.join(STAGE_PROFILE_DIR, f"{self.name}-{stamp}.prof")
+            self._profiler.dump_stats(record['profile'])
+
+        state.records.append(record)
+        logger.info(json.dumps(record))
+        if state.listener is not None and not state.stack:
+            state.listener(state.records)
+        return False
+
+
+def stage(name, rows=None):
+    """Context manager timing a block: `with stage('page.render') as s: ...; s.rows = n`."""
+    return Stage(name, rows)
+
+
+def instrumented(name=None):
+    """Decorator form of stage(); the function can report its rows with record_rows()."""
+    def decorate(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_rows(rows):
+    """Sets the row count of the innermost open stage on this thread (no-op outside one)."""
+    state = _state()
+    if state.stack:
+        state.stack[-1].rows = int(rows)
+
+
+def record_bytes(nbytes):
+    """Sets the byte count of the innermost open stage on this thread (no-op outside one)."""
+    state = _state()
+    if state.stack:
+        state.stack[-1].bytes = int(nbytes)
+
+
+def begin_run(run_id=None):
+    """Starts a new run on this thread (e.g. a page rerun): clears its records and listener."""
+    state = _state()
+    state.stack = []
+    state.records = []
+    state.listener = None
+    state.run_id = run_id or f"{os.getpid()}-{threading.get_ident()}-{time.time_ns()}"
+    return state.run_id
+
+
+def run_records():
+    """Stage records of the current run on this thread, in completion order."""
+    return list(_state().records)
+
+
+def on_record(listener):
+    """
+    Calls listener(records) whenever a top-level stage of the current run completes.
+    Nested stages don't trigger it, so a listener that draws Streamlit elements is
+    never called from inside a page's cached function (whose output would be replayed).
+    """
+    _state().listener = listener
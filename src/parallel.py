@@ -0,0 +1,78 @@
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import pyarrow as pa
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Process pools are reused across calls: worker start-up costs more than a small job
+_POOLS = {}
+_LOCK = threading.Lock()
+
+
+def resolve_workers(workers=None, env_var="ANALYTICS_WORKERS"):
+    """Worker count from the argument or env_var; 0 means every core, 1 means run serially."""
+    if workers is None:
+        workers = int(os.getenv(env_var, 1))
+    workers = int(workers)
+    return (os.cpu_count() or 1) if workers <= 0 else workers
+
+
+def get_pool(workers):
+    """
+    Shared process pool of the given size. forkserver (spawn where unavailable) rather
+    than fork: the Streamlit server is multi-threaded and forking it can deadlock.
+    """
+    with _LOCK:
+        if workers not in _POOLS:
+            method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+            _POOLS[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(method))
+        return _POOLS[workers]
+
+
+class SharedTable:
+    """
+    An Arrow table written once into shared memory as an IPC stream. Workers map it
+    by name (run_on_shared_table) and read the columns in place, so no DataFrame is
+    pickled across the process boundary.
+    """
+
+    def __init__(self, table):
+        sizer = pa.MockOutputStream()
+        with pa.ipc.new_stream(sizer, table.schema) as writer:
+            writer.write_table(table)
+        self.shm = SharedMemory(create=True, size=max(1, sizer.size()))
+        self.name = self.shm.name
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(self.shm.buf)), table.schema) as writer:
+            writer.write_table(table)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_on_shared_table(name, func, *args):
+    """Worker entry point: maps the shared table, returns func(table, *args), then unmaps it."""
+    # Pool workers share the parent's resource tracker, so attaching doesn't transfer ownership:
+    # the block is still unlinked exactly once, by SharedTable.close() in the parent
+    shm = SharedMemory(name=name)
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(shm.buf)).read_all()
+        result = func(table, *args)
+        del table
+        return result
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Something still views the mapping (e.g. an exception traceback); the OS reclaims it on exit
+            pass
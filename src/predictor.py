@@ -6,63 +6,309 @@ import joblib
 from sklearn.model_selection import train_test_split
 from dotenv import load_dotenv
 
+from src.features import FEATURES, GRANULARITIES, LAGS, ROLLING_WINDOW, FeatureStore, add_lag_features, next_features
+from src.gold_layer import gold_source, version_of
+from src.instrumentation import instrumented, record_rows
+from src.parallel import get_pool, resolve_workers
+from src.query import GoldQuery
+from src.registry import ModelRegistry
+
 load_dotenv()
 
+XGB_PARAMS = {
+    'n_estimators': 500,
+    'learning_rate': 0.01,
+    'max_depth': 6,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'objective': 'reg:squarederror',
+}
+FORECAST_MODEL = 'revenue_forecaster'
+# Series with fewer usable (post-lag) months than this are not modelled
+MIN_SERIES_MONTHS = int(os.getenv("MIN_SERIES_MONTHS", 8))
+
+
+def feature_spec(granularity='monthly'):
+    """Everything that changes what a forecaster computes; part of its registry key."""
+    return {
+        'target': 'Line_Total',
+        'freq': GRANULARITIES[granularity],
+        'features': FEATURES,
+        'lags': LAGS,
+        'rolling_window': ROLLING_WINDOW,
+        'params': XGB_PARAMS,
+    }
+
+
+FEATURE_SPEC = feature_spec('monthly')
+
+
+def monthly_series(df, keys):
+    """
+    Monthly Line_Total per series (one series per distinct value of keys), each
+    spanning its own first to last month with empty months as 0, like resample('MS').
+    """
+    dates = df['InvoiceDate']
+    month_code = (dates.dt.year * 12 + dates.dt.month - 1).rename('Month_Code')
+    totals = df.groupby([*(df[k] for k in keys), month_code], observed=True, sort=True)['Line_Total'].sum()
+
+    # 1. Full month grid per series, built with repeat/arange instead of a loop
+    codes = totals.index.get_level_values('Month_Code').to_numpy()
+    series_index = totals.index.droplevel('Month_Code')
+    series_id = pd.factorize(series_index)[0]
+    first = pd.Series(codes).groupby(series_id).min().to_numpy()
+    last = pd.Series(codes).groupby(series_id).max().to_numpy()
+    lengths = last - first + 1
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    grid_codes = np.repeat(first, lengths) + (np.arange(lengths.sum()) - starts)
+    unique_series = series_index[pd.Series(series_id).drop_duplicates().index]
+    grid_series = unique_series.repeat(lengths)
+
+    # 2. Reindex onto the grid
+    if isinstance(grid_series, pd.MultiIndex):
+        arrays = [grid_series.get_level_values(i) for i in range(grid_series.nlevels)]
+    else:
+        arrays = [grid_series]
+    grid = pd.MultiIndex.from_arrays([*arrays, grid_codes], names=[*keys, 'Month_Code'])
+    monthly = totals.reindex(grid, fill_value=0.0).reset_index()
+    monthly['InvoiceDate'] = pd.to_datetime(pd.DataFrame({
+        'year': monthly['Month_Code'] // 12, 'month': monthly['Month_Code'] % 12 + 1, 'day': 1}))
+    return monthly[[*keys, 'InvoiceDate', 'Line_Total']]
+
+
+class ScenarioCube:
+    """Forecast paths for a grid of lift scenarios: values[i, t] is month dates[t] under lifts[i]."""
+
+    def __init__(self, lifts, dates, values):
+        self.lifts = lifts
+        self.dates = dates
+        self.values = values
+
+    def lookup(self, lift, horizon=None):
+        """Path of the grid scenario closest to lift, optionally cut to the first horizon months."""
+        row = int(np.abs(self.lifts - lift).argmin())
+        return pd.Series(self.values[row, :horizon], index=self.dates[:horizon], name='Forecast')
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'Lift': np.repeat(self.lifts, len(self.dates)),
+            'InvoiceDate': np.tile(self.dates, len(self.lifts)),
+            'Forecast': self.values.ravel(),
+        })
+
+
+def forecast_scenarios(model, periods, horizon=6, lifts=(0.0,), granularity='monthly'):
+    """
+    Recursive forecast of the periods after `periods` (ascending InvoiceDate, Line_Total,
+    optionally Month_Ordinal) for every lift scenario at once.
+
+    A lift scales the revenue a scenario realises, and that lifted revenue is what the
+    next step sees as Lag_1/Lag_2/Rolling_Mean, so lifts compound through the model
+    instead of being multiplied on afterwards. Each step is one predict() call over
+    all scenarios.
+    """
+    lifts = np.asarray(lifts, dtype=np.float64)
+    if len(periods) < ROLLING_WINDOW:
+        raise ValueError(f"❌ Need at least {ROLLING_WINDOW} periods of history to build the lag features.")
+    if 'Month_Ordinal' in periods:
+        next_ordinal = int(periods['Month_Ordinal'].iloc[-1]) + 1
+    else:
+        next_ordinal = len(periods)
+
+    # Latest periods per scenario, oldest first
+    window = np.tile(periods['Line_Total'].to_numpy(dtype=np.float64)[-ROLLING_WINDOW:], (len(lifts), 1))
+    dates = pd.date_range(periods['InvoiceDate'].iloc[-1], periods=horizon + 1, freq=GRANULARITIES[granularity])[1:]
+    values = np.empty((len(lifts), horizon))
+    for step in range(horizon):
+        values[:, step] = model.predict(next_features(window, next_ordinal + step)) * (1 + lifts)
+        window = np.column_stack([window[:, 1:], values[:, step]])
+    return ScenarioCube(lifts, dates, values)
+
+
+def with_segments(df):
+    """Adds each row's customer RFM Segment; guest rows (no Customer ID) get none."""
+    from src.analytics import CustomerAnalytics
+    rfm = CustomerAnalytics(df).generate_rfm()
+    df = df.copy()
+    df['Segment'] = df['Customer ID'].map(rfm['Segment'])
+    return df
+
+
+def _fit_series(key, X, y, n_threads):
+    """Worker: fits one series with the standard split; returns the booster as UBJ bytes."""
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
+    model = xgb.XGBRegressor(**XGB_PARAMS, n_jobs=n_threads)
+    model.fit(X_train, y_train)
+    score = model.score(X_test, y_test) if len(y_test) > 1 else np.nan
+    return key, bytes(model.get_booster().save_raw('ubj')), float(score), len(X_train)
+
+
+class SeriesModels:
+    """Per-series XGBoost models loaded from one artifact, looked up by series key."""
+
+    def __init__(self, keys, index, boosters):
+        self.keys = keys
+        self.index = index
+        self._boosters = boosters
+        self._models = {}
+
+    @classmethod
+    def load(cls, path):
+        artifact = joblib.load(path)
+        return cls(artifact['keys'], artifact['index'], artifact['boosters'])
+
+    def model(self, key):
+        if key not in self._models:
+            model = xgb.XGBRegressor()
+            model.load_model(bytearray(self._boosters[key]))
+            self._models[key] = model
+        return self._models[key]
+
+    def predict(self, features):
+        """Predictions for a frame holding the key columns and FEATURES; NaN for unmodelled series."""
+        out = np.full(len(features), np.nan)
+        for key, rows in features.groupby(self.keys, sort=False, observed=True).indices.items():
+            key = key if isinstance(key, tuple) else (key,)
+            if key in self._boosters:
+                out[rows] = self.model(key).predict(features.iloc[rows][FEATURES])
+        return out
+
+
 class RevenuePredictor:
-    def __init__(self):
-        self.input_path = os.getenv("PROCESSED_DATA_PATH")
+    def __init__(self, input_path=None):
+        # None: the Gold Layer the pages read (gold_source), resolved again on every call
+        self.input_path = input_path
         self.model_save_path = "src/models/revenue_model.pkl"
+        self.series_save_path = os.getenv("SERIES_MODEL_PATH", "src/models/series_models.joblib")
+
+    def source(self):
+        """(path, version) of the training data, resolved the same way as for serving."""
+        if self.input_path:
+            return self.input_path, version_of(self.input_path)
+        return gold_source()
 
-    def train_forecaster(self):
+    @instrumented('predictor.train_forecaster')
+    def train_forecaster(self, granularity='monthly'):
         print("🚀 Training Advanced XGBoost Revenue Engine...")
-        df = pd.read_parquet(self.input_path)
-        
-        # 1. Monthly Resampling
-        monthly_df = df.set_index('InvoiceDate')['Line_Total'].resample('MS').sum().reset_index()
-        
-        # 2. FEATURE ENGINEERING (The 'Beyond' Part)
-        monthly_df['Month_Ordinal'] = np.arange(len(monthly_df))
-        # Lag Features: Teaching the model about its own history
-        monthly_df['Lag_1'] = monthly_df['Line_Total'].shift(1)
-        monthly_df['Lag_2'] = monthly_df['Line_Total'].shift(2)
-        
-        # Rolling Mean: Capturing the general 'momentum'
-        monthly_df['Rolling_Mean'] = monthly_df['Line_Total'].shift(1).rolling(window=3).mean()
-        
-        # Drop rows with NaN caused by shifting
-        monthly_df = monthly_df.dropna()
-        
+        path, version = self.source()
+
+        # 1 + 2. Period totals and lag/rolling features from the feature store (only new periods are aggregated)
+        # Lag Features teach the model about its own history; the rolling mean captures momentum
+        monthly_df = FeatureStore(path).training_frame(granularity, version)
+        record_rows(monthly_df['Rows'].sum())
+
         # 3. Defining Features and Target
-        features = ['Month_Ordinal', 'Lag_1', 'Lag_2', 'Rolling_Mean']
+        features = FEATURES
         X = monthly_df[features]
         y = monthly_df['Line_Total']
 
         # 4. Split (Shuffle=False is CRITICAL for Time Series)
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
-        
+
         # 5. XGBoost Implementation
         # We use objective='reg:squarederror' for regression tasks
-        model = xgb.XGBRegressor(
-            n_estimators=500, 
-            learning_rate=0.01, 
-            max_depth=6, 
-            subsample=0.8,
-            colsample_bytree=0.8,
-            objective='reg:squarederror'
-        )
-        
+        model = xgb.XGBRegressor(**XGB_PARAMS)
+
         model.fit(X_train, y_train)
 
-        # 6. Save the Brain
-        os.makedirs("src/models", exist_ok=True)
-        joblib.dump(model, self.model_save_path)
-        
         # Performance Check
         score = model.score(X_test, y_test)
-        print(f"✅ XGBoost Model Saved. R² Score: {score:.4f}")
-        
+
+        # 6. Save the Brain: legacy pickle (monthly only, which the Predictor Lab falls back to)
+        # plus a registry entry tied to the training data
+        if granularity == 'monthly':
+            os.makedirs(os.path.dirname(self.model_save_path), exist_ok=True)
+            joblib.dump(model, self.model_save_path)
+        entry = ModelRegistry().save(FORECAST_MODEL, model, version, feature_spec(granularity),
+                                     {'r2': float(score), 'train_months': len(X_train), 'granularity': granularity})
+        print(f"✅ XGBoost Model Saved. R² Score: {score:.4f} (registry key {entry['key']})")
+
         return model
 
+    @instrumented('predictor.forecast')
+    def forecast(self, horizon=6, lifts=(0.0,), model=None, granularity='monthly'):
+        """
+        Multi-period recursive forecast of total revenue for a grid of lifts (ScenarioCube).
+        Uses the registered model for the current Gold Layer unless one is passed.
+        """
+        path, version = self.source()
+        if model is None:
+            model, entry = ModelRegistry().load(FORECAST_MODEL, version, feature_spec(granularity))
+            if entry['stale']:
+                print(f"⚠️ Forecasting with a model trained on another data version ({entry['data_version'][:12]}).")
+        periods = FeatureStore(path).refresh(granularity, version)
+        record_rows(periods['Rows'].sum())
+        return forecast_scenarios(model, periods, horizon, lifts, granularity)
+
+    def backtest(self, granularity='monthly', grid=None, workers=None, horizon=1):
+        """
+        Walk-forward leaderboard (MAPE/RMSE per configuration) of a parameter grid on the
+        current Gold Layer; the fits run on the FORECAST_WORKERS process pool.
+        """
+        # Imported here: src.backtest builds on this module's XGB_PARAMS
+        from src.backtest import backtest
+        print(f"🚀 Walk-forward backtest of the {granularity} forecaster...")
+        path, version = self.source()
+        leaderboard, stats = backtest(path, version, granularity, grid, workers, horizon=horizon)
+        print(f"✅ {stats['configurations']} configurations x {stats['folds']} folds in {stats['seconds']:.1f} s "
+              f"({stats['workers']} worker(s)); best MAPE {leaderboard['MAPE'].iloc[0]:.2f}% "
+              f"({leaderboard['Config'].iloc[0]})")
+        return leaderboard
+
+    def series_features(self, df, by):
+        """Model-ready monthly features for every series of `by` ('Country', 'Segment' or a list)."""
+        keys = [by] if isinstance(by, str) else list(by)
+        if 'Segment' in keys and 'Segment' not in df:
+            df = with_segments(df)
+        monthly = monthly_series(df, keys)
+        return add_lag_features(monthly, keys).dropna(subset=FEATURES), keys
+
+    @instrumented('predictor.train_series')
+    def train_series(self, by='Country', df=None, workers=None, xgb_threads=None, min_months=MIN_SERIES_MONTHS):
+        """
+        Batch mode: one model per series (e.g. per Country or per RFM Segment). Features for
+        all series come from one grouped pass; the fits run on a process pool with at
+        most xgb_threads XGBoost threads per worker (default: cores // workers), and all
+        models are saved as one artifact indexed by series key.
+        """
+        workers = resolve_workers(workers, "FORECAST_WORKERS")
+        if xgb_threads is None:
+            xgb_threads = int(os.getenv("FORECAST_XGB_THREADS", 0)) or max(1, (os.cpu_count() or 1) // workers)
+        print(f"🚀 Training per-series XGBoost models by {by} ({workers} worker(s) x {xgb_threads} thread(s))...")
+
+        if df is None:
+            columns = ['InvoiceDate', 'Line_Total', 'Customer ID', 'Invoice', *([by] if isinstance(by, str) else by)]
+            df = GoldQuery([c for c in dict.fromkeys(columns) if c != 'Segment'], source=self.source()[0]).to_pandas()
+        record_rows(len(df))
+        features, keys = self.series_features(df, by)
+
+        jobs = []
+        for key, rows in features.groupby(keys, sort=True, observed=True).indices.items():
+            if len(rows) >= min_months:
+                series = features.iloc[rows]
+                jobs.append(((key if isinstance(key, tuple) else (key,)), series[FEATURES], series['Line_Total']))
+
+        if workers == 1:
+            results = [_fit_series(key, X, y, xgb_threads) for key, X, y in jobs]
+        else:
+            pool = get_pool(workers)
+            results = list(pool.map(_fit_series, *zip(*jobs), [xgb_threads] * len(jobs))) if jobs else []
+
+        boosters = {key: raw for key, raw, _, _ in results}
+        index = pd.DataFrame([(*key, r2, n_train) for key, _, r2, n_train in results],
+                             columns=[*keys, 'R2', 'Train_Months'])
+        os.makedirs(os.path.dirname(self.series_save_path) or '.', exist_ok=True)
+        joblib.dump({'keys': keys, 'features': FEATURES, 'index': index, 'boosters': boosters}, self.series_save_path)
+        print(f"✅ {len(boosters)} series models saved to {self.series_save_path} "
+              f"({features.groupby(keys, observed=True).ngroups - len(boosters)} series too short)")
+        return SeriesModels(keys, index, boosters)
+
 if __name__ == "__main__":
+    import sys
     predictor = RevenuePredictor()
-    predictor.train_forecaster()
\ No newline at end of file
+    if '--series' in sys.argv:
+        predictor.train_series(sys.argv[sys.argv.index('--series') + 1])
+    elif '--backtest' in sys.argv:
+        print(predictor.backtest().head(10).round(3).to_string(index=False))
+    else:
+        predictor.train_forecaster()
@@ -0,0 +1,211 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from src.gold_layer import _date_bounds, dataset_files, gold_source, open_snapshot, version_of
+from src.instrumentation import instrumented, record_rows
+from src.remote_parquet import is_remote, open_remote
+
+load_dotenv()
+
+# Upper bound on rows per scanned batch; row groups (GOLD_ROW_GROUP_ROWS) are usually smaller
+BATCH_ROWS = int(os.getenv("QUERY_BATCH_ROWS", 262_144))
+
+# How per-batch partial aggregates combine into the final result
+_MERGE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def gold_dataset(path, filter=None, columns=None):
+    """
+    pyarrow dataset over the single-file Gold Layer or the committed parts of the partitioned one.
+    For a remote (http[s]) Gold Layer, filter and columns decide which column chunks are fetched;
+    a local file with a current Arrow snapshot is scanned from the memory-mapped snapshot.
+    """
+    if is_remote(path):
+        return open_remote(path).dataset(filter, columns)
+    snapshot = None if os.path.isdir(path) else open_snapshot(path, version_of(path))
+    if snapshot is not None:
+        return ds.dataset(snapshot)
+    files = dataset_files(path) if os.path.isdir(path) else [path]
+    # Hive directory names would otherwise come back as extra year/month columns
+    return ds.dataset(files, format='parquet', partitioning=None)
+
+
+class GoldQuery:
+    """
+    Projected, filtered scan of the Gold Layer.
+
+    Pages declare the columns they read and the filters they apply; the scan then
+    decodes only those columns and skips row groups whose statistics exclude the
+    filter (the Gold Layer is time-sorted, so date ranges prune well). Filters
+    return a new query, so a base query can be shared and refined.
+
+        GoldQuery(['Country', 'Line_Total']).between(start, end).exclude_cancelled().aggregate('Country')
+    """
+
+    def __init__(self, columns=None, source=None, filters=None, filter_columns=None):
+        self.columns = list(columns) if columns else None
+        self.source = source
+        self.filters = list(filters or [])
+        # Columns the filters read: a remote scan fetches them along with the projection
+        self.filter_columns = list(filter_columns or [])
+
+    # --- 1. Declaring the scan ---
+    def _refine(self, expression, columns=()):
+        return GoldQuery(self.columns, self.source, [*self.filters, expression], [*self.filter_columns, *columns])
+
+    def where(self, expression, columns=()):
+        """Any pyarrow.dataset expression, e.g. ds.field('Quantity') > 0, plus the columns it reads."""
+        return self._refine(expression, columns)
+
+    def between(self, start=None, end=None):
+        """InvoiceDate within [start, end], whole days; None leaves that side open."""
+        lo, hi = _date_bounds(start, end)
+        query = self
+        if lo is not None:
+            query = query._refine(ds.field('InvoiceDate') >= pa.scalar(lo, pa.timestamp('ns')), ['InvoiceDate'])
+        if hi is not None:
+            query = query._refine(ds.field('InvoiceDate') < pa.scalar(hi, pa.timestamp('ns')), ['InvoiceDate'])
+        return query
+
+    def for_countries(self, countries):
+        countries = [countries] if isinstance(countries, str) else list(countries)
+        return self._refine(ds.field('Country').isin(countries), ['Country'])
+
+    def exclude_cancelled(self):
+        return self._refine(ds.field('Is_Cancelled') == False, ['Is_Cancelled'])  # noqa: E712 (builds an expression)
+
+    def path(self):
+        return self.source or gold_source()[0]
+
+    def expression(self):
+        if not self.filters:
+            return None
+        combined = self.filters[0]
+        for expression in self.filters[1:]:
+            combined = combined & expression
+        return combined
+
+    def scanner(self, columns=None, batch_rows=None):
+        columns = columns or self.columns
+        read_columns = None if columns is None else list(dict.fromkeys([*columns, *self.filter_columns]))
+        return gold_dataset(self.path(), self.expression(), read_columns).scanner(
+            columns=columns,
+            filter=self.expression(),
+            batch_size=batch_rows or BATCH_ROWS,
+            # Bounded readahead keeps batch-wise aggregation near one batch of memory
+            batch_readahead=2,
+        )
+
+    # --- 2. Reading ---
+    def to_table(self):
+        return self.scanner().to_table()
+
+    @instrumented('query.to_pandas')
+    def to_pandas(self):
+        df = self.to_table().to_pandas()
+        record_rows(len(df))
+        return df
+
+    def batches(self, batch_rows=None, columns=None):
+        """Yields the matching rows as DataFrames, one scanned batch at a time."""
+        for batch in self.scanner(columns, batch_rows).to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def count(self):
+        return self.scanner().count_rows()
+
+    def date_bounds(self):
+        """(min, max) InvoiceDate of the whole Gold Layer, from row-group statistics where present."""
+        path = self.path()
+        lo = hi = None
+        if is_remote(path):
+            metadatas = [open_remote(path).metadata]
+        else:
+            metadatas = (pq.ParquetFile(file).metadata for file in (dataset_files(path) if os.path.isdir(path) else [path]))
+        for metadata in metadatas:
+            date_idx = metadata.schema.to_arrow_schema().get_field_index('InvoiceDate')
+            for rg in range(metadata.num_row_groups):
+                stats = metadata.row_group(rg).column(date_idx).statistics
+                if stats is None or not stats.has_min_max:
+                    # Files without statistics: fall back to scanning the one column
+                    bounds = pc.min_max(gold_dataset(path, columns=['InvoiceDate']).to_table(columns=['InvoiceDate']).column(0))
+                    return pd.Timestamp(bounds['min'].as_py()), pd.Timestamp(bounds['max'].as_py())
+                lo = stats.min if lo is None else min(lo, stats.min)
+                hi = stats.max if hi is None else max(hi, stats.max)
+        if lo is None:
+            return None, None
+        return pd.Timestamp(lo), pd.Timestamp(hi)
+
+    # --- 3. Out-of-core aggregation ---
+    @instrumented('query.aggregate')
+    def aggregate(self, by=None, agg=None, freq=None, batch_rows=None):
+        """
+        Group-by that never holds more than one batch of rows: each batch is reduced
+        with pandas and the partial results are merged. `agg` maps column -> one of
+        sum, count, min, max, nunique (default: Line_Total sum). `freq` buckets
+        InvoiceDate like resample (e.g. 'MS'); with no other keys, empty buckets are
+        kept, as resample does. Only the columns the aggregate touches are scanned.
+
+        nunique keeps the distinct (group, value) pairs, so its memory grows with
+        their number rather than with the row count.
+        """
+        agg = agg or {'Line_Total': 'sum'}
+        keys = [by] if isinstance(by, str) else list(by or [])
+        unknown = set(agg.values()) - set(_MERGE) - {'nunique'}
+        if unknown:
+            raise ValueError(f"❌ Unsupported aggregation(s): {sorted(unknown)}")
+        grouper = ([pd.Grouper(key='InvoiceDate', freq=freq)] if freq else []) + keys
+        if not grouper:
+            raise ValueError("❌ aggregate() needs `by` and/or `freq`.")
+        index_names = (['InvoiceDate'] if freq else []) + keys
+
+        additive = {col: fn for col, fn in agg.items() if fn != 'nunique'}
+        distinct = [col for col, fn in agg.items() if fn == 'nunique']
+        columns = list(dict.fromkeys([*index_names, *agg]))
+
+        partials = []
+        pairs = {col: [] for col in distinct}
+        rows = 0
+        for batch in self.batches(batch_rows, columns):
+            rows += len(batch)
+            grouped = batch.groupby(grouper, sort=False, observed=True, dropna=False)
+            if additive:
+                partials.append(grouped.agg(**{col: (col, fn) for col, fn in additive.items()}))
+            for col in distinct:
+                pairs[col].append(grouped[col].unique().explode())
+        record_rows(rows)
+
+        frames = []
+        if partials:
+            stacked = pd.concat(partials)
+            levels = list(range(stacked.index.nlevels))
+            frames.append(stacked.groupby(level=levels, sort=True, observed=True, dropna=False).agg(
+                {col: _MERGE[fn] for col, fn in additive.items()}))
+        for col in distinct:
+            if pairs[col]:
+                unique_pairs = pd.concat(pairs[col]).dropna().reset_index().drop_duplicates()
+                frames.append(unique_pairs.groupby(index_names, sort=True, observed=True, dropna=False)[col].size().to_frame())
+
+        if not frames:
+            return pd.DataFrame(columns=[*index_names, *agg])
+        result = pd.concat(frames, axis=1) if len(frames) > 1 else frames[0]
+        result = result.reindex(columns=list(agg))
+        for col in distinct:
+            # Groups whose values were all null have no pairs
+            result[col] = result[col].fillna(0).astype(np.int64)
+        if freq and not keys:
+            result = result.resample(freq).agg({col: _MERGE.get(fn, 'sum') for col, fn in agg.items()})
+        result.index.names = index_names
+        return result.reset_index()
+
+if __name__ == "__main__":
+    query = GoldQuery(['Country', 'Line_Total']).exclude_cancelled()
+    print(query.date_bounds())
+    print(query.aggregate('Country').sort_values('Line_Total', ascending=False).head(10))
@@ -0,0 +1,253 @@
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from dotenv import load_dotenv
+
+from src.instrumentation import instrumented, record_rows
+from src.query import GoldQuery
+
+load_dotenv()
+
+RECOMMENDER_PATH = os.getenv("RECOMMENDER_PATH", "data/processed/recommender_index.npz")
+RECOMMENDER_TOP_K = int(os.getenv("RECOMMENDER_TOP_K", 20))
+# Upper bound on similarity entries materialized per block while building the index
+RECOMMENDER_BLOCK_NNZ = int(os.getenv("RECOMMENDER_BLOCK_NNZ", 2_000_000))
+BASKET_COLUMNS = ['Invoice', 'StockCode', 'Description', 'Customer ID', 'Is_Cancelled']
+
+# Process-wide: index path -> ItemRecommender of the current Gold Layer version
+_INDEXES = {}
+_LOCK = threading.Lock()
+
+
+def _factorize(values):
+    """Integer codes (-1 for nulls) plus the distinct values as a plain object array."""
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def incidence_matrix(row_codes, col_codes, n_rows, n_cols):
+    """Binary CSR matrix with a 1 wherever (row, col) occurs at least once."""
+    keep = (row_codes >= 0) & (col_codes >= 0)
+    matrix = sp.csr_matrix((np.ones(keep.sum(), dtype=np.float32), (row_codes[keep], col_codes[keep])),
+                           shape=(n_rows, n_cols))
+    # Duplicate pairs were summed on construction; a basket either holds an item or not
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def top_k_rows(matrix, k):
+    """
+    The k largest entries of every row of a CSR matrix (non-negative values), without a
+    Python loop: entries are sorted by (row, -value) and each row keeps its first k.
+    Returns (columns, values) as (n_rows, k) arrays, padded with -1 / 0 where a row has
+    fewer than k entries.
+    """
+    matrix.eliminate_zeros()
+    counts = np.diff(matrix.indptr)
+    rows = np.repeat(np.arange(matrix.shape[0]), counts)
+    # The bits of a non-negative float32 sort like its value, so (row, -value) packs into
+    # one uint64 key: a single argsort, ~10x faster than np.lexsort on two keys
+    bits = matrix.data.astype(np.float32).view(np.uint32)
+    order = np.argsort((rows.astype(np.uint64) << np.uint64(32)) | (~bits).astype(np.uint64))
+    rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+    keep = rank < k
+    columns = np.full((matrix.shape[0], k), -1, dtype=np.int32)
+    values = np.zeros((matrix.shape[0], k), dtype=np.float32)
+    columns[rows[order][keep], rank[keep]] = matrix.indices[order][keep]
+    values[rows[order][keep], rank[keep]] = matrix.data[order][keep]
+    return columns, values
+
+
+def _item_blocks(baskets, budget):
+    """
+    Item ranges whose similarity rows fit the entry budget. An item's row can't have
+    more entries than the summed size of its baskets (nor than the catalogue), so the
+    bound is known before any product is computed.
+    """
+    n_items = baskets.shape[1]
+    basket_sizes = np.diff(baskets.indptr).astype(np.float64)
+    bound = np.minimum(baskets.T @ basket_sizes, n_items)
+    cut = np.searchsorted(np.cumsum(bound), np.arange(budget, bound.sum(), budget))
+    edges = np.unique(np.r_[0, cut, n_items])
+    return zip(edges[:-1], edges[1:])
+
+
+class ItemRecommender:
+    """
+    Item-item recommender over Invoice x StockCode baskets.
+
+    Similarity is cosine over binary basket vectors (co-occurrence count divided by
+    sqrt(baskets_i * baskets_j)) or the raw co-occurrence count. Only the top-k
+    neighbours per product are kept, in dense (n_items, k) arrays, so the index is
+    O(n_items * k) whatever the catalogue's density. Customer recommendations score
+    unseen items by summing the neighbour similarities of everything the customer
+    bought: one sparse product per batch of customers.
+    """
+
+    def __init__(self, k=RECOMMENDER_TOP_K, similarity='cosine', block_nnz=RECOMMENDER_BLOCK_NNZ):
+        if similarity not in ('cosine', 'cooccurrence'):
+            raise ValueError(f"❌ Unknown similarity '{similarity}' (use 'cosine' or 'cooccurrence').")
+        self.k = int(k)
+        self.similarity = similarity
+        self.block_nnz = int(block_nnz)
+        self.items = np.empty(0, dtype=object)
+        self.descriptions = np.empty(0, dtype=object)
+        self.neighbors = np.empty((0, self.k), dtype=np.int32)
+        self.scores = np.empty((0, self.k), dtype=np.float32)
+        self.customer_ids = np.empty(0, dtype=object)
+        self.history = sp.csr_matrix((0, 0), dtype=np.float32)
+        self.source_version = None
+
+    # --- 1. Building ---
+    @instrumented('recommender.fit')
+    def fit(self, df):
+        """Builds the top-k index from Gold Layer rows (cancelled invoices are ignored)."""
+        started = time.perf_counter()
+        record_rows(len(df))
+        if 'Is_Cancelled' in df:
+            df = df[~df['Is_Cancelled'].to_numpy()]
+        item_codes, self.items = _factorize(df['StockCode'])
+        invoice_codes, invoices = _factorize(df['Invoice'])
+        n_items = len(self.items)
+        baskets = incidence_matrix(invoice_codes, item_codes, len(invoices), n_items)
+
+        # 1. Top-k neighbours, one bounded block of item rows at a time
+        item_baskets = np.asarray(baskets.sum(axis=0)).ravel()
+        inv_norm = 1.0 / np.sqrt(np.maximum(item_baskets, 1.0))
+        baskets_t = baskets.T.tocsr()
+        self.neighbors = np.full((n_items, self.k), -1, dtype=np.int32)
+        self.scores = np.zeros((n_items, self.k), dtype=np.float32)
+        for start, stop in _item_blocks(baskets, self.block_nnz):
+            block = (baskets_t[start:stop] @ baskets).tocsr()
+            rows = np.repeat(np.arange(start, stop), np.diff(block.indptr))
+            # An item is not its own neighbour
+            block.data[block.indices == rows] = 0
+            if self.similarity == 'cosine':
+                block.data *= inv_norm[rows] * inv_norm[block.indices]
+            self.neighbors[start:stop], self.scores[start:stop] = top_k_rows(block, self.k)
+
+        # 2. What each customer already bought, for scoring and for excluding those items
+        customer_codes, self.customer_ids = _factorize(df['Customer ID'])
+        self.history = incidence_matrix(customer_codes, item_codes, len(self.customer_ids), n_items)
+
+        if 'Description' in df:
+            first = pd.Series(df['Description'].to_numpy(dtype=object)).groupby(item_codes).first()
+            self.descriptions = first.reindex(np.arange(n_items)).to_numpy(dtype=object)
+        print(f"✅ Item index built: {n_items:,} products x top-{self.k} "
+              f"from {len(invoices):,} baskets in {time.perf_counter() - started:.2f}s")
+        return self
+
+    def neighbour_matrix(self):
+        """The top-k index as a sparse (n_items, n_items) similarity matrix."""
+        n_items = len(self.items)
+        valid = self.neighbors >= 0
+        rows = np.repeat(np.arange(n_items), valid.sum(axis=1))
+        return sp.csr_matrix((self.scores[valid], (rows, self.neighbors[valid])), shape=(n_items, n_items))
+
+    # --- 2. Queries ---
+    def similar_items(self, stock_codes, n=None):
+        """Nearest products for a batch of StockCodes: long frame of (StockCode, Rank, Recommended, Score)."""
+        n = min(n or self.k, self.k)
+        rows = pd.Index(self.items).get_indexer(pd.Index(np.asarray(stock_codes, dtype=object)))
+        rows = rows[rows >= 0]
+        neighbors, scores = self.neighbors[rows, :n], self.scores[rows, :n]
+        valid = neighbors >= 0
+        return self._frame('StockCode', self.items[np.repeat(rows, valid.sum(axis=1))],
+                           np.nonzero(valid)[1] + 1, neighbors[valid], scores[valid])
+
+    def recommend(self, customer_ids, n=10, batch_customers=4096):
+        """
+        Top-n unseen products for a batch of customers: long frame of (Customer ID, Rank,
+        Recommended, Score). Customers without history are skipped. Scores are computed
+        batch_customers at a time, which bounds the (customers x items) product.
+        """
+        rows = pd.Index(self.customer_ids).get_indexer(pd.Index(np.asarray(customer_ids, dtype=object)))
+        rows = rows[rows >= 0]
+        similarity = self.neighbour_matrix()
+        frames = []
+        for first in range(0, len(rows), batch_customers):
+            batch = rows[first:first + batch_customers]
+            history = self.history[batch]
+            scores = (history @ similarity).tocsr()
+            # Drop what the customer already bought
+            scores = scores - scores.multiply(history)
+            items, values = top_k_rows(scores.tocsr(), n)
+            valid = items >= 0
+            frames.append(self._frame('Customer ID', self.customer_ids[np.repeat(batch, valid.sum(axis=1))],
+                                      np.nonzero(valid)[1] + 1, items[valid], values[valid]))
+        if not frames:
+            return self._frame('Customer ID', [], [], np.empty(0, dtype=np.int32), [])
+        return pd.concat(frames, ignore_index=True)
+
+    def _frame(self, key, keys, ranks, items, scores):
+        frame = pd.DataFrame({key: keys, 'Rank': ranks, 'Recommended': self.items[items], 'Score': scores})
+        if len(self.descriptions):
+            frame['Description'] = self.descriptions[items]
+        return frame
+
+    # --- 3. Persistence ---
+    def save(self, path=None):
+        """Writes the index and customer histories as one .npz, swapped in atomically."""
+        path = path or RECOMMENDER_PATH
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            items=self.items.astype(str),
+            descriptions=self.descriptions.astype(str),
+            neighbors=self.neighbors,
+            scores=self.scores,
+            customer_ids=self.customer_ids.astype(str),
+            history_indptr=self.history.indptr,
+            history_indices=self.history.indices,
+            meta=np.array([self.k, self.similarity, self.source_version or ''], dtype=str)
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        with np.load(path or RECOMMENDER_PATH) as data:
+            k, similarity, source_version = data['meta']
+            model = cls(k=int(k), similarity=str(similarity))
+            model.items = data['items'].astype(object)
+            model.descriptions = data['descriptions'].astype(object)
+            model.neighbors = data['neighbors']
+            model.scores = data['scores']
+            model.customer_ids = data['customer_ids'].astype(object)
+            indices = data['history_indices']
+            model.history = sp.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, data['history_indptr']),
+                                          shape=(len(model.customer_ids), len(model.items)))
+            model.source_version = str(source_version) or None
+        return model
+
+
+def load_recommender(gold_path, version, path=None):
+    """
+    ItemRecommender for a Gold Layer version: from the process cache, else from the saved
+    index (RECOMMENDER_PATH) when it was built from this version, else fitted and saved.
+    """
+    path = path or RECOMMENDER_PATH
+    with _LOCK:
+        cached = _INDEXES.get(path)
+        if cached is not None and cached.source_version == version:
+            return cached
+        recommender = ItemRecommender.load(path) if os.path.exists(path) else None
+        if recommender is None or recommender.source_version != version:
+            recommender = ItemRecommender().fit(GoldQuery(BASKET_COLUMNS, source=gold_path).to_pandas())
+            recommender.source_version = version
+            recommender.save(path)
+        _INDEXES[path] = recommender
+        return recommender
+
+if __name__ == "__main__":
+    from src.gold_layer import gold_source
+
+    recommender = load_recommender(*gold_source())
+    print(f"📦 Index for Gold Layer {recommender.source_version[:12]} at: {RECOMMENDER_PATH}")
+    if len(sys.argv) > 1:
+        print(recommender.recommend(sys.argv[1:]))
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import xgboost as xgb
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(PROJECT_ROOT, 'src', 'models', 'registry'))
+
+# Process-wide: (root, name, spec hash) -> (entry key, loaded model); replaced when the key changes
+_LOADED = {}
+_LOCK = threading.Lock()
+
+
+class StaleModelError(Exception):
+    """No registered model matches the requested feature spec, so none can be used."""
+
+
+def spec_hash(spec):
+    """Stable hash of a feature spec (features, target, lags, params...)."""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class ModelRegistry:
+    """
+    Versioned store of XGBoost boosters in native UBJ format.
+
+    An entry is keyed by the training data version (the Gold Layer content hash)
+    and the feature spec hash, and lives at <root>/<name>/<key>.ubj with a JSON
+    sidecar. <name>/latest-<spec hash>.json points at the newest entry of each
+    feature spec (so a weekly model doesn't hide the monthly one) and
+    <name>/latest.json at the newest entry overall. Loaded models are cached per
+    process and spec, and only reloaded when the entry they resolve to changes.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or REGISTRY_DIR
+
+    @staticmethod
+    def entry_key(data_version, spec):
+        return hashlib.sha256(f"{data_version}:{spec_hash(spec)}".encode()).hexdigest()[:16]
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _write_json(self, path, payload):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(payload, fh, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    # --- 1. Writing ---
+    def save(self, name, model, data_version, spec, metrics=None):
+        """Registers a fitted XGBRegressor; returns its entry."""
+        os.makedirs(self._dir(name), exist_ok=True)
+        key = self.entry_key(data_version, spec)
+        model_path = os.path.join(self._dir(name), f'{key}.ubj')
+        tmp_path = os.path.join(self._dir(name), f'{key}.tmp.ubj')
+        # The booster itself: XGBRegressor.save_model also writes sklearn metadata, which
+        # this xgboost/scikit-learn pairing can't produce, and predict doesn't need it
+        model.get_booster().save_model(tmp_path)
+        os.replace(tmp_path, model_path)
+        entry = {
+            'name': name,
+            'key': key,
+            'data_version': data_version,
+            'spec_hash': spec_hash(spec),
+            'spec': spec,
+            'metrics': metrics or {},
+            'xgboost': xgb.__version__,
+            'created': time.time(),
+            'model_file': os.path.basename(model_path),
+        }
+        self._write_json(os.path.join(self._dir(name), f'{key}.json'), entry)
+        # The pointers are written last: readers never see an entry without its booster
+        self._write_json(os.path.join(self._dir(name), f"latest-{entry['spec_hash']}.json"), entry)
+        self._write_json(os.path.join(self._dir(name), 'latest.json'), entry)
+        return entry
+
+    # --- 2. Lookup ---
+    def entry(self, name, key):
+        path = os.path.join(self._dir(name), f'{key}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as fh:
+            return json.load(fh)
+
+    def latest(self, name, spec=None):
+        """Newest entry of `spec`, or the newest overall when spec is None."""
+        return self.entry(name, 'latest' if spec is None else f'latest-{spec_hash(spec)}')
+
+    def resolve(self, name, data_version, spec):
+        """
+        Entry to serve for (data_version, spec), with 'stale' set when it was trained on
+        another data version. Raises FileNotFoundError if nothing is registered and
+        StaleModelError if no model was trained with this feature spec.
+        """
+        exact = self.entry(name, self.entry_key(data_version, spec))
+        if exact:
+            return dict(exact, stale=False)
+        latest = self.latest(name, spec)
+        if latest is None:
+            if self.latest(name) is None:
+                raise FileNotFoundError(f"❌ No '{name}' model registered in {self.root}")
+            raise StaleModelError(f"❌ No '{name}' model was trained with this feature spec; retrain it.")
+        return dict(latest, stale=True)
+
+    def load(self, name, data_version, spec):
+        """(model, entry) for the resolved entry, from the process cache when it hasn't changed."""
+        entry = self.resolve(name, data_version, spec)
+        cache_key = (self.root, name, entry['spec_hash'])
+        with _LOCK:
+            cached = _LOADED.get(cache_key)
+            if cached and cached[0] == entry['key']:
+                return cached[1], entry
+            model = xgb.XGBRegressor()
+            model.load_model(os.path.join(self._dir(name), entry['model_file']))
+            _LOADED[cache_key] = (entry['key'], model)
+            return model, entry
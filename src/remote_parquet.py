@@ -0,0 +1,492 @@
+import bisect
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.dataset as ds
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from src.instrumentation import instrumented
+
+load_dotenv()
+
+# Concurrent range requests per file, and the largest single range fetched
+RANGE_WORKERS = int(os.getenv("GOLD_RANGE_WORKERS", 8))
+RANGE_BLOCK_BYTES = int(os.getenv("GOLD_RANGE_BLOCK_MB", 4)) << 20
+RANGE_RETRIES = int(os.getenv("GOLD_RANGE_RETRIES", 5))
+RANGE_BACKOFF = float(os.getenv("GOLD_RANGE_BACKOFF", 0.5))
+# First read from the end of the file; a Gold Layer footer is usually well under this
+FOOTER_GUESS = 64 << 10
+# Column chunks closer than this are fetched in one request instead of two
+COALESCE_GAP = 128 << 10
+# Fetched column chunks kept per open file; the least recently read go first (the footer stays)
+RANGE_CACHE_BYTES = int(os.getenv("GOLD_RANGE_CACHE_MB", 256)) << 20
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Process-wide: url -> (checked_at, RemoteParquet)
+_OPEN = {}
+_LOCK = threading.Lock()
+
+
+class RemoteChangedError(requests.RequestException):
+    """The remote file's validator changed while it was being read."""
+
+
+class _RetryableStatus(requests.HTTPError):
+    pass
+
+
+class _ShortRead(requests.RequestException):
+    pass
+
+
+def is_remote(path):
+    return isinstance(path, str) and path.startswith(('http://', 'https://'))
+
+
+def pooled_session(workers=RANGE_WORKERS):
+    """requests.Session keeping up to `workers` connections alive to the same host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class RemoteFile:
+    """
+    A file behind an HTTP URL, read with range requests over a pooled session.
+
+    Every request is retried with exponential backoff on connection errors, timeouts,
+    short bodies and 429/5xx answers. Once probed, ranges are pinned to the probed
+    ETag (or Last-Modified): a range answered by a different version of the file
+    raises RemoteChangedError instead of mixing bytes of two versions.
+    """
+
+    def __init__(self, url, session=None, workers=RANGE_WORKERS, block_bytes=RANGE_BLOCK_BYTES,
+                 retries=RANGE_RETRIES, backoff=RANGE_BACKOFF, timeout=30):
+        self.url = url
+        self.workers = max(1, int(workers))
+        self.session = session or pooled_session(self.workers)
+        self.block_bytes = int(block_bytes)
+        self.retries = int(retries)
+        self.backoff = float(backoff)
+        self.timeout = timeout
+        self.size = None
+        self.etag = None
+        self.last_modified = None
+        self.accepts_ranges = False
+        self.stats = {'requests': 0, 'bytes': 0, 'retries': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def _with_retries(self, attempt_request):
+        for attempt in range(self.retries + 1):
+            try:
+                return attempt_request()
+            except RemoteChangedError:
+                raise
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    _RetryableStatus, _ShortRead):
+                if attempt == self.retries:
+                    raise
+                self._count(retries=1)
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _get(self, headers, stream=False):
+        self._count(requests=1)
+        response = self.session.get(self.url, headers=headers, timeout=self.timeout, stream=stream)
+        if response.status_code in RETRY_STATUSES:
+            response.close()
+            raise _RetryableStatus(f"HTTP {response.status_code}", response=response)
+        return response
+
+    # --- 1. Probing ---
+    def probe(self, headers=None):
+        """
+        Size and validators from a one-byte range request; None when conditional
+        headers (If-None-Match / If-Modified-Since) get a 304. Redirects are resolved
+        once here, so later ranges go straight to the final URL.
+        """
+        def attempt():
+            with self._get({**(headers or {}), 'Range': 'bytes=0-0'}, stream=True) as response:
+                if response.status_code == 304:
+                    return None
+                response.raise_for_status()
+                self.url = response.url
+                self.etag = response.headers.get('ETag')
+                self.last_modified = response.headers.get('Last-Modified')
+                content_range = response.headers.get('Content-Range', '')
+                match = re.match(r'bytes \d+-\d+/(\d+)', content_range)
+                self.accepts_ranges = response.status_code == 206 and match is not None
+                if self.accepts_ranges:
+                    self.size = int(match.group(1))
+                elif response.headers.get('Content-Length'):
+                    self.size = int(response.headers['Content-Length'])
+                return self
+        return self._with_retries(attempt)
+
+    @property
+    def version(self):
+        """Content version from the URL and validators, for files never seen whole."""
+        key = json.dumps([self.url.split('?')[0], self.etag, self.last_modified, self.size])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    # --- 2. Ranges ---
+    def read_range(self, start, stop):
+        """Bytes [start, stop) of the remote file."""
+        headers = {'Range': f'bytes={start}-{stop - 1}'}
+
+        def attempt():
+            with self._get(headers, stream=True) as response:
+                if response.status_code != 206:
+                    response.raise_for_status()
+                    raise RemoteChangedError(f"❌ Range request answered with HTTP {response.status_code}")
+                if (self.etag and response.headers.get('ETag', self.etag) != self.etag) or \
+                        (self.last_modified and response.headers.get('Last-Modified', self.last_modified) != self.last_modified):
+                    raise RemoteChangedError(f"❌ {self.url} changed while it was being read")
+                data = response.content
+            if len(data) != stop - start:
+                raise _ShortRead(f"got {len(data)} of {stop - start} bytes")
+            self._count(bytes=len(data))
+            return data
+        return self._with_retries(attempt)
+
+    def read_ranges(self, ranges):
+        """Several [start, stop) ranges, fetched concurrently; results in input order."""
+        if len(ranges) <= 1:
+            return [self.read_range(start, stop) for start, stop in ranges]
+        with ThreadPoolExecutor(min(self.workers, len(ranges))) as pool:
+            return list(pool.map(lambda bounds: self.read_range(*bounds), ranges))
+
+    # --- 3. Full downloads ---
+    @instrumented('gold.download')
+    def download(self, dest):
+        """
+        Parallel, resumable download to dest: blocks of block_bytes are fetched
+        concurrently and written in place into dest.part, and the finished blocks
+        are recorded in dest.part.json. A rerun after a failure fetches only the
+        missing blocks, provided the remote file's validators haven't changed.
+        Returns the same metadata as a streamed download (sha256, bytes, validators).
+        """
+        if self.size is None:
+            self.probe()
+        if not self.accepts_ranges:
+            raise requests.RequestException(f"❌ {self.url} doesn't serve byte ranges")
+        part_path, state_path = dest + '.part', dest + '.part.json'
+        validator = {'etag': self.etag, 'last_modified': self.last_modified, 'size': self.size,
+                     'block_bytes': self.block_bytes}
+        done = set()
+        if os.path.exists(part_path) and os.path.exists(state_path):
+            with open(state_path) as fh:
+                state = json.load(fh)
+            if {key: state.get(key) for key in validator} == validator:
+                done = set(state['done'])
+        if not done:
+            os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+            with open(part_path, 'wb') as fh:
+                fh.truncate(self.size)
+
+        n_blocks = -(-self.size // self.block_bytes)
+        missing = [i for i in range(n_blocks) if i not in done]
+        state_lock = threading.Lock()
+
+        def save_state():
+            with open(state_path + '.tmp', 'w') as fh:
+                json.dump({**validator, 'done': sorted(done)}, fh)
+            os.replace(state_path + '.tmp', state_path)
+
+        fd = os.open(part_path, os.O_RDWR)
+        try:
+            def fetch_block(block):
+                start = block * self.block_bytes
+                data = self.read_range(start, min(start + self.block_bytes, self.size))
+                os.pwrite(fd, data, start)
+                with state_lock:
+                    done.add(block)
+                    save_state()
+
+            with ThreadPoolExecutor(min(self.workers, max(len(missing), 1))) as pool:
+                # list() re-raises the first failure; finished blocks stay recorded
+                list(pool.map(fetch_block, missing))
+        finally:
+            os.close(fd)
+
+        sha = hashlib.sha256()
+        with open(part_path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                sha.update(chunk)
+        os.replace(part_path, dest)
+        os.remove(state_path)
+        return {
+            'url': self.url,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'sha256': sha.hexdigest(),
+            'bytes': self.size,
+            'resumed_blocks': n_blocks - len(missing),
+        }
+
+
+class _SparseFile(io.RawIOBase):
+    """
+    Read-only view of a remote file holding only the byte ranges fetched so far.
+    pyarrow reads through it; a read outside the held ranges is fetched on the spot
+    (and counted), so a plan that missed something is slow, never wrong.
+
+    Held chunks are capped at max_bytes: before each prefetch, make_room() evicts the
+    least recently read ones (pinned ones, the footer, never). Nothing is evicted
+    during a scan, so a scan that needs more than the budget holds all its chunks
+    until the next prefetch.
+    """
+
+    def __init__(self, remote, max_bytes=None):
+        self.remote = remote
+        self.size = remote.size
+        self.max_bytes = RANGE_CACHE_BYTES if max_bytes is None else max_bytes
+        self.pos = 0
+        self.starts = []
+        self.chunks = []
+        self.bytes = 0
+        self.on_demand = 0
+        self.evicted_bytes = 0
+        self._recency = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = self.size + offset
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def add(self, start, data, pinned=False):
+        with self._lock:
+            idx = bisect.bisect_left(self.starts, start)
+            if idx < len(self.starts) and self.starts[idx] == start:
+                # Fetched twice (e.g. by two readers at once): keep the longer copy
+                if len(data) <= len(self.chunks[idx]):
+                    return
+                self.bytes -= len(self.chunks[idx])
+                self.chunks[idx] = data
+            else:
+                self.starts.insert(idx, start)
+                self.chunks.insert(idx, data)
+            self.bytes += len(data)
+            self._recency[start] = None
+            self._recency.move_to_end(start)
+            if pinned:
+                self._pinned.add(start)
+
+    def make_room(self, incoming, keep=()):
+        """
+        Evicts least recently read chunks so `incoming` more bytes fit in the budget,
+        sparing those overlapping the [start, stop) ranges in `keep` (what the next
+        scan reads).
+        """
+        keep = sorted(keep)
+        keep_starts = [start for start, _ in keep]
+        # Furthest stop among the ranges starting at or before each one
+        reach = list(itertools.accumulate((stop for _, stop in keep), max))
+        with self._lock:
+            spared = set()
+            for start, chunk in zip(self.starts, self.chunks):
+                idx = bisect.bisect_right(keep_starts, start + len(chunk) - 1) - 1
+                if idx >= 0 and reach[idx] > start:
+                    spared.add(start)
+            self._evict(self.max_bytes - incoming, spared)
+
+    def _evict(self, limit, spared=()):
+        for start in list(self._recency):
+            if self.bytes <= limit:
+                return
+            if start in self._pinned or start in spared:
+                continue
+            idx = bisect.bisect_left(self.starts, start)
+            self.bytes -= len(self.chunks[idx])
+            self.evicted_bytes += len(self.chunks[idx])
+            del self.starts[idx], self.chunks[idx], self._recency[start]
+
+    def missing(self, start, stop):
+        """Sub-ranges of [start, stop) not held yet."""
+        gaps = []
+        with self._lock:
+            idx = max(bisect.bisect_right(self.starts, start) - 1, 0)
+            cursor = start
+            while cursor < stop and idx < len(self.starts):
+                chunk_start = self.starts[idx]
+                chunk_stop = chunk_start + len(self.chunks[idx])
+                if chunk_start > cursor:
+                    gaps.append((cursor, min(chunk_start, stop)))
+                cursor = max(cursor, chunk_stop)
+                idx += 1
+            if cursor < stop:
+                gaps.append((cursor, stop))
+        return gaps
+
+    def _chunk_at(self, offset):
+        """(start, chunk) of a held chunk covering offset, else (start of the next chunk or None, None)."""
+        idx = bisect.bisect_right(self.starts, offset) - 1
+        for i in range(idx, -1, -1):
+            if self.starts[i] + len(self.chunks[i]) > offset:
+                self._recency.move_to_end(self.starts[i])
+                return self.starts[i], self.chunks[i]
+        return (self.starts[idx + 1] if idx + 1 < len(self.starts) else None), None
+
+    def readinto(self, buffer):
+        stop = min(self.pos + len(buffer), self.size)
+        view = memoryview(buffer)
+        cursor = self.pos
+        while cursor < stop:
+            # Copied under the lock, or straight from the bytes fetched for the gap,
+            # so a chunk evicted by another reader in between is never looked up
+            with self._lock:
+                chunk_start, chunk = self._chunk_at(cursor)
+                if chunk is not None:
+                    take = min(len(chunk) - (cursor - chunk_start), stop - cursor)
+                    view[cursor - self.pos:cursor - self.pos + take] = chunk[cursor - chunk_start:cursor - chunk_start + take]
+                    cursor += take
+                    continue
+            gap_stop = stop if chunk_start is None else min(chunk_start, stop)
+            self.on_demand += 1
+            data = self.remote.read_range(cursor, gap_stop)
+            self.add(cursor, data)
+            view[cursor - self.pos:gap_stop - self.pos] = data[:gap_stop - cursor]
+            cursor = gap_stop
+        written = cursor - self.pos
+        self.pos += written
+        return written
+
+
+class RemoteParquet:
+    """
+    A remote Parquet file read footer first: one request for the tail, then only the
+    column chunks of the row groups a scan needs, fetched concurrently and kept in
+    memory. Row groups are pruned from the footer's statistics by pyarrow itself
+    (ParquetFileFragment.subset), so any dataset filter prunes as it does on disk.
+    """
+
+    def __init__(self, url, remote=None):
+        self.remote = remote or RemoteFile(url)
+        if self.remote.size is None:
+            self.remote.probe()
+        if not self.remote.accepts_ranges:
+            raise requests.RequestException(f"❌ {url} doesn't serve byte ranges")
+        self.file = _SparseFile(self.remote)
+        # 1. Footer first: the tail usually holds all of it
+        tail_start = max(0, self.remote.size - FOOTER_GUESS)
+        self.file.add(tail_start, self.remote.read_range(tail_start, self.remote.size), pinned=True)
+        self.format = ds.ParquetFileFormat()
+        self.fragment = self.format.make_fragment(pa.PythonFile(self.file, mode='r'))
+        self.fragment.ensure_complete_metadata()
+        self.metadata = self.fragment.metadata
+        self.schema = self.fragment.physical_schema
+
+    @property
+    def version(self):
+        return self.remote.version
+
+    @property
+    def stats(self):
+        return {**self.remote.stats, 'on_demand_reads': self.file.on_demand, 'file_bytes': self.remote.size,
+                'held_bytes': self.file.bytes, 'evicted_bytes': self.file.evicted_bytes}
+
+    def column_ranges(self, row_groups, columns=None):
+        """[start, stop) byte range of each column chunk of `columns` (all when None) in `row_groups`."""
+        wanted = None if columns is None else set(columns)
+        ranges = []
+        for rg in row_groups:
+            row_group = self.metadata.row_group(rg)
+            for col in range(row_group.num_columns):
+                chunk = row_group.column(col)
+                if wanted is not None and chunk.path_in_schema.split('.')[0] not in wanted:
+                    continue
+                start = chunk.data_page_offset
+                if chunk.has_dictionary_page and chunk.dictionary_page_offset is not None:
+                    start = min(start, chunk.dictionary_page_offset)
+                ranges.append((start, start + chunk.total_compressed_size))
+        return ranges
+
+    def plan(self, row_groups, columns=None, needed=None):
+        """Coalesced [start, stop) ranges covering the chunks of `columns` in `row_groups` not held yet."""
+        ranges = []
+        for start, stop in needed or self.column_ranges(row_groups, columns):
+            ranges.extend(self.file.missing(start, stop))
+        merged = []
+        for start, stop in sorted(ranges):
+            if merged and start - merged[-1][1] <= COALESCE_GAP:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        # Large spans are split so they download in parallel too
+        block = self.remote.block_bytes
+        return [(s, min(s + block, stop)) for start, stop in merged for s in range(start, stop, block)]
+
+    @instrumented('gold.remote_fetch')
+    def prefetch(self, row_groups, columns=None):
+        needed = self.column_ranges(row_groups, columns)
+        ranges = self.plan(row_groups, columns, needed)
+        # Room is made up front, sparing what this scan reads, so nothing it needs is evicted before it's read
+        self.file.make_room(sum(stop - start for start, stop in ranges), keep=needed)
+        for (start, _), data in zip(ranges, self.remote.read_ranges(ranges)):
+            self.file.add(start, data)
+
+    def dataset(self, filter=None, columns=None):
+        """
+        pyarrow dataset over the row groups that can match `filter`, with the chunks
+        of `columns` (all when None) already fetched. Columns the filter reads should
+        be among them; any that aren't are fetched on demand.
+        """
+        fragment = self.fragment if filter is None else self.fragment.subset(filter)
+        self.prefetch([rg.id for rg in fragment.row_groups], columns)
+        return ds.FileSystemDataset([fragment], self.schema, self.format)
+
+
+def open_remote(url, revalidate_after=None):
+    """
+    Process-wide RemoteParquet for url. With revalidate_after (seconds), an older
+    handle is re-probed with its ETag/Last-Modified and replaced if the file changed;
+    without it the cached handle is returned as is.
+    """
+    with _LOCK:
+        cached = _OPEN.get(url)
+        if cached and (revalidate_after is None or time.time() - cached[0] < revalidate_after):
+            return cached[1]
+        if cached:
+            remote = cached[1].remote
+            headers = {}
+            if remote.etag:
+                headers['If-None-Match'] = remote.etag
+            if remote.last_modified:
+                headers['If-Modified-Since'] = remote.last_modified
+            if RemoteFile(remote.url, remote.session).probe(headers) is None:
+                _OPEN[url] = (time.time(), cached[1])
+                return cached[1]
+        handle = RemoteParquet(url)
+        _OPEN[url] = (time.time(), handle)
+        return handle
@@ -0,0 +1,435 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+
+from src.analytics import RFM_COLUMNS, CustomerAnalytics
+from src.cohorts import cohort_table
+from src.cube import load_cube
+from src.gold_layer import gold_source
+from src.instrumentation import stage
+from src.query import GoldQuery
+from src.recommender import load_recommender
+
+load_dotenv()
+
+CACHE_MB = float(os.getenv("ANALYTICS_CACHE_MB", 256))
+CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", 900))
+SERVICE_HOST = os.getenv("ANALYTICS_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("ANALYTICS_SERVICE_PORT", 8765))
+# When set, pages query this endpoint instead of computing in-process
+SERVICE_URL = os.getenv("ANALYTICS_SERVICE_URL")
+
+
+def result_bytes(value):
+    """Approximate resident size of a cached result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    return len(json.dumps(value, default=str)) * 2
+
+
+class _Flight:
+    """One in-progress computation that concurrent callers of the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.ok = False
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a TTL and a memory budget, keyed by tuples whose first
+    item is the dataset version. Concurrent misses on one key compute it once: the
+    other callers wait for that result instead of repeating the groupby. Results are
+    shared between callers, so treat them as read-only.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        self.max_bytes = int(CACHE_MB * (1 << 20) if max_bytes is None else max_bytes)
+        self.ttl = CACHE_TTL if ttl is None else float(ttl)
+        self.bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0, 'evictions': 0, 'expired': 0}
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self.bytes -= nbytes
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return entry[0]
+                self._drop(key)
+                self.stats['expired'] += 1
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _Flight()
+                self.stats['misses'] += 1
+            else:
+                self.stats['waits'] += 1
+
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            flight.ok = True
+        except BaseException as e:
+            # Includes KeyboardInterrupt/SystemExit: waiters must not read a missing value
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if flight.ok:
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key, value):
+        nbytes = result_bytes(value)
+        if nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, nbytes, time.monotonic() + self.ttl)
+        self.bytes += nbytes
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def purge(self, keep_version):
+        """Drops every entry of another dataset version."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] != keep_version]:
+                self._drop(key)
+
+    def info(self):
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes}
+
+
+def _countries(value):
+    """Country filter as a sorted list (or None for all), from a list or a comma-separated string."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    return sorted({str(country).strip() for country in value if str(country).strip()}) or None
+
+
+def _ids(value):
+    """StockCodes or Customer IDs as a sorted list of strings, from a list or a comma-separated string."""
+    if isinstance(value, str):
+        value = value.split(',')
+    return sorted({str(item).strip() for item in value or () if str(item).strip()})
+
+
+def _flag(value):
+    """Boolean parameter from a bool or its query-string form ('1'/'0', 'true'/'false')."""
+    if isinstance(value, str):
+        if value.lower() not in ('1', '0', 'true', 'false'):
+            raise ValueError(f"❌ Expected a boolean, got '{value}'")
+        return value.lower() in ('1', 'true')
+    return bool(value)
+
+
+def _day(value):
+    """Normalizes a date filter to 'YYYY-MM-DD' (or None), so equal filters share a key."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (date, datetime, pd.Timestamp)):
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+    return pd.Timestamp(str(value)).strftime('%Y-%m-%d')
+
+
+class AnalyticsService:
+    """
+    Headless query API over the Gold Layer: KPIs, revenue trend, country revenue,
+    top products, RFM segments, cohorts and product recommendations. Every result is cached in a ResultCache under
+    (dataset version, query, filters), so all sessions, pages and other consumers
+    (scheduled reports, the HTTP endpoint) share one computation per distinct query.
+    """
+
+    def __init__(self, cache=None, source=None):
+        self.cache = cache if cache is not None else ResultCache()
+        self.source = source or gold_source
+        self._version = None
+
+    def _run(self, name, compute, **params):
+        path, version = self.source()
+        if version != self._version:
+            # Only the current version stays resident
+            self.cache.purge(version)
+            self._version = version
+        key = (version, name, json.dumps(params, sort_keys=True, default=str))
+        with stage(f'service.{name}'):
+            return self.cache.get_or_compute(key, lambda: compute(path, version, **params))
+
+    def version(self):
+        return self.source()[1]
+
+    # --- 1. Queries ---
+    def date_bounds(self):
+        """(min, max) InvoiceDate as Timestamps."""
+        return self._run('date_bounds', lambda path, version: GoldQuery(source=path).date_bounds())
+
+    def kpis(self, start=None, end=None):
+        """Revenue plus approximate distinct orders and customers (see DailyCube.kpis)."""
+        return self._run('kpis', lambda path, version, start, end: load_cube(None, version, path).kpis(start, end),
+                         start=_day(start), end=_day(end))
+
+    def revenue_trend(self, start=None, end=None, freq='MS'):
+        return self._run('revenue_trend',
+                         lambda path, version, start, end, freq: load_cube(None, version, path).revenue_trend(start, end, freq),
+                         start=_day(start), end=_day(end), freq=freq)
+
+    def top_products(self, start=None, end=None, n=5):
+        def compute(path, version, start, end, n):
+            top = load_cube(None, version, path).top_products(start, end, n)
+            return top.rename_axis('Description').reset_index()
+        return self._run('top_products', compute, start=_day(start), end=_day(end), n=int(n))
+
+    def country_revenue(self, start=None, end=None):
+        """Exact per-country revenue from a projected, date-pruned scan."""
+        def compute(path, version, start, end):
+            query = GoldQuery(['Country', 'Line_Total'], source=path).between(start, end)
+            return query.aggregate('Country', {'Line_Total': 'sum'})
+        return self._run('country_revenue', compute, start=_day(start), end=_day(end))
+
+    def rfm(self):
+        """Per-customer RFM scores and segments (the full table)."""
+        def compute(path, version):
+            # Folds only new invoices into the saved per-customer state
+            analyzer = CustomerAnalytics(GoldQuery(RFM_COLUMNS, source=path).to_pandas())
+            return analyzer.generate_rfm_incremental()
+        return self._run('rfm', compute)
+
+    def rfm_segments(self):
+        """Customers per segment, largest first."""
+        def compute(path, version):
+            counts = self.rfm()['Segment'].value_counts()
+            return counts.rename_axis('Segment').reset_index(name='Count')
+        return self._run('rfm_segments', compute)
+
+    def segment_customers(self, segment, n=10, offset=0):
+        """n customers of one segment from position offset (a page of the segment's table)."""
+        def compute(path, version, segment, n, offset):
+            rfm = self.rfm()
+            return rfm[rfm['Segment'] == segment].iloc[offset:offset + n]
+        return self._run('segment_customers', compute, segment=segment, n=int(n), offset=int(offset))
+
+    def cohorts(self, countries=None, exclude_cancelled=True):
+        """Monthly acquisition cohort table (see src.cohorts) for the whole history."""
+        def compute(path, version, countries, exclude_cancelled):
+            return cohort_table(path, countries, exclude_cancelled)
+        return self._run('cohorts', compute, countries=_countries(countries), exclude_cancelled=_flag(exclude_cancelled))
+
+    def similar_items(self, stock_codes, n=10):
+        """Nearest products of each StockCode in the item-item index (see src.recommender)."""
+        def compute(path, version, stock_codes, n):
+            return load_recommender(path, version).similar_items(stock_codes, n)
+        return self._run('similar_items', compute, stock_codes=_ids(stock_codes), n=int(n))
+
+    def recommend(self, customer_ids, n=10):
+        """Top-n products each customer hasn't bought yet, scored by the item-item index."""
+        def compute(path, version, customer_ids, n):
+            return load_recommender(path, version).recommend(customer_ids, n)
+        return self._run('recommend', compute, customer_ids=_ids(customer_ids), n=int(n))
+
+    def cache_info(self):
+        return self.cache.info()
+
+
+# --- 2. HTTP/JSON endpoint ---
+# Endpoint -> (method name, query-string parameters it accepts)
+ENDPOINTS = {
+    '/version': ('version', ()),
+    '/date_bounds': ('date_bounds', ()),
+    '/kpis': ('kpis', ('start', 'end')),
+    '/revenue_trend': ('revenue_trend', ('start', 'end', 'freq')),
+    '/top_products': ('top_products', ('start', 'end', 'n')),
+    '/country_revenue': ('country_revenue', ('start', 'end')),
+    '/rfm_segments': ('rfm_segments', ()),
+    '/segment_customers': ('segment_customers', ('segment', 'n', 'offset')),
+    '/cohorts': ('cohorts', ('countries', 'exclude_cancelled')),
+    '/similar_items': ('similar_items', ('stock_codes', 'n')),
+    '/recommend': ('recommend', ('customer_ids', 'n')),
+}
+# Frame columns sent as ISO strings and parsed back into datetimes by the client
+DATE_COLUMNS = ['InvoiceDate', 'Cohort']
+
+
+def to_json(value):
+    if isinstance(value, pd.DataFrame):
+        # A named index (e.g. Customer ID) travels as a column and is restored by the client
+        index = value.index.name
+        frame = value.reset_index() if index is not None else value
+        return {'columns': list(frame.columns), 'index': index,
+                'data': json.loads(frame.to_json(orient='values', date_format='iso'))}
+    if isinstance(value, tuple):
+        return [None if item is None else str(item) for item in value]
+    return value
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """GET /<query>?start=YYYY-MM-DD&end=...  ->  {"version", "result"}; GET /stats -> cache stats."""
+    # Keep-alive: a client session reuses its connection across queries. Headers and
+    # body are separate writes, so Nagle would hold the body for the delayed ACK (~40 ms)
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self._send(200, self.service.cache_info())
+            return
+        if url.path not in ENDPOINTS:
+            self._send(404, {'error': f"unknown query {url.path}", 'queries': sorted(ENDPOINTS)})
+            return
+        method, accepted = ENDPOINTS[url.path]
+        params = dict(parse_qsl(url.query))
+        unknown = set(params) - set(accepted)
+        if unknown:
+            self._send(400, {'error': f"unsupported parameter(s) {sorted(unknown)}"})
+            return
+        try:
+            result = getattr(self.service, method)(**params)
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        self._send(200, {'version': self.service.version(), 'result': to_json(result)})
+
+
+def serve(service=None, host=None, port=None):
+    """Starts the endpoint on a background thread; returns the server (port 0 = any free port)."""
+    handler = type('Handler', (ServiceHandler,), {'service': service or get_service()})
+    server = ThreadingHTTPServer((host or SERVICE_HOST, SERVICE_PORT if port is None else port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class AnalyticsClient:
+    """Same queries as AnalyticsService, answered by a remote endpoint (ANALYTICS_SERVICE_URL)."""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _get(self, endpoint, **params):
+        params = {key: value for key, value in params.items() if value is not None}
+        response = self.session.get(self.url + endpoint, params=params, timeout=self.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"❌ Analytics service {endpoint}: {response.json().get('error', response.status_code)}")
+        result = response.json()['result']
+        if isinstance(result, dict) and set(result) == {'columns', 'index', 'data'}:
+            frame = pd.DataFrame(result['data'], columns=result['columns'])
+            for column in DATE_COLUMNS:
+                if column in frame:
+                    frame[column] = pd.to_datetime(frame[column]).dt.tz_localize(None)
+            return frame.set_index(result['index']) if result['index'] else frame
+        return result
+
+    def version(self):
+        return self._get('/version')
+
+    def date_bounds(self):
+        return tuple(None if value is None else pd.Timestamp(value) for value in self._get('/date_bounds'))
+
+    def kpis(self, start=None, end=None):
+        return self._get('/kpis', start=_day(start), end=_day(end))
+
+    def revenue_trend(self, start=None, end=None, freq='MS'):
+        return self._get('/revenue_trend', start=_day(start), end=_day(end), freq=freq)
+
+    def top_products(self, start=None, end=None, n=5):
+        return self._get('/top_products', start=_day(start), end=_day(end), n=n)
+
+    def country_revenue(self, start=None, end=None):
+        return self._get('/country_revenue', start=_day(start), end=_day(end))
+
+    def rfm_segments(self):
+        return self._get('/rfm_segments')
+
+    def segment_customers(self, segment, n=10, offset=0):
+        return self._get('/segment_customers', segment=segment, n=n, offset=offset)
+
+    def cohorts(self, countries=None, exclude_cancelled=True):
+        countries = _countries(countries)
+        return self._get('/cohorts', countries=','.join(countries) if countries else None,
+                         exclude_cancelled=int(_flag(exclude_cancelled)))
+
+    def similar_items(self, stock_codes, n=10):
+        return self._get('/similar_items', stock_codes=','.join(_ids(stock_codes)), n=n)
+
+    def recommend(self, customer_ids, n=10):
+        return self._get('/recommend', customer_ids=','.join(_ids(customer_ids)), n=n)
+
+    def cache_info(self):
+        return self.session.get(self.url + '/stats', timeout=self.timeout).json()
+
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_service():
+    """Process-wide query API: a client of ANALYTICS_SERVICE_URL when set, else the in-process service."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = AnalyticsClient(SERVICE_URL) if SERVICE_URL else AnalyticsService()
+        return _DEFAULT
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else SERVICE_PORT
+    server = serve(AnalyticsService(), port=port)
+    print(f"📡 Analytics service on http://{server.server_address[0]}:{server.server_address[1]} "
+          f"(queries: {', '.join(sorted(ENDPOINTS))})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# HyperLogLog precision p: 2**p registers, relative standard error 1.04 / sqrt(2**p)
+#   p=10 -> 3.25%   p=12 -> 1.63%   p=14 -> 0.81%   p=16 -> 0.41%
+DEFAULT_PRECISION = 14
+MIN_PRECISION = 8
+MAX_PRECISION = 16
+
+RANK_BITS = 6
+RANK_MASK = (1 << RANK_BITS) - 1
+
+
+def standard_error(precision):
+    return 1.04 / np.sqrt(2 ** precision)
+
+
+def check_precision(precision):
+    precision = int(precision)
+    if not MIN_PRECISION <= precision <= MAX_PRECISION:
+        raise ValueError(f"HLL precision must be between {MIN_PRECISION} and {MAX_PRECISION}, got {precision}")
+    return precision
+
+
+def hll_entries(values, precision=DEFAULT_PRECISION):
+    """
+    Sparse HyperLogLog entries for a Series, packed as uint32 (register << 6 | rank).
+    Nulls are skipped by the caller. Categorical and object columns holding the same
+    values hash identically, so sketches stay mergeable across schema changes.
+    """
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    register = (hashes >> np.uint64(64 - precision)).astype(np.uint32)
+    remainder = hashes << np.uint64(precision)
+
+    # rank = leading zeros of the remaining bits + 1
+    rank = np.full(len(hashes), 64 - precision + 1, dtype=np.uint32)
+    nonzero = remainder != 0
+    top_bit = np.floor(np.log2(remainder[nonzero].astype(np.float64))).astype(np.int64)
+    rank[nonzero] = np.clip(64 - top_bit, 1, 64 - precision + 1)
+    return (register << RANK_BITS) | rank
+
+
+def union_by_group(groups, entries):
+    """
+    Unions sparse sketches per group: keeps the highest rank per (group, register).
+    Returns (groups, entries) sorted by group, one entry per touched register.
+    """
+    if len(entries) == 0:
+        return groups.astype(np.int64), entries.astype(np.uint32)
+    # entries < 2**22, so (group, register, rank) packs into one sortable int64
+    packed = np.sort((groups.astype(np.int64) << 22) | entries.astype(np.int64))
+    register_key = packed >> RANK_BITS
+    last = np.r_[register_key[1:] != register_key[:-1], True]
+    packed = packed[last]
+    return packed >> 22, (packed & ((1 << 22) - 1)).astype(np.uint32)
+
+
+def to_offsets(groups, n_groups):
+    """CSR-style offsets for entries already sorted by group."""
+    return np.searchsorted(groups, np.arange(n_groups + 1)).astype(np.int64)
+
+
+def estimate(entries, precision=DEFAULT_PRECISION):
+    """Distinct-count estimate from any union of sparse entries (duplicates are fine)."""
+    m = 1 << precision
+    registers = np.zeros(m, dtype=np.uint8)
+    np.maximum.at(registers, entries >> RANK_BITS, (entries & RANK_MASK).astype(np.uint8))
+
+    zeros = m - np.count_nonzero(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.ldexp(1.0, -registers.astype(np.int64)).sum()
+    # Small-range correction (linear counting) keeps low counts near-exact
+    if raw <= 2.5 * m and zeros:
+        return m * np.log(m / zeros)
+    return raw
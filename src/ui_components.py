@@ -1,17 +1,189 @@
 import streamlit as st
+import pandas as pd
+import numpy as np
+import json
 import os
+import plotly.graph_objects as go
+import plotly.io as pio
+from dotenv import load_dotenv
 
-def create_global_sidebar(df):
+from src.features import GRANULARITIES
+from src.instrumentation import STAGE_DIAGNOSTICS, on_record, record_bytes, run_records, stage
+from src.service import ResultCache, result_bytes
+
+load_dotenv()
+
+# Time series: the coarsest granularity giving at least CHART_MIN_POINTS points is picked,
+# and series longer than CHART_MAX_POINTS are decimated (LTTB) before they are sent
+CHART_MIN_POINTS = int(os.getenv("CHART_MIN_POINTS", 24))
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", 500))
+# Rows per page of a server-side paged table
+TABLE_PAGE_ROWS = int(os.getenv("TABLE_PAGE_ROWS", 50))
+
+# Serialized figures shared by every session, keyed by (dataset version, chart, filters, spec)
+_FIGURES = ResultCache(max_bytes=float(os.getenv("FIGURE_CACHE_MB", 64)) * (1 << 20))
+_FIGURES_VERSION = None
+
+
+def diagnostics_enabled():
+    """The diagnostics panel is hidden unless ?diagnostics=1 is in the URL (or STAGE_DIAGNOSTICS=1)."""
+    return STAGE_DIAGNOSTICS or st.query_params.get('diagnostics') == '1'
+
+
+def render_diagnostics(placeholder, records):
+    """Latency breakdown of the current rerun: one row per stage, nested stages indented."""
+    with placeholder.container():
+        if not records:
+            st.caption("No stage has run yet.")
+            return
+        table = pd.DataFrame({
+            'Stage': ['\u2003' * r['depth'] + r['stage'] for r in records],
+            'ms': [r['wall_ms'] for r in records],
+            'Rows': pd.array([r['rows'] for r in records], dtype='Int64'),
+            'KB': [None if r.get('bytes') is None else round(r['bytes'] / 1024, 1) for r in records],
+            'Peak MB': [r['peak_rss_mb'] for r in records],
+        })
+        total_ms = sum(r['wall_ms'] for r in records if r['depth'] == 0)
+        st.caption(f"**{total_ms:,.0f} ms** across top-level stages (cached calls don't appear)")
+        st.dataframe(table, hide_index=True, use_container_width=True)
+
+# --- 1. Time series ---
+def pick_granularity(start, end, min_points=None):
+    """Coarsest of monthly/weekly/daily giving at least min_points periods between start and end."""
+    min_points = min_points or CHART_MIN_POINTS
+    for granularity in ('monthly', 'weekly'):
+        if len(pd.date_range(start, end, freq=GRANULARITIES[granularity])) >= min_points:
+            return granularity
+    return 'daily'
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points of (x, y) that keep the
+    series' visual shape. The first and last points are always kept; the ones between
+    are split into n_out - 2 buckets, and each bucket keeps the point forming the largest
+    triangle with the point kept before it and the mean of the next bucket.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket i is [edges[i], edges[i + 1]); the last "bucket" is the final point alone
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_x = x[hi:edges[i + 2]].mean()
+        next_y = y[hi:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def decimate(frame, x, y, max_points=None):
+    """frame cut to at most max_points rows (LTTB over columns x, y); shorter frames are returned as-is."""
+    max_points = max_points or CHART_MAX_POINTS
+    if len(frame) <= max_points:
+        return frame
+    return frame.iloc[lttb(frame[x].to_numpy(), frame[y].to_numpy(), max_points)]
+
+
+# --- 2. Cached figures ---
+class SerializedFigure(go.Figure):
+    """
+    A figure already serialized to JSON. st.plotly_chart takes a Figure's to_dict() as
+    is, whereas a plain dict would be validated by rebuilding it as a Figure (~20 ms).
+    """
+
+    def __init__(self, figure_json):
+        super().__init__()
+        self._figure_json = figure_json
+
+    def to_dict(self):
+        return json.loads(self._figure_json)
+
+
+def figure_json(name, version, filters, spec, build):
+    """
+    Plotly JSON of one chart, cached under (dataset version, name, filters, spec) for
+    every session: build() (fetch, downsample, lay out) and the serialization only run
+    on a miss. spec must hold everything build() takes from outside the data.
+    """
+    global _FIGURES_VERSION
+    if version != _FIGURES_VERSION:
+        # Only the current version stays resident
+        _FIGURES.purge(version)
+        _FIGURES_VERSION = version
+
+    def compute():
+        with stage(f'chart.{name}.build'):
+            figure = build()
+        with stage(f'chart.{name}.serialize'):
+            payload = pio.to_json(figure, validate=False)
+            record_bytes(len(payload))
+        return payload
+
+    key = (version, name, json.dumps(filters, sort_keys=True, default=str), json.dumps(spec, sort_keys=True, default=str))
+    return _FIGURES.get_or_compute(key, compute)
+
+
+def render_chart(name, version, filters, spec, build):
+    """Draws a cached chart (see figure_json); the stage records the payload size and time to render."""
+    with stage(f'chart.{name}'):
+        payload = figure_json(name, version, filters, spec, build)
+        record_bytes(len(payload))
+        st.plotly_chart(SerializedFigure(payload), use_container_width=True)
+
+
+def figure_cache_info():
+    return _FIGURES.info()
+
+
+# --- 3. Paged tables ---
+def render_table(source, key, total_rows=None, page_size=None):
+    """
+    Shows one page of a table instead of shipping the whole frame to the browser.
+    source is a DataFrame, or fetch(offset, n) returning rows offset..offset+n of a
+    table of total_rows rows (so only the page is computed or transferred).
+    """
+    page_size = page_size or TABLE_PAGE_ROWS
+    if isinstance(source, pd.DataFrame):
+        frame = source
+        total_rows = len(frame)
+
+        def source(offset, n):
+            return frame.iloc[offset:offset + n]
+    pages = max(1, -(-int(total_rows) // page_size))
+    page = 1
+    if pages > 1:
+        page = int(st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page"))
+    offset = (page - 1) * page_size
+    with stage(f'table.{key}'):
+        rows = source(offset, page_size)
+        record_bytes(result_bytes(rows))
+        st.dataframe(rows, use_container_width=True)
+    if pages > 1:
+        st.caption(f"Rows {offset + 1:,}–{offset + len(rows):,} of {int(total_rows):,}")
+
+
+def create_global_sidebar(df=None, date_bounds=None):
     """
     Recreates the high-end V1 sidebar logic for the current suite.
+    Pages that don't hold the full table pass date_bounds=(min, max) instead of df.
     """
     st.sidebar.title("💎 AjayDataLabs")
     st.sidebar.markdown("*Enterprise BI & Logistics*")
     st.sidebar.divider()
 
     st.sidebar.header("🗓️ Global Filters")
-    min_date = df['InvoiceDate'].min().date()
-    max_date = df['InvoiceDate'].max().date()
+    if date_bounds is None:
+        date_bounds = (df['InvoiceDate'].min(), df['InvoiceDate'].max())
+    min_date = date_bounds[0].date()
+    max_date = date_bounds[1].date()
 
     date_range = st.sidebar.date_input(
         "Select Analysis Period",
@@ -27,4 +199,11 @@ def create_global_sidebar(df):
         st.write("**Models:** XGBoost, RFM Clustering")
         st.write("**Engine:** Apache Parquet Gold Layer")
 
+    # Hidden diagnostics: redrawn each time a top-level stage of this rerun finishes
+    if diagnostics_enabled():
+        with st.sidebar.expander("🩺 Diagnostics", expanded=True):
+            placeholder = st.empty()
+        render_diagnostics(placeholder, run_records())
+        on_record(lambda records: render_diagnostics(placeholder, records))
+
     return date_range
\ No newline at end of file
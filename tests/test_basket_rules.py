@@ -0,0 +1,79 @@
+from collections import Counter
+from itertools import combinations
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.basket_rules import RuleSet, encode_baskets, frequent_itemsets, mine_rules
+
+
+def sales(baskets):
+    """Gold Layer lines for a list of baskets (lists of StockCodes), one invoice each."""
+    rows = [(f'5{b:05d}', item) for b, basket in enumerate(baskets) for item in basket]
+    return pd.DataFrame({
+        'Invoice': [invoice for invoice, _ in rows],
+        'StockCode': [item for _, item in rows],
+        'Quantity': 1,
+        'Is_Cancelled': False,
+        'InvoiceDate': pd.Timestamp('2011-01-01'),
+        'Country': 'United Kingdom',
+    })
+
+
+@pytest.mark.parametrize('min_count', [2, 5, 12])
+def test_frequent_itemsets_match_brute_force(min_count):
+    rng = np.random.default_rng(0)
+    # Skewed item popularity, repeated lines and some identical baskets
+    popularity = rng.dirichlet(np.full(15, 0.5))
+    baskets = [list(rng.choice(15, rng.integers(1, 7), p=popularity).astype(str)) for _ in range(200)]
+    baskets += [['0', '1', '2']] * 5
+    offsets, codes, items = encode_baskets(sales(baskets))
+
+    found = frequent_itemsets(offsets, codes, min_count, max_len=3)
+
+    expected = Counter()
+    for basket in baskets:
+        codes_in = sorted(int(np.searchsorted(items, item)) for item in set(basket))
+        for size in (1, 2, 3):
+            expected.update(combinations(codes_in, size))
+    assert found == {itemset: count for itemset, count in expected.items() if count >= min_count}
+
+
+def test_rule_confidence_and_lift_by_hand():
+    # 10 baskets: A in 6, B in 5, A and B together in 4, C in 2 (too rare to count)
+    baskets = [['A', 'B']] * 4 + [['A']] * 2 + [['B']] + [['C', 'D']] * 2 + [['D']]
+    rules = mine_rules(sales(baskets), min_support=0.3, min_confidence=0.5, min_baskets=1)
+
+    rules = rules.set_index('Consequent')
+    assert sorted(rules.index) == ['A', 'B']
+    # A -> B: 4 / 6 of A's baskets hold B; B is in 5 / 10 of all baskets
+    assert rules.loc['B', 'Antecedent'] == ['A']
+    assert rules.loc['B', 'Confidence'] == pytest.approx(4 / 6)
+    assert rules.loc['B', 'Lift'] == pytest.approx((4 / 6) / (5 / 10))
+    # B -> A: 4 / 5, against A's 6 / 10
+    assert rules.loc['A', 'Confidence'] == pytest.approx(4 / 5)
+    assert rules.loc['A', 'Lift'] == pytest.approx((4 / 5) / (6 / 10))
+    assert rules['Support'].tolist() == pytest.approx([0.4, 0.4]) and rules['Baskets'].tolist() == [4, 4]
+
+
+def test_cancelled_lines_and_returns_leave_the_baskets():
+    df = sales([['A', 'B']] * 3 + [['A', 'C']] * 3)
+    df.loc[df['StockCode'] == 'C', 'Quantity'] = -1
+    df.loc[df['Invoice'] == '500000', 'Is_Cancelled'] = True
+    offsets, codes, items = encode_baskets(df)
+
+    assert items.tolist() == ['A', 'B']
+    assert frequent_itemsets(offsets, codes, 1) == {(0,): 5, (1,): 2, (0, 1): 2}
+
+
+def test_lookup_fires_rules_whose_antecedent_is_in_the_basket():
+    rules = pd.DataFrame({
+        'Partition': 'All', 'Antecedent': [['A'], ['A', 'B'], ['C']], 'Consequent': ['B', 'C', 'A'],
+        'Support': 0.1, 'Confidence': [0.5, 0.9, 0.7], 'Lift': 2.0, 'Baskets': 10,
+    })
+    ruleset = RuleSet(rules)
+
+    assert ruleset.lookup(['A'])['Consequent'].tolist() == ['B']
+    # A + B fires both A-rules, but B is already in the basket
+    assert ruleset.lookup(['A', 'B'])['Consequent'].tolist() == ['C']
+    assert ruleset.lookup(['Z']).empty
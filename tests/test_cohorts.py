@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from src.cohorts import CohortMatrix, pivot_cohorts, retention_curve
+
+
+def purchases(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    customers = rng.integers(0, 150, n).astype(str).astype(object)
+    customers[rng.random(n) < 0.05] = None
+    df = pd.DataFrame({
+        'Customer ID': pd.Categorical(customers, categories=[*np.arange(160).astype(str)]),
+        'InvoiceDate': pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 420 * 86400, n), 's'),
+        'Line_Total': rng.gamma(2.0, 10.0, n),
+    })
+    # A customer with gaps: first buys in March 2010, skips two months, then buys again twice
+    gaps = pd.DataFrame({'Customer ID': pd.Categorical(['155'] * 3, categories=df['Customer ID'].cat.categories),
+                         'InvoiceDate': pd.to_datetime(['2010-03-20', '2010-06-02', '2010-11-30']),
+                         'Line_Total': [5.0, 7.0, 11.0]})
+    return pd.concat([df, gaps], ignore_index=True)
+
+
+def groupby_cohorts(df):
+    """Reference: first-purchase month x months since it, from a plain groupby/pivot."""
+    df = df.dropna(subset=['Customer ID']).astype({'Customer ID': str})
+    month = df['InvoiceDate'].dt.to_period('M')
+    first = month.groupby(df['Customer ID']).transform('min')
+    df = df.assign(Cohort=first.dt.to_timestamp(), Months_Since=(month - first).map(lambda offset: offset.n))
+    cells = df.groupby(['Cohort', 'Months_Since'])
+    customers = cells['Customer ID'].nunique().unstack()
+    revenue = cells['Line_Total'].sum().unstack()
+    return customers, revenue
+
+
+def test_cohort_matrix_matches_a_groupby_pivot():
+    df = purchases()
+    table = CohortMatrix.build(df).to_frame()
+    customers, revenue = groupby_cohorts(df)
+
+    got_customers = pivot_cohorts(table, 'Customers')
+    got_customers.index.name, got_customers.columns.name = customers.index.name, customers.columns.name
+    # Observed cells without activity are 0 in the matrix and missing from the groupby
+    observed = got_customers.notna()
+    pd.testing.assert_frame_equal(got_customers, customers.reindex_like(got_customers).fillna(0).where(observed),
+                                  check_dtype=False, check_freq=False)
+    got_revenue = pivot_cohorts(table, 'Revenue').rename_axis(index=revenue.index.name, columns=revenue.columns.name)
+    pd.testing.assert_frame_equal(got_revenue, revenue.reindex_like(got_revenue).fillna(0).where(observed),
+                                  check_freq=False)
+
+    sizes = customers[0]
+    retention = pivot_cohorts(table, 'Retention')
+    np.testing.assert_allclose(retention.to_numpy(), (got_customers.div(sizes, axis=0)).to_numpy())
+
+
+def test_customer_with_gaps_counts_only_in_active_months():
+    df = purchases()
+    table = CohortMatrix.build(df).to_frame()
+    march = table[table['Cohort'] == pd.Timestamp('2010-03-01')].set_index('Months_Since')
+    without = CohortMatrix.build(df[df['Customer ID'] != '155']).to_frame()
+    march_without = without[without['Cohort'] == pd.Timestamp('2010-03-01')].set_index('Months_Since')
+
+    # Customer 155 is in the March cohort, active at ages 0, 3 and 8 only
+    difference = march[['Customers', 'Revenue']].sub(march_without[['Customers', 'Revenue']], fill_value=0)
+    assert difference.index[difference['Customers'] > 0].tolist() == [0, 3, 8]
+    np.testing.assert_allclose(difference['Revenue'][[0, 3, 8]], [5.0, 7.0, 11.0])
+    assert difference['Customers'].sum() == 3
+
+
+def test_retention_curve_weights_cohorts_by_size():
+    table = CohortMatrix.build(purchases()).to_frame()
+    curve = retention_curve(table).set_index('Months_Since')
+    at_two = table[table['Months_Since'] == 2]
+
+    assert curve.loc[0, 'Retention'] == 1.0
+    assert curve.loc[2, 'Retention'] == at_two['Customers'].sum() / at_two['Cohort_Size'].sum()
+    assert curve.loc[2, 'Cohorts'] == len(at_two)
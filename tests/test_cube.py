@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cube import DailyCube
+from src.features import period_starts
+
+
+def sales(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        # 2009-12-01 is a Tuesday: the first week starts on Monday 2009-11-30
+        'InvoiceDate': pd.Timestamp('2009-12-01') + pd.to_timedelta(rng.integers(0, 120 * 86400, n), 's'),
+        'Country': pd.Categorical(rng.choice(['United Kingdom', 'France', 'EIRE'], n)),
+        'Description': pd.Categorical(rng.choice(['MUG', 'LANTERN', 'CANDLE'], n)),
+        'Line_Total': rng.gamma(2.0, 10.0, n),
+        'Quantity': rng.integers(1, 10, n),
+        'Invoice': rng.integers(500000, 502000, n).astype(str),
+        'Customer ID': pd.Categorical(rng.integers(12000, 12800, n).astype(str)),
+    })
+
+
+@pytest.mark.parametrize('granularity, freq', [('daily', 'D'), ('weekly', 'W-MON'), ('monthly', 'MS')])
+def test_revenue_trend_buckets_match_the_feature_store_periods(granularity, freq):
+    df = sales()
+    trend = DailyCube.build(df).revenue_trend(freq=freq)
+
+    expected = df.groupby(period_starts(df['InvoiceDate'], granularity))['Line_Total'].sum()
+    expected = expected.reindex(trend['InvoiceDate'], fill_value=0.0)
+    np.testing.assert_array_equal(trend['InvoiceDate'], expected.index)
+    np.testing.assert_allclose(trend['Line_Total'], expected.to_numpy())
+    if granularity == 'weekly':
+        assert trend['InvoiceDate'].iloc[0] == pd.Timestamp('2009-11-30')
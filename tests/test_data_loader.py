@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.data_loader import decode_invoices, encode_invoices, sort_parquet_by_date
+
+
+def test_invoice_prefixes_survive_encoding():
+    invoices = pd.Series(['563185', 'C563185', 'A563185', 'A563186', '489449'])
+    codes = encode_invoices(invoices)
+
+    assert codes.dtype == 'int32'
+    # Same number, different documents: only the cancellation shares the plain code (it has Is_Cancelled)
+    assert codes[0] == codes[1] == 563185
+    assert len({codes[0], codes[2], codes[3]}) == 3
+    assert decode_invoices(codes, invoices.str.startswith('C')).tolist() == invoices.tolist()
+
+
+@pytest.mark.parametrize('invoice', ['AB563185', '563185X', 'a563185', 'A12345678'])
+def test_unsupported_invoice_formats_are_rejected(invoice):
+    with pytest.raises(ValueError):
+        encode_invoices(pd.Series(['489449', invoice]))
+
+
+def test_out_of_core_sort_reads_each_row_group_once_per_pass(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    n = 5000
+    df = pd.DataFrame({
+        'InvoiceDate': pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 400 * 86400, n), 's'),
+        'Country': pd.Categorical(rng.choice(['United Kingdom', 'France', 'EIRE'], n)),
+        'Line_Total': rng.gamma(2.0, 10.0, n),
+    })
+    src_path, dst_path = str(tmp_path / 'unsorted.parquet'), str(tmp_path / 'sorted.parquet')
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), src_path, row_group_size=500)
+
+    reads = []
+    read_row_group = pq.ParquetFile.read_row_group
+    monkeypatch.setattr(pq.ParquetFile, 'read_row_group',
+                        lambda self, i, **kwargs: reads.append(i) or read_row_group(self, i, **kwargs))
+    # Unsorted input: every row group overlaps every one of the ~10 buckets
+    sort_parquet_by_date(src_path, dst_path, rows_per_bucket=500, row_group_rows=1000)
+
+    # One date sample plus one split read per row group, not one read per bucket
+    assert sorted(reads) == sorted(list(range(10)) * 2)
+    result = pq.read_table(dst_path).to_pandas()
+    assert result['InvoiceDate'].is_monotonic_increasing
+    expected = df.sort_values(['InvoiceDate', 'Line_Total']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(result.sort_values(['InvoiceDate', 'Line_Total']).reset_index(drop=True), expected)
+    assert not os.path.exists(dst_path + '.spill')
@@ -0,0 +1,52 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.gold_layer import MANIFEST_NAME, read_date_range
+
+
+def write_dataset(root, parts):
+    """Partitioned Gold Layer with the given {relative path: frame} parts and their manifest."""
+    for rel_path, frame in parts.items():
+        os.makedirs(os.path.join(root, os.path.dirname(rel_path)), exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), os.path.join(root, rel_path),
+                       row_group_size=5)
+    with open(os.path.join(root, MANIFEST_NAME), 'w') as fh:
+        json.dump({'watermark': None, 'files': {}, 'parts': {p: len(f) for p, f in parts.items()}}, fh)
+
+
+def test_read_date_range_with_overlapping_parts_in_one_month(tmp_path):
+    # Two raw extracts covering the same days of March: one part each, named by file hash,
+    # so the later-starting extract's part sorts first
+    early = pd.DataFrame({'Invoice': [f'A{i}' for i in range(20)],
+                          'InvoiceDate': pd.date_range('2011-03-01', periods=20, freq='D'),
+                          'Line_Total': np.arange(20, dtype=np.float64)})
+    late = pd.DataFrame({'Invoice': [f'B{i}' for i in range(20)],
+                         'InvoiceDate': pd.date_range('2011-03-05 12:00', periods=20, freq='D'),
+                         'Line_Total': np.arange(20, dtype=np.float64)})
+    write_dataset(str(tmp_path), {
+        os.path.join('year=2011', 'month=03', 'part-0aaa.parquet'): late,
+        os.path.join('year=2011', 'month=03', 'part-ffff.parquet'): early,
+    })
+
+    result = read_date_range(str(tmp_path), '2011-03-10', '2011-03-15')
+
+    both = pd.concat([early, late])
+    expected = both[(both['InvoiceDate'] >= '2011-03-10') & (both['InvoiceDate'] < '2011-03-16')]
+    assert sorted(result['Invoice']) == sorted(expected['Invoice'])
+    assert result['InvoiceDate'].is_monotonic_increasing
+
+
+def test_read_date_range_single_file(tmp_path):
+    frame = pd.DataFrame({'InvoiceDate': pd.date_range('2011-01-01', periods=60, freq='D'),
+                          'Line_Total': np.ones(60)})
+    path = os.path.join(str(tmp_path), 'gold.parquet')
+    pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path, row_group_size=7)
+
+    result = read_date_range(path, '2011-01-10', '2011-01-19', columns=['Line_Total'])
+
+    assert list(result.columns) == ['Line_Total']
+    assert len(result) == 10
@@ -0,0 +1,53 @@
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.gold_layer import dataset_files
+from src.ingest import IncrementalIngestor
+
+
+def raw_extract(path, invoices, dates, stock_code='85123A'):
+    pd.DataFrame({
+        'Invoice': invoices,
+        'StockCode': stock_code,
+        'Description': 'WHITE HANGING HEART T-LIGHT HOLDER',
+        'Quantity': 6,
+        'InvoiceDate': dates,
+        'Price': 2.55,
+        'Customer ID': 17850.0,
+        'Country': 'United Kingdom',
+    }).to_csv(path, index=False)
+
+
+def ingested(dataset_path):
+    return pd.concat([pq.read_table(f).to_pandas() for f in dataset_files(dataset_path)], ignore_index=True)
+
+
+def test_late_and_overlapping_extracts_are_kept_once(tmp_path, monkeypatch):
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir()
+    monkeypatch.setenv('RAW_DATA_PATH', str(raw_dir))
+    dataset_path = str(tmp_path / 'gold')
+    # a.csv: 1-10 March
+    raw_extract(raw_dir / 'a.csv', [f'5{i:05d}' for i in range(10)],
+                [f'2011-03-{d:02d} 10:00:00' for d in range(1, 11)])
+    # b.csv sorts after a.csv but holds older February sales
+    raw_extract(raw_dir / 'b.csv', [f'4{i:05d}' for i in range(5)],
+                [f'2011-02-{d:02d} 09:00:00' for d in range(1, 6)])
+    IncrementalIngestor(str(raw_dir), dataset_path, memory_limit_mb=64).run()
+    assert len(ingested(dataset_path)) == 15
+
+    # c.csv re-delivers 8-10 March, adds another line at the watermark timestamp and two new days,
+    # written newest first
+    raw_extract(raw_dir / 'c.csv',
+                ['500012', '500011', '600000', '500009', '500008', '500007'],
+                ['2011-03-12 10:00:00', '2011-03-11 10:00:00', '2011-03-10 10:00:00',
+                 '2011-03-10 10:00:00', '2011-03-09 10:00:00', '2011-03-08 10:00:00'])
+    stats = IncrementalIngestor(str(raw_dir), dataset_path, memory_limit_mb=64).run()
+
+    assert stats['rows_appended'] == 3
+    rows = ingested(dataset_path)
+    assert len(rows) == 18
+    assert not rows.duplicated(['Invoice', 'StockCode', 'InvoiceDate']).any()
+    for part in dataset_files(dataset_path):
+        assert pq.read_table(part, columns=['InvoiceDate']).column(0).to_pandas().is_monotonic_increasing
@@ -0,0 +1,28 @@
+import os
+import numpy as np
+import pytest
+
+from src.instrumentation import _memory_kb, begin_run, run_records, stage
+
+pytestmark = pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason="reads /proc/self/status")
+
+
+def test_stage_peak_leaves_the_process_high_water_mark_alone():
+    # Raise the high-water mark well above what the stages below will use
+    spike = np.ones(64 * 2**20 // 8)
+    del spike
+    hwm_before = _memory_kb()[0]
+
+    begin_run()
+    with stage('outer'):
+        with stage('inner'):
+            block = np.ones(16 * 2**20 // 8)
+            block.sum()
+        del block
+
+    assert _memory_kb()[0] >= hwm_before
+    inner, outer = run_records()
+    # Below the earlier spike, so these peaks come from sampled RSS, not VmHWM
+    assert inner['peak_rss_mb'] >= inner['rss_start_mb'] + 15
+    assert outer['peak_rss_mb'] >= inner['peak_rss_mb']
+    assert outer['peak_rss_mb'] < hwm_before / 1024
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src import recommender
+from src.recommender import ItemRecommender, top_k_rows
+from src.service import AnalyticsService
+
+
+def baskets(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Invoice': rng.integers(0, 120, n).astype(str),
+        'StockCode': pd.Categorical(rng.integers(0, 40, n).astype(str)),
+        'Description': 'item',
+        'Customer ID': pd.Categorical(rng.integers(0, 30, n).astype(str)),
+        'Is_Cancelled': rng.random(n) < 0.05,
+    })
+
+
+def test_top_k_rows_matches_a_dense_sort():
+    rng = np.random.default_rng(1)
+    dense = rng.random((50, 30)) * (rng.random((50, 30)) < 0.2)
+    dense[7] = 0
+    columns, values = top_k_rows(sp.csr_matrix(dense), 4)
+
+    for row in range(len(dense)):
+        expected = np.argsort(-dense[row], kind='stable')[:4]
+        expected = expected[dense[row, expected] > 0]
+        assert columns[row, :len(expected)].tolist() == expected.tolist()
+        assert (columns[row, len(expected):] == -1).all()
+        np.testing.assert_allclose(values[row, :len(expected)], dense[row, expected], rtol=1e-6)
+
+
+def test_fitted_neighbours_are_the_dense_cosine_top_k():
+    df = baskets()
+    # A tiny block budget, so the index is built over many item blocks
+    model = ItemRecommender(k=5, block_nnz=200).fit(df)
+
+    kept = df[~df['Is_Cancelled']]
+    matrix = pd.crosstab(kept['Invoice'], kept['StockCode'].astype(str)).clip(upper=1)
+    matrix = matrix.reindex(columns=model.items).to_numpy(dtype=np.float64)
+    together = matrix.T @ matrix
+    cosine = together / np.sqrt(np.outer(np.diag(together), np.diag(together)))
+    np.fill_diagonal(cosine, 0)
+
+    for item in range(len(model.items)):
+        valid = model.neighbors[item] >= 0
+        np.testing.assert_allclose(model.scores[item, valid], cosine[item, model.neighbors[item, valid]], rtol=1e-5)
+        expected = np.sort(cosine[item][cosine[item] > 0])[::-1][:5]
+        np.testing.assert_allclose(model.scores[item, valid], expected, rtol=1e-5)
+
+
+def test_recommend_scores_unseen_items_by_summed_similarity():
+    df = baskets()
+    model = ItemRecommender(k=5).fit(df)
+    customer = model.customer_ids[3]
+    history = model.history[3].toarray().ravel()
+    expected = history @ model.neighbour_matrix().toarray()
+    expected[history > 0] = 0
+
+    top = model.recommend([customer], n=3)
+    assert (top['Customer ID'] == customer).all() and top['Rank'].tolist() == [1, 2, 3]
+    assert not set(top['Recommended']) & set(model.items[history > 0])
+    np.testing.assert_allclose(top['Score'], np.sort(expected)[::-1][:3], rtol=1e-5)
+
+
+def test_save_load_round_trip(tmp_path):
+    model = ItemRecommender(k=4, similarity='cooccurrence').fit(baskets())
+    model.source_version = 'v1'
+    loaded = ItemRecommender.load(model.save(str(tmp_path / 'index.npz')))
+
+    assert (loaded.k, loaded.similarity, loaded.source_version) == (4, 'cooccurrence', 'v1')
+    np.testing.assert_array_equal(loaded.neighbors, model.neighbors)
+    np.testing.assert_array_equal(loaded.scores, model.scores)
+    assert (loaded.history != model.history).nnz == 0
+    customers = list(model.customer_ids[:5])
+    pd.testing.assert_frame_equal(loaded.recommend(customers), model.recommend(customers))
+    pd.testing.assert_frame_equal(loaded.similar_items(['3', '17']), model.similar_items(['3', '17']))
+
+
+def test_service_serves_the_index_of_the_current_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(recommender, 'RECOMMENDER_PATH', str(tmp_path / 'index.npz'))
+    df = baskets().assign(InvoiceDate=pd.Timestamp('2011-01-01'))
+    gold_path = str(tmp_path / 'gold.parquet')
+    df.to_parquet(gold_path)
+    service = AnalyticsService(source=lambda: (gold_path, 'v1'))
+
+    expected = ItemRecommender().fit(df)
+    pd.testing.assert_frame_equal(service.similar_items('17,3', n=4), expected.similar_items(['17', '3'], 4))
+    pd.testing.assert_frame_equal(service.recommend(['5'], n=3), expected.recommend(['5'], 3))
+    assert ItemRecommender.load(str(tmp_path / 'index.npz')).source_version == 'v1'
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from src import registry
+from src.registry import ModelRegistry, StaleModelError
+
+MONTHLY = {'granularity': 'monthly', 'lags': [1, 2, 3]}
+WEEKLY = {'granularity': 'weekly', 'lags': [1, 2, 3]}
+
+
+def fitted(seed):
+    rng = np.random.default_rng(seed)
+    return xgb.XGBRegressor(n_estimators=3, max_depth=2).fit(rng.random((20, 3)), rng.random(20))
+
+
+def test_each_feature_spec_keeps_its_own_latest_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, '_LOADED', {})
+    models = ModelRegistry(str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        models.resolve('forecaster', 'v1', MONTHLY)
+
+    monthly = models.save('forecaster', fitted(0), 'v1', MONTHLY)
+    weekly = models.save('forecaster', fitted(1), 'v2', WEEKLY)
+
+    # New data and a weekly model trained since: the monthly model is stale, not unusable
+    entry = models.resolve('forecaster', 'v3', MONTHLY)
+    assert entry['key'] == monthly['key'] and entry['stale']
+    with pytest.raises(StaleModelError):
+        models.resolve('forecaster', 'v3', {'granularity': 'daily', 'lags': [1, 2, 3]})
+
+    # Switching granularity doesn't evict the other spec's loaded booster
+    first, _ = models.load('forecaster', 'v3', MONTHLY)
+    models.load('forecaster', 'v2', WEEKLY)
+    again, _ = models.load('forecaster', 'v3', MONTHLY)
+    assert again is first
+    assert models.load('forecaster', 'v2', WEEKLY)[1]['key'] == weekly['key']
@@ -0,0 +1,40 @@
+import os
+
+from src.remote_parquet import _SparseFile
+
+
+class BytesRemote:
+    """In-memory stand-in for RemoteFile: serves ranges of a byte string and counts them."""
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+        self.reads = 0
+
+    def read_range(self, start, stop):
+        self.reads += 1
+        return self.data[start:stop]
+
+
+def test_sparse_file_evicts_least_recently_read_chunks_within_budget():
+    data = os.urandom(1000)
+    remote = BytesRemote(data)
+    sparse = _SparseFile(remote, max_bytes=300)
+    sparse.add(900, data[900:], pinned=True)
+    for start in (0, 100, 200, 300):
+        sparse.add(start, data[start:start + 100])
+    sparse.seek(0)
+    sparse.read(50)
+
+    # Room for 100 more bytes, sparing the range the next scan reads
+    sparse.make_room(100, keep=[(300, 400)])
+
+    # 100 and 200 go first (least recently used), then 0; 300 is spared and the footer pinned
+    assert sparse.bytes <= 300 - 100
+    assert sparse.starts == [300, 900]
+    assert sparse.evicted_bytes == 300
+
+    # Evicted ranges are fetched again on demand, and every read is still byte-exact
+    sparse.seek(50)
+    assert sparse.read(400) == data[50:450]
+    assert sparse.on_demand == 2
@@ -0,0 +1,43 @@
+import threading
+import pytest
+
+from src.service import ResultCache
+
+
+def test_interrupted_compute_is_not_cached_and_reaches_waiters():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    outcomes = {}
+
+    def interrupted():
+        started.set()
+        release.wait()
+        raise KeyboardInterrupt
+
+    def call(name, compute):
+        try:
+            outcomes[name] = cache.get_or_compute(('v1', 'kpis'), compute)
+        except KeyboardInterrupt:
+            outcomes[name] = 'interrupted'
+
+    owner = threading.Thread(target=call, args=('owner', interrupted))
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=call, args=('waiter', lambda: 'recomputed'))
+    waiter.start()
+    while cache.info()['waits'] == 0:
+        pass
+    release.set()
+    owner.join()
+    waiter.join()
+
+    assert outcomes == {'owner': 'interrupted', 'waiter': 'interrupted'}
+    assert len(cache) == 0
+    assert cache.get_or_compute(('v1', 'kpis'), lambda: 42) == 42
+
+
+def test_failed_compute_is_retried():
+    cache = ResultCache()
+    with pytest.raises(ValueError):
+        cache.get_or_compute(('v1', 'rfm'), lambda: int('x'))
+    assert cache.get_or_compute(('v1', 'rfm'), lambda: 7) == 7
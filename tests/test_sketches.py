@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.sketches import estimate, hll_entries, standard_error, union_by_group
+
+
+@pytest.mark.parametrize('precision', [10, 14])
+@pytest.mark.parametrize('distinct', [1_000, 20_000, 200_000])
+def test_estimate_within_the_standard_error_bound(precision, distinct):
+    rng = np.random.default_rng(precision + distinct)
+    # Every value several times, in random order: duplicates must not count
+    values = pd.Series(rng.permutation(np.repeat(np.arange(distinct), 3)).astype(str))
+    error = estimate(hll_entries(values, precision), precision) / distinct - 1
+
+    # 4 standard errors: a seeded draw, so no flakiness, with room for the bias of the raw estimator
+    assert abs(error) < 4 * standard_error(precision)
+
+
+def test_small_counts_are_near_exact():
+    values = pd.Series(np.arange(100).astype(str))
+    assert estimate(hll_entries(values), 14) == pytest.approx(100, abs=1)
+
+
+def test_union_of_sketches_estimates_the_union():
+    values = pd.Series(np.arange(60_000).astype(str))
+    entries = hll_entries(values)
+    # Two overlapping halves as groups 0 and 1; the union of both is the whole set
+    groups = np.r_[np.zeros(40_000), np.ones(40_000)].astype(np.int64)
+    halves = np.r_[entries[:40_000], entries[20_000:]]
+    merged_groups, merged = union_by_group(groups, halves)
+
+    assert estimate(merged) == pytest.approx(estimate(entries))
+    assert estimate(merged[merged_groups == 1]) == pytest.approx(estimate(entries[20_000:]))
+    assert abs(estimate(merged) / 60_000 - 1) < 4 * standard_error(14)
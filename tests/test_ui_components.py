@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from src.ui_components import decimate, lttb
+
+
+def test_lttb_keeps_endpoints_and_the_threshold_length():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=5000).cumsum()
+    y[2345] += 500
+    keep = lttb(np.arange(len(y)), y, 200)
+
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert (np.diff(keep) > 0).all()
+    # A lone spike is the largest triangle in its bucket, so it survives
+    assert 2345 in keep
+
+
+def test_decimate_cuts_long_frames_on_datetime_axes():
+    frame = pd.DataFrame({'InvoiceDate': pd.date_range('2010-01-01', periods=1000, freq='h'),
+                          'Line_Total': np.sin(np.arange(1000) / 20)})
+    cut = decimate(frame, 'InvoiceDate', 'Line_Total', max_points=100)
+
+    assert len(cut) == 100
+    assert cut.index[0] == 0 and cut.index[-1] == 999
+    pd.testing.assert_frame_equal(cut, frame.loc[cut.index])
+
+
+def test_series_within_the_threshold_pass_through():
+    frame = pd.DataFrame({'x': np.arange(50), 'y': np.arange(50.0) ** 2})
+
+    assert decimate(frame, 'x', 'y', max_points=50) is frame
+    assert decimate(frame, 'x', 'y', max_points=80) is frame
+    np.testing.assert_array_equal(lttb(frame['x'], frame['y'], 80), np.arange(50))